@@ -1,14 +1,19 @@
+import json
 import subprocess
 from typing import Dict, List, Optional
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.responses import StreamingResponse, JSONResponse, PlainTextResponse
-import requests
 import logging
+from urllib.parse import urlparse, parse_qs
 from pydantic import BaseModel
 from contextlib import asynccontextmanager
 
-from src.data_processing.data_pipeline import download_pipeline_youtube
-from src.rag.app import chat_internal, models_internal, collections_internal
+from src.rag.app import chat_internal, models_internal, collections_internal, warmup_steps_internal
+from src.db.graph_db.connection import close_graph_connection
+from src.health.health import get_health_checker, get_warmup, readiness, WARMUP_ON_STARTUP
+from src.data_processing.jobs import get_job_manager
+from src.data_processing.model_cache import get_model_cache
+from src.data_processing.rate_limiter import get_rate_limiter_stats
 
 # Set up basic configuration for logging
 logging.basicConfig(level=logging.INFO) # default=INFO (DEBUG, INFO, WARNING, ERROR, CRITICAL)
@@ -17,12 +22,45 @@ logging.basicConfig(level=logging.INFO) # default=INFO (DEBUG, INFO, WARNING, ER
 async def lifespan(app: FastAPI):
     # Startup event
     process = subprocess.Popen(["streamlit", "run", "src/frontend/app.py"])
+    get_health_checker().start()
+    if WARMUP_ON_STARTUP:
+        get_warmup().run_in_background(get_warmup_steps())
     yield
     # Shutdown event
     process.terminate()
+    get_health_checker().stop()
+    close_graph_connection()
     
 app = FastAPI(lifespan=lifespan)
 
+
+def warmup_ingestion():
+    from src.data_processing.visual_processing import get_clip_model
+    get_clip_model()
+
+
+def get_warmup_steps(ingestion: bool = False) -> dict:
+    checker = get_health_checker()
+    # Probing the databases opens the Chroma client and the Neo4j connection pool
+    steps = {f"{name}_connection": (lambda name=name: checker.check(name)) for name in ("chroma", "neo4j")}
+    steps.update(warmup_steps_internal())
+    if ingestion:
+        steps["clip_model"] = warmup_ingestion
+    return steps
+
+
+@app.post("/warmup")
+def warmup(ingestion: bool = False):
+    status = get_warmup().run(get_warmup_steps(ingestion))
+    return JSONResponse(content=status, status_code=200 if status["state"] == "done" else 503)
+
+
+@app.get("/ready")
+def ready():
+    report = readiness()
+    return JSONResponse(content=report, status_code=200 if report["ready"] else 503)
+
+
 @app.get("/model")
 def model():
     models = models_internal()
@@ -33,6 +71,17 @@ def collection():
     collections = collections_internal()
     return JSONResponse(content=collections, status_code=200)
 
+@app.get("/model_cache")
+def model_cache():
+    cache = get_model_cache()
+    if cache is None:
+        return JSONResponse(content={"enabled": False}, status_code=200)
+    return JSONResponse(content={"enabled": True, **cache.stats()}, status_code=200)
+
+@app.get("/rate_limits")
+def rate_limits():
+    return JSONResponse(content=get_rate_limiter_stats(), status_code=200)
+
 class ChatRequest(BaseModel):
     prompt: str
     message_history: Optional[List[Dict[str, str]]] = None
@@ -47,6 +96,7 @@ class ChatRequest(BaseModel):
     mode: Optional[str] = None
     use_logical_routing: Optional[bool] = None
     use_semantic_routing: Optional[bool] = None
+    conversation_id: Optional[str] = None
 
 
 class AnalyzeRequest(BaseModel):
@@ -58,6 +108,7 @@ class AnalyzeRequest(BaseModel):
     max_limit_similarity: Optional[float] = 0.85
     local_model: Optional[bool] = False
     enabled_detailed_chunking: Optional[bool] = False
+    resume: Optional[bool] = True
 
 
 @app.post("/chat", response_class=StreamingResponse)
@@ -84,7 +135,8 @@ def chat(request: ChatRequest):
             plaintext=request.plaintext,
             mode=request.mode,
             use_logical_routing=request.use_logical_routing,
-            use_semantic_routing=request.use_semantic_routing
+            use_semantic_routing=request.use_semantic_routing,
+            conversation_id=request.conversation_id
         )
 
         if use_plaintext:
@@ -106,38 +158,102 @@ def chat(request: ChatRequest):
                 plaintext=request.plaintext,
                 mode=request.mode,
                 use_logical_routing=request.use_logical_routing,
-                use_semantic_routing=request.use_semantic_routing
+                use_semantic_routing=request.use_semantic_routing,
+                conversation_id=request.conversation_id
             ),
             media_type="text/event-stream",
             status_code=200
         )
 
+def is_youtube_url(url: str) -> bool:
+    """URL of a YouTube video (watch?v=) or playlist (list=)"""
+    parsed = urlparse(url)
+    hostname = parsed.hostname or ""
+    if parsed.scheme not in ("http", "https") or not (hostname == "youtube.com" or hostname.endswith(".youtube.com")):
+        return False
+    query = parse_qs(parsed.query)
+    return "v" in query or "list" in query
+
+
+def run_analyze_pipeline(request: AnalyzeRequest, progress):
+    # The ingestion stack (torch, CLIP, OpenCV, yt-dlp) is imported on the first analysis, not at startup
+    from src.data_processing.data_pipeline import download_pipeline_youtube
+    return download_pipeline_youtube(request.video_input, request.chunk_max_length, request.chunk_overlap_length,
+                                     request.seconds_between_frames, request.max_limit_similarity, request.local_model,
+                                     request.enabled_detailed_chunking, resume=request.resume, progress=progress)
+
+
 @app.post("/analyze")
 def analyze(request: AnalyzeRequest):
     video_input = request.video_input
-    chunk_max_length = request.chunk_max_length
-    chunk_overlap_length = request.chunk_overlap_length
-    embedding_model = request.embedding_model
-    max_limit_similarity = request.max_limit_similarity
-    seconds_between_frames = request.seconds_between_frames
-    local_model  = request.local_model
-    enabled_detailed_chunking = request.enabled_detailed_chunking
-    
 
     logging.info(f"Video {video_input}")
     # Check if the passed URL is a valid YouTube URL.
     # url = "https://www.youtube.com/oembed?format=json&url=" + video_input # ! Deprecated
-    response = requests.head(video_input, allow_redirects=True)
-    if response.status_code in range(200, 300) and "youtube" in video_input:
+    if is_youtube_url(video_input):
         # Valid YouTube URL
-        status_code, status_message = download_pipeline_youtube(video_input, chunk_max_length, chunk_overlap_length, seconds_between_frames, max_limit_similarity, local_model, enabled_detailed_chunking)
-        if status_code in range(200, 300):
-            # Pre-Processing was successfull
-            return {"message": status_message, "status_code": status_code}
-        else:
-            # Pre-Processing failed
-            raise HTTPException(status_code=status_code, detail=f"YouTube content could not be processed: {status_message}")
+        # The reachability of YouTube is probed in the background instead of sending a HEAD request per URL
+        youtube_health = get_health_checker().check("youtube")
+        if not youtube_health.healthy:
+            logging.warning(f"YouTube is not reachable: {youtube_health.error}")
+            raise HTTPException(status_code=424, detail="YouTube content could not be processed: YouTube is not reachable from the server.")
+        # The pipeline runs as a background job, the response only contains the job
+        job, created = get_job_manager().submit(
+            video_input,
+            lambda progress: run_analyze_pipeline(request, progress),
+            request.model_dump()
+        )
+        return JSONResponse(
+            content={
+                "job_id": job.id,
+                "state": job.state,
+                "deduplicated": not created,
+                "status_url": f"/jobs/{job.id}",
+                "events_url": f"/jobs/{job.id}/events",
+                "message": f"YouTube content is being processed, follow the progress at /jobs/{job.id}"
+            },
+            status_code=202,
+            headers={"Location": f"/jobs/{job.id}"}
+        )
     else:
         # No valid YouTube URL
-        logging.warning(f"YouTube URL does not exist: Status code = {response.status_code}")
+        logging.warning(f"YouTube URL is not valid: {video_input}")
         raise HTTPException(status_code=404, detail=f"YouTube content could not be processed: This is not a valid YouTube URL.")
+
+
+@app.get("/jobs/{job_id}")
+def job_status(job_id: str):
+    job = get_job_manager().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} does not exist.")
+    return JSONResponse(content=job.to_dict(), status_code=200)
+
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str, request: Request):
+    job = get_job_manager().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} does not exist.")
+    # Reconnecting EventSource clients send the ID of the last event they received
+    last_event_id = request.headers.get("last-event-id") or "0"
+    if not last_event_id.isdigit():
+        raise HTTPException(status_code=400, detail=f"Invalid Last-Event-ID: {last_event_id}")
+    after = int(last_event_id)
+
+    # Async, so a subscriber following a job for hours does not hold a worker thread of the sync endpoints
+    async def stream():
+        async for event in get_job_manager().events_async(job_id, after):
+            if event is None:
+                yield ": keep-alive\n\n"
+            else:
+                yield f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+    return StreamingResponse(content=stream(), media_type="text/event-stream")
+
+
+@app.delete("/jobs/{job_id}")
+def cancel_job(job_id: str):
+    job = get_job_manager().cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} does not exist.")
+    return JSONResponse(content=job.to_dict(), status_code=202 if not job.finished else 200)
@@ -2,13 +2,12 @@ import os
 from dotenv import load_dotenv
 import time
 
-import google.generativeai as genai
-from ollama import chat
-from ollama import ChatResponse
 from youtube_transcript_api import YouTubeTranscriptApi
 
 from .video_metadata_download import extract_youtube_video_id
 from .logger import log, clean_up_logger
+from .model_calls import generate_gemini, chat_ollama
+from .llm_client import get_llm_client
 
 # Env variables
 load_dotenv() 
@@ -80,10 +79,6 @@ def download_preprocess_youtube_transcript(url: str, language:str="en", gemini_m
             max_length = 20000  
             transcript_chunks = split_transcript(raw_combined_transcript, max_length)
             log.info("download_preprocess_youtube_transcript: Splitted raw transcript into %s chunks.", len(transcript_chunks))
-            log.warning("download_preprocess_youtube_transcript: Too many API calls. Sleep now for 60 seconds.")
-            time.sleep(60)
-            genai.configure(api_key=API_KEY_GOOGLE_GEMINI)
-            model = genai.GenerativeModel(gemini_model)
             prompt = (
                 """Please improve the following transcript by correcting any grammar mistakes, 
                 fixing capitalization errors, fixing punctuation missings and mistakes, 
@@ -94,11 +89,9 @@ def download_preprocess_youtube_transcript(url: str, language:str="en", gemini_m
                 of the text without adjusting it: """
             )
 
-            improved_chunks = []
-            for chunk in transcript_chunks:
-                log.info("download_preprocess_youtube_transcript: Waiting for response for chunk %s.", len(improved_chunks)+1)
-                response = model.generate_content(prompt + chunk)
-                improved_chunks.append(response.text)
+            # All chunks are corrected concurrently, the results keep the order of the chunks
+            log.info("download_preprocess_youtube_transcript: Waiting for responses for %s chunks.", len(transcript_chunks))
+            improved_chunks = get_llm_client().map(lambda chunk: generate_gemini(gemini_model, prompt, text=chunk, api_key=API_KEY_GOOGLE_GEMINI), transcript_chunks)
         
             improved_transcript = " ".join(improved_chunks)
 
@@ -115,17 +108,9 @@ def download_preprocess_youtube_transcript(url: str, language:str="en", gemini_m
                 of the text without adjusting it. Do not return anything else, 
                 do not say "Here is the improved transcript". This is the transcript: """
 
-            improved_chunks = []
-            for chunk in transcript_chunks:
-                log.info("download_preprocess_youtube_transcript: Waiting for response for chunk %s.", len(improved_chunks)+1)
-                response: ChatResponse = chat(model=local_llm, messages=[
-                {
-                    'role': 'user',
-                    'content': prompt + chunk,
-                },
-                ])
-                improved_chunks.append(response.message.content)
-                clean_up_logger()
+            log.info("download_preprocess_youtube_transcript: Waiting for responses for %s chunks.", len(transcript_chunks))
+            improved_chunks = get_llm_client().map(lambda chunk: chat_ollama(local_llm, prompt, text=chunk), transcript_chunks)
+            clean_up_logger()
         
             improved_transcript = " ".join(improved_chunks)
 
@@ -2,11 +2,12 @@ import os
 import re
 import time
 from dotenv import load_dotenv
-import google.generativeai as genai
 import pandas as pd
 
 from .audio_processing import split_transcript
 from .logger import log
+from .model_calls import generate_gemini
+from .llm_client import get_llm_client
 
 # Env variables
 load_dotenv() 
@@ -160,9 +161,6 @@ def create_chunk_llm(text: str, gemini_model: str = "gemini-1.5-flash", max_inpu
 
     """
     log.info("create_chunk_llm: Starting with the detailed, LLM-based chunking with max_input_length_llm set to %s.", max_input_length_llm)
-    genai.configure(api_key=API_KEY_GOOGLE_GEMINI)
-    model = genai.GenerativeModel(gemini_model)
-
     prompt = (
             f"""
             Divide the following transcript text into logical and consistent chunks. 
@@ -185,9 +183,7 @@ def create_chunk_llm(text: str, gemini_model: str = "gemini-1.5-flash", max_inpu
     if len(text) < max_input_length_llm:
         log.info("create_chunk_llm: Processing single chunk input with length %s.", len(text))
 
-        prompt_transcript = prompt + text
-        response = model.generate_content(prompt_transcript)
-        response = response.text
+        response = generate_gemini(gemini_model, prompt, text=text, api_key=API_KEY_GOOGLE_GEMINI)
         response = response.replace("\n", "")
         response = response.split("%%%%")
 
@@ -201,22 +197,15 @@ def create_chunk_llm(text: str, gemini_model: str = "gemini-1.5-flash", max_inpu
         for i, text_snipped in enumerate(text_splitted):
             if i == 0:
                 
-                prompt_transcript = prompt + text_snipped
-                response = model.generate_content(prompt_transcript)
-                response = response.text
+                response = generate_gemini(gemini_model, prompt, text=text_snipped, api_key=API_KEY_GOOGLE_GEMINI)
                 response = response.replace("\n", "")
                 response = response.split("%%%%")
                 last_chunk.append(response.pop())
                 chunks.extend(response)
 
             else:
-                if i % 10 == 0:
-                    log.warning("create_chunk_llm: Too many API calls. Sleep for 60 seconds.")
-                    time.sleep(60)
                 text_snipped = last_chunk[-1] + text_snipped
-                prompt_transcript = prompt + text_snipped
-                response = model.generate_content(prompt_transcript)
-                response = response.text
+                response = generate_gemini(gemini_model, prompt, text=text_snipped, api_key=API_KEY_GOOGLE_GEMINI)
                 
                 response = response.replace("\n", "")
                 response = response.split("%%%%")
@@ -247,9 +236,6 @@ def check_llm_chuncks(chunk_response, chunk_max_length):
 
     log.info("check_llm_chunks: Found %s chunks exceeding the defined max length.", len(long_chunks))
 
-    genai.configure(api_key=API_KEY_GOOGLE_GEMINI)
-    model = genai.GenerativeModel("gemini-1.5-flash")
-
     prompt = (
         f"""
         Divide the following transcript text into logical and consistent chunks.
@@ -267,16 +253,10 @@ def check_llm_chuncks(chunk_response, chunk_max_length):
         """
     )
 
-    for i, chunk in long_chunks:
-        if i % 10 == 0:
-            log.warning("check_llm_chunks: Too many API calls. Sleep for 60 seconds.")
-            time.sleep(60)
-        prompt_with_chunk = prompt + chunk
-        response = model.generate_content(prompt_with_chunk)
-        response = response.text.replace("\n", "").replace("\\", "")
-        response = response.split("%%%")
-        
-        chunk_list[i:i + 1] = response
+    # The long chunks are split concurrently, then replaced by their parts at their original positions
+    responses = get_llm_client().map(lambda chunk: generate_gemini("gemini-1.5-flash", prompt, text=chunk, api_key=API_KEY_GOOGLE_GEMINI), [chunk for _, chunk in long_chunks])
+    split_chunks = {i: response.replace("\n", "").replace("\\", "").split("%%%") for (i, _), response in zip(long_chunks, responses)}
+    chunk_list = [part for i, element in enumerate(chunk_list) for part in split_chunks.get(i, [element])]
 
     chunk_list = [element for element in chunk_list if len(element) > 1]
 
@@ -1,10 +1,10 @@
 import os
-import subprocess
 from dotenv import load_dotenv
 import pandas as pd
 import csv
+import shutil
+from concurrent.futures import ThreadPoolExecutor
 
-import requests
 
 # Import other functions of the data_processing package
 from .video_metadata_download import *
@@ -13,12 +13,19 @@ from .chunk_processing import *
 from .visual_processing import *
 from .embeddings import *
 from .logger import log, create_log_file, write_empty_line
+from .jobs import PipelineProgress, JobCancelled
+from .resources import resource, INGESTION_VIDEO_WORKERS
+from .stage_graph import Stage, StageGraph, StageError
+from .manifest import VideoManifest
 
 # Import other functions of the DB packages
 from src.db.graph_db.graphdb_main import *
 # from src.db.graph_db.db_handler import GraphHandler
 from src.db.graph_db.utilities import *
 from src.vectordb.main import *
+from src.vectordb.playlists import add_playlist_membership
+from src.providers.providers import get_ollama_host
+from src.health.health import get_health_checker
 
 # Env variables Data Pre-Processing
 load_dotenv() 
@@ -27,6 +34,9 @@ PROCESSED_VIDEOS_PATH = os.getenv("PROCESSED_VIDEOS_PATH")
 TOPIC_OVERVIEW_PATH = os.getenv("TOPIC_OVERVIEW_PATH")
 LOG_FILE_PATH = os.getenv("LOG_FILE_PATH")
 
+# Stages of a video, in the order of the job progress
+STAGE_NAMES = ["download", "metadata", "visual", "audio", "topic", "chunking", "embedding", "vector_db", "graph_db"]
+
 # Create log file
 create_log_file(LOG_FILE_PATH)
 
@@ -41,7 +51,7 @@ create_log_file(LOG_FILE_PATH)
 # ********************************************************
 # * Final pipeline function
 
-def download_pipeline_youtube(url: str, chunk_max_length: int=550, chunk_overlap_length: int=50, seconds_between_frames: int=120, max_limit_similarity: float=0.85, local_model: bool = False, enabled_detailed_chunking: bool = False):
+def download_pipeline_youtube(url: str, chunk_max_length: int=550, chunk_overlap_length: int=50, seconds_between_frames: int=120, max_limit_similarity: float=0.85, local_model: bool = False, enabled_detailed_chunking: bool = False, resume: bool = True, progress: PipelineProgress | None = None):
     """
     Pipeline for processing YouTube videos and their content.
 
@@ -56,6 +66,8 @@ def download_pipeline_youtube(url: str, chunk_max_length: int=550, chunk_overlap
         seconds_between_frames (int, optional): How many seconds should pass between the extracted frames.
         local_model (bool, optional): False: a Gemini model using an API key is used. True: A local Ollama model is used.
         enabled_detailed_chunking (bool, optional): False: A simpler, sentence-based chunking method is used. True: A detailed, LLM-based chunking method is used. 
+        resume (bool, optional): True: For a video whose processing stopped halfway, only the missing or invalidated stages run again. False: All of its stages run again.
+        progress (PipelineProgress, optional): Receives the progress per video and stage, see jobs.py. Raises JobCancelled between stages after a cancellation.
 
     Returns:
         status_code (int): The status code that should be returned by the Fast API endpoint.
@@ -66,6 +78,9 @@ def download_pipeline_youtube(url: str, chunk_max_length: int=550, chunk_overlap
         download_pipeline_youtube("https://www.youtube.com/watch?v=example")
     """
 
+    if progress is None:
+        progress = PipelineProgress()
+
     write_empty_line("src/data_processing/data-processing.log")
     log.info("download_pipeline_youtube: Start data pipeline.")
     log.info("download_pipeline_youtube: Parameter 1: url = %s", url)
@@ -107,19 +122,27 @@ def download_pipeline_youtube(url: str, chunk_max_length: int=550, chunk_overlap
     log.info("download_pipeline_youtube: All required env variables are set.")
 
     # Validate API Key or check for local ollama
+    # The dependencies are probed in the background, see src/health, these checks only read the cached results
+    health_checker = get_health_checker()
     if not local_model:
         # Validate gemini API
-        api_key = os.getenv("API_KEY_GOOGLE_GEMINI")
-        print(api_key)
-        if not api_key:
+        if not os.getenv("API_KEY_GOOGLE_GEMINI"):
             return 424, "Error while trying to fetch the Gemini API. Please provide an API key!"
-        gemini_url = f'https://generativelanguage.googleapis.com/v1beta2/models?key={api_key}'
-        response = requests.get(gemini_url)
-        if response.status_code == 200:
+        gemini_health = health_checker.check("gemini")
+        if gemini_health.healthy:
             log.info("download_pipeline_youtube: Gemini API call test succeeded!")
         else:
-            log.error("download_pipeline_youtube: Gemini API call test failed!: %s.", response.status_code)
+            log.error("download_pipeline_youtube: Gemini API call test failed!: %s.", gemini_health.error)
             return 424, "Error while trying to fetch the Gemini API. Please provide a valid API key and check your internet connection."
+
+    # Check if Ollama is running
+    ollama_url = get_ollama_host()
+    ollama_health = health_checker.check("ollama")
+    if not ollama_health.healthy:
+        log.error("download_pipeline_youtube: Error while validating that Ollama is running. Ollama was not found under %s: %s.", ollama_url, ollama_health.error)
+        return 424, f"Error while validating that Ollama is running on {ollama_url} on the server. Please contact a developer."
+    log.info("download_pipeline_youtube: Validating Ollama running on %s succeeded.", ollama_url)
+
     # Check local ollama models
     required_models = ["nomic-embed-text"]
     if local_model:
@@ -132,21 +155,7 @@ def download_pipeline_youtube(url: str, chunk_max_length: int=550, chunk_overlap
             return 424, f"Error while validating the local model: {message}. Please contact a developer."
     log.info("download_pipeline_youtube: Required local models were found.")
 
-    # Check if Ollama is running
-    ollama_url = "http://localhost:11434"
-    try:
-        response = requests.get(ollama_url)
-        if not response.status_code == 200:
-            log.error("download_pipeline_youtube: Error while validating that Ollama is running. Ollama was not found under port 11434.")
-            return 424, f"Error while validating that Ollama is running on port 11434 on the server. Please contact a developer."
-    except:
-        log.error("download_pipeline_youtube: Error while validating that Ollama is running. Ollama was not found under port 11434.")
-        return 424, f"Error while validating that Ollama is running on port 11434 on the server. Please contact a developer."
-    log.info("download_pipeline_youtube: Validating Ollama running on port 11434 succeeded.")
-
-    chunk_length = chunk_max_length - chunk_overlap_length
     video_urls = []
-    processed_video_titles = []
 
     # * Load url(s) in the video_urls list
     # Also check if the URL type is a valid YouTube video/ playlist
@@ -156,6 +165,14 @@ def download_pipeline_youtube(url: str, chunk_max_length: int=550, chunk_overlap
     elif "list" in url:
         log.info("download_pipeline_youtube: %s is a YouTube playlist.", url)
         video_urls = extract_video_urls_from_playlist(url)
+        # Record the playlist membership, also for videos that were already processed through another playlist
+        try:
+            playlist_id = extract_youtube_playlist_id(url)
+            add_playlist_membership(playlist_id, [extract_youtube_video_id(video_url) for video_url in video_urls])
+            log.info("download_pipeline_youtube: Recorded %d videos for playlist %s.", len(video_urls), playlist_id)
+        except Exception as e:
+            log.error("download_pipeline_youtube: The playlist membership could not be recorded: %s.", e)
+            return 500, "Internal error when trying to record the playlist of the videos. Please contact a developer."
     elif "shorts" in url:
         log.warning("download_pipeline_youtube: %s is a YouTube short. Not supported.", url)
         return 415, "The URL is a shorts video. Shorts are not supported, please provide a video or playlist URL."
@@ -167,117 +184,285 @@ def download_pipeline_youtube(url: str, chunk_max_length: int=550, chunk_overlap
         return 415, "The URL is a valid YouTube URL, but neither a video nor a playlist."
 
     # * Try to download and process the list of YouTube videos
-    for video_url in video_urls:
-        # Set needed result variables
-        video_id = extract_youtube_video_id(video_url)
-        meta_data = {}
+    # The videos of a playlist are processed in parallel, a failed video does not stop the others
+    video_ids = [extract_youtube_video_id(video_url) for video_url in video_urls]
+    with ThreadPoolExecutor(max_workers=INGESTION_VIDEO_WORKERS, thread_name_prefix="ingestion-video") as executor:
+        futures = [
+            executor.submit(run_youtube_video, video_url, video_id, index, len(video_urls), chunk_max_length, chunk_overlap_length, seconds_between_frames, max_limit_similarity, local_model, enabled_detailed_chunking, resume, progress)
+            for index, (video_url, video_id) in enumerate(zip(video_urls, video_ids), start=1)
+        ]
+        results = [future.result() for future in futures]
+
+    processed_video_titles = [result for status_code, result in results if status_code == 201]
+    failed_videos = [(video_id, status_code, result) for video_id, (status_code, result) in zip(video_ids, results) if status_code not in range(200, 300)]
+
+    # * Log results and return appropriate message to the user
+    if failed_videos:
+        for video_id, status_code, message in failed_videos:
+            log.error("download_pipeline_youtube: Video %s failed with status code %s: %s", video_id, status_code, message)
+        failures = "\n".join([f"- {video_id}: {message}" for video_id, _, message in failed_videos])
+        if len(failed_videos) == len(video_urls):
+            # Nothing was processed, the error of the first video is the error of the request
+            if len(video_urls) == 1:
+                return failed_videos[0][1], failed_videos[0][2]
+            return failed_videos[0][1], f"None of the {len(video_urls)} videos could be processed:\n\n{failures}"
+        response = f"YouTube playlist partially processed, {len(failed_videos)} of {len(video_urls)} videos failed:\n\n{failures}"
+        if processed_video_titles:
+            response += "\n\nProcessed videos:\n\n" + "\n".join([f"{i + 1}. {title}" for i, title in enumerate(processed_video_titles)])
+        return 207, response
+    if len(processed_video_titles) == 0:
+        log.warning("download_pipeline_youtube: YouTube content for URL %s was already processed.", url)
+        return 200, "YouTube content was already processed."
+    elif len(processed_video_titles) == 1:
+        log.info("download_pipeline_youtube: YouTube content for video %s successfully processed! ", url)
+        return 201, f"YouTube video with title {processed_video_titles[0]} successfully processed!"
+    else:
+        log.info("download_pipeline_youtube: YouTube content for playlist %s successfully processed!", url)
+        response = "YouTube playlist successfully processed!\nProcessed videos:\n\n"
+        response += "\n".join([f"{i + 1}. {title}" for i, title in enumerate(processed_video_titles)])
+        return 201, response
+
+
+def run_youtube_video(video_url: str, video_id: str, index: int, total: int, chunk_max_length: int, chunk_overlap_length: int, seconds_between_frames: int, max_limit_similarity: float, local_model: bool, enabled_detailed_chunking: bool, resume: bool, progress: PipelineProgress):
+    """
+    Process one video of the list on a worker thread and report its result to the progress.
+
+    Returns:
+        tuple: The status code and the title or error message, see process_youtube_video.
+    """
+    progress.start_video(video_id, index, total)
+    try:
+        status_code, result = process_youtube_video(video_url, video_id, chunk_max_length, chunk_overlap_length, seconds_between_frames, max_limit_similarity, local_model, enabled_detailed_chunking, resume, progress)
+    except JobCancelled:
+        raise
+    except Exception as e:
+        log.error("download_pipeline_youtube: Processing video %s failed: %s.", video_id, e)
+        status_code, result = 500, "Internal error when trying to process the video. Please contact a developer."
+    if status_code not in range(200, 300):
+        progress.fail_video(video_id, result)
+    return status_code, result
+
+
+def process_youtube_video(video_url: str, video_id: str, chunk_max_length: int, chunk_overlap_length: int, seconds_between_frames: int, max_limit_similarity: float, local_model: bool, enabled_detailed_chunking: bool, resume: bool, progress: PipelineProgress):
+    """
+    Run all stages of the pipeline for one video.
+
+    The stages form a dependency graph (see stage_graph.py): the visual branch only needs the downloaded video, the
+    transcript branch only the URL, so both run at the same time, as do the VectorDB and GraphDB loads. Each stage
+    holds the slot of its resource class while it runs (see resources.py), so several videos can be processed at
+    the same time without exceeding the limits of the network, the CPU, the LLM providers or the databases.
+
+    Every finished stage is recorded with its parameters and the hashes of its outputs in the manifest of the video
+    (see manifest.py). A video is only skipped once all stages finished, otherwise its missing or invalidated
+    stages and the stages depending on them run again.
 
-        # * Download video
-        if video_with_id_already_downloaded(video_id):
+    Args:
+        video_url (str): URL of the YouTube video.
+        video_id (str): ID of the YouTube video.
+        The other arguments are the ones of download_pipeline_youtube.
+
+    Returns:
+        status_code (int): 201 if the video was processed, 200 if it was already processed, the error code otherwise.
+        result (str): The title of the video, None if it was already processed, the error message otherwise.
+    """
+    chunk_length = chunk_max_length - chunk_overlap_length
+    video_folder = PROCESSED_VIDEOS_PATH.replace("_video_id_", video_id)
+    manifest = VideoManifest(video_id, video_folder)
+
+    if video_with_id_already_downloaded(video_id):
+        if not manifest.exists:
+            # Processed before stages were recorded, it is unknown which stages finished
             log.warning("download_pipeline_youtube: Video with ID %s was already downloaded and analyzed.", video_id)
-            continue
+            progress.finish_video(video_id, "skipped")
+            return 200, None
+        if all((manifest.stage(name) or {}).get("state") == "done" for name in STAGE_NAMES):
+            log.warning("download_pipeline_youtube: Video with ID %s was already downloaded and analyzed.", video_id)
+            progress.finish_video(video_id, "skipped")
+            return 200, None
+        log.info("download_pipeline_youtube: Processing of video with ID %s stopped halfway, %s.", video_id, "resuming it" if resume else "running all stages again")
+
+    # Parameters and outputs (relative to the video folder) of every stage, a stage runs again if they changed
+    parameters = {
+        "download": {},
+        "metadata": {},
+        "visual": {"seconds_between_frames": seconds_between_frames, "max_limit_similarity": max_limit_similarity, "local_model": local_model},
+        "audio": {"local_model": local_model},
+        "topic": {},
+        "chunking": {"chunk_max_length": chunk_max_length, "chunk_overlap_length": chunk_overlap_length, "enabled_detailed_chunking": enabled_detailed_chunking},
+        "embedding": {},
+        "vector_db": {},
+        "graph_db": {}
+    }
+    outputs = {
+        "download": ["video"],
+        "visual": ["frames", "frames_description/frame_descriptions.csv"],
+        "audio": [f"transcripts/{video_id}.txt"],
+        "chunking": [f"transcripts_chunks/{video_id}.csv"],
+        "embedding": [f"transcripts_chunks/{video_id}.csv"]
+    }
+
+    def checkpointed(name: str, run):
+        def run_checkpointed(context: dict):
+            # With resume=False the partial results of an earlier attempt are discarded too
+            resumable = manifest.start(name, parameters[name])
+            context.setdefault("resumable", {})[name] = resumable and resume
+            try:
+                run(context)
+            except StageError as e:
+                manifest.mark_failed(name, e.message)
+                raise
+            except Exception as e:
+                manifest.mark_failed(name, str(e))
+                raise
+            manifest.mark_done(name, parameters[name], outputs.get(name, []), data={"meta_data": context["meta_data"]} if name == "metadata" else None)
+        return run_checkpointed
+
+    # * Download video
+    def download(context: dict):
         try:
-            log.info("download_pipeline_youtube: %s is a new URL!", url)
-            download_youtube_video_pytube(video_url)
+            log.info("download_pipeline_youtube: %s is a new URL!", video_url)
+            with resource("network"):
+                download_youtube_video_pytube(video_url)
         except:
             try:
                 log.warning("download_pipeline_youtube: Downloading video %s with PyTube failed. Now trying to download it with yt_dlp.", video_id)
-                download_youtube_video_yt_dlp(video_url)
+                with resource("network"):
+                    download_youtube_video_yt_dlp(video_url)
             except:
                 log.error("download_pipeline_youtube: Downloading video %s failed with both PyTube and yt_dlp.", video_id)
-                return 500, "Internal error when trying to download the video. Please contact a developer."
+                raise StageError(500, "Internal error when trying to download the video. Please contact a developer.")
 
-        # * Extract meta data
+    # * Extract meta data
+    def metadata(context: dict):
         try:
-            meta_data = extract_meta_data_pytube(video_url)
+            with resource("network"):
+                context["meta_data"] = extract_meta_data_pytube(video_url)
         except:
             try:
                 log.warning("download_pipeline_youtube: Extracting meta data using PyTube failed. Now trying to extract it with yt_dlp.")
-                meta_data = extract_meta_data_yt_dlp(video_url)
+                with resource("network"):
+                    context["meta_data"] = extract_meta_data_yt_dlp(video_url)
             except:
                 log.error("download_pipeline_youtube: Extracting meta data failed with both PyTube and yt_dlp.")
-                return 500, "Internal error when trying to extract the video meta data. Please contact a developer."
+                raise StageError(500, "Internal error when trying to extract the video meta data. Please contact a developer.")
 
-        # * Visual Processing: Extract frames with description
+    # * Visual Processing: Extract frames with description
+    def visual(context: dict):
         try:
+            if not context["resumable"]["visual"]:
+                # Frames and descriptions of an earlier attempt with other parameters can not be continued
+                shutil.rmtree(f"{video_folder}/frames", ignore_errors=True)
+                shutil.rmtree(f"{video_folder}/frames_description", ignore_errors=True)
             # extract_frames_from_video(f"media/{video_id}/video/{video_id}.mp4", seconds_between_frames)
-            extract_frames_from_video(video_id, seconds_between_frames)
-            remove_duplicate_images(video_id, max_limit_similarity)
-            create_image_description(video_id, local_model=local_model)
+            with resource("cpu"):
+                extract_frames_from_video(video_id, seconds_between_frames)
+                remove_duplicate_images(video_id, max_limit_similarity)
+            with resource("llm"):
+                create_image_description(video_id, local_model=local_model)
         except Exception as e:
             log.error("download_pipeline_youtube: The visual processing failed: %s.", e)
-            return 500, "Internal error when trying to process the video visual. Please contact a developer."
-        
-        # * Audio Processing: Download and pre-process transcripts
+            raise StageError(500, "Internal error when trying to process the video visual. Please contact a developer.")
+
+    def restore_metadata(context: dict):
+        context["meta_data"] = manifest.stage("metadata")["data"]["meta_data"]
+
+    # * Audio Processing: Download and pre-process transcripts
+    def audio(context: dict):
         try:
-            download_preprocess_youtube_transcript(video_url, local_model=local_model)
-            # Read the downloaded transcript into the variable "processed_text_transcript"
-            with open(f"media/{video_id}/transcripts/{video_id}.txt", "r", encoding="utf-8") as file: # TODO: maybe directly return through method
-                processed_text_transcript = file.read()
+            with resource("llm"):
+                download_preprocess_youtube_transcript(video_url, local_model=local_model)
+            restore_transcript(context)
         except Exception as e:
             log.error("download_pipeline_youtube: The audio processing failed: %s.", e)
-            return 500, "Internal error when trying to process the video audio. Please contact a developer."
+            raise StageError(500, "Internal error when trying to process the video audio. Please contact a developer.")
+
+    def restore_transcript(context: dict):
+        # Read the downloaded transcript into the variable "processed_text_transcript"
+        with open(f"media/{video_id}/transcripts/{video_id}.txt", "r", encoding="utf-8") as file: # TODO: maybe directly return through method
+            context["processed_text_transcript"] = file.read()
 
-        # * Create Video Topic
+    # * Create Video Topic
+    def topic(context: dict):
         try:
-            create_topic_video(video_id, meta_data['title'], processed_text_transcript)
+            with resource("llm"):
+                create_topic_video(video_id, context["meta_data"]['title'], context["processed_text_transcript"])
         except Exception as e:
             log.error("download_pipeline_youtube: Transcript CSV could not be read: %s.", e)
-            return 500, "Internal error when trying to read Transcript CSV File. Please contact a developer."
+            raise StageError(500, "Internal error when trying to read Transcript CSV File. Please contact a developer.")
 
-        # * Chunking: Append timestamps, merge sentences and add chunk overlap
+    # * Chunking: Append timestamps, merge sentences and add chunk overlap
+    def chunking(context: dict):
+        processed_text_transcript = context["processed_text_transcript"]
         try:
             if not enabled_detailed_chunking:
                 extracted_time_sentence = extract_time_and_sentences(processed_text_transcript)
                 merged_sentence = merge_sentences_based_on_length(extracted_time_sentence, chunk_length)
                 chunked_text = add_chunk_overlap(merged_sentence, chunk_overlap_length)
             else:
-                detailed_llm_chunks = create_chunk_llm(processed_text_transcript)
-                check_detailed_llm_chunks = check_llm_chuncks(detailed_llm_chunks, chunk_max_length)
+                with resource("llm"):
+                    detailed_llm_chunks = create_chunk_llm(processed_text_transcript)
+                    check_detailed_llm_chunks = check_llm_chuncks(detailed_llm_chunks, chunk_max_length)
                 format_detailed_llm_chunks = format_llm_chunks(check_detailed_llm_chunks)
                 chunked_text = add_chunk_overlap(format_detailed_llm_chunks, chunk_overlap_length)
-            append_meta_data(meta_data, video_id, chunked_text)
+            append_meta_data(context["meta_data"], video_id, chunked_text)
         except Exception as e:
             log.error("download_pipeline_youtube: The chunking failed: %s.", e)
-            return 500, "Internal error when trying to chunk the video content. Please contact a developer."
+            raise StageError(500, "Internal error when trying to chunk the video content. Please contact a developer.")
 
-        # * Embed text chunks
-        # ! Deprecated
+    # * Embed text chunks
+    # ! Deprecated
+    def embedding(context: dict):
         try:
-            embed_text_chunks(video_id)
+            with resource("llm"):
+                embed_text_chunks(video_id)
         except Exception as e:
             log.error("download_pipeline_youtube: The embedding of the chunked data failed: %s.", e)
-            return 500, "Internal error when trying to embed the chunked data. Please contact a developer."
+            raise StageError(500, "Internal error when trying to embed the chunked data. Please contact a developer.")
 
-        # * Integrate data into VectorDB
+    # * Integrate data into VectorDB
+    def vector_db(context: dict):
         try:
-            generate_vector_db(video_id)
+            with resource("db"):
+                generate_vector_db(video_id)
         except Exception as e:
             log.error("download_pipeline_youtube: The embedding of the chunked data in VectorDB failed: %s.", e)
-            return 500, "Internal error when trying to generate the vector db. Please contact a developer."
+            raise StageError(500, "Internal error when trying to generate the vector db. Please contact a developer.")
 
-        # * Integrate data into GraphDB
+    # * Integrate data into GraphDB
+    def graph_db(context: dict):
         try:
-            load_csv_to_graphdb(meta_data, video_id)
+            # Mostly entity and relation extraction with the LLM, the graph stores are safe for concurrent writes
+            with resource("llm"):
+                load_csv_to_graphdb(context["meta_data"], video_id)
             log.info("download_pipeline_youtube: Transcripts CSV for video %s successfully inserted into the GraphDB.", video_id)
         except Exception as e:
             log.error("download_pipeline_youtube: Transcripts CSV for video %s could not be inserted into the GraphDB: %s.", video_id, e)
-            return 500, "Internal error when trying Insert Data into GraphDB. Please contact a developer."
+            raise StageError(500, "Internal error when trying Insert Data into GraphDB. Please contact a developer.")
+
+    # The transcript is downloaded from YouTube, not taken from the video file. The chunk CSV is rewritten by the
+    # embedding stage, so both loads read it afterwards. Both loads also store the frame descriptions.
+    graph = StageGraph([
+        Stage("download", checkpointed("download", download)),
+        Stage("metadata", checkpointed("metadata", metadata), restore=restore_metadata),
+        Stage("visual", checkpointed("visual", visual), after=("download",)),
+        Stage("audio", checkpointed("audio", audio), restore=restore_transcript),
+        Stage("topic", checkpointed("topic", topic), after=("metadata", "audio")),
+        Stage("chunking", checkpointed("chunking", chunking), after=("topic",)),
+        Stage("embedding", checkpointed("embedding", embedding), after=("chunking",)),
+        Stage("vector_db", checkpointed("vector_db", vector_db), after=("embedding", "visual")),
+        Stage("graph_db", checkpointed("graph_db", graph_db), after=("embedding", "visual"))
+    ])
+    skip = graph.resumable(lambda name: manifest.is_complete(name, parameters[name])) if resume else set()
+    if skip:
+        log.info("download_pipeline_youtube: Resuming video %s, skipping the completed stages %s.", video_id, sorted(skip))
+    context = {}
+    try:
+        result = graph.run(video_id, progress, context, skip=skip)
+    except StageError as e:
+        return e.status_code, e.message
 
-        processed_video_titles.append(meta_data['title']) # Add this video title to the list of successfully processed videos
-
-    # * Log results and return appropriate message to the user
-    if len(processed_video_titles) == 0:
-        log.warning("download_pipeline_youtube: YouTube content for URL %s was already processed.", url)
-        return 200, "YouTube content was already processed."
-    elif len(processed_video_titles) == 1:
-        log.info("download_pipeline_youtube: YouTube content for video %s successfully processed! ", url)
-        return 201, f"YouTube video with title {processed_video_titles[0]} successfully processed!"
-    else:
-        log.info("download_pipeline_youtube: YouTube content for playlist %s successfully processed!", url)
-        response = "YouTube playlist successfully processed!\nProcessed videos:\n\n"
-        response += "\n".join([f"{i + 1}. {title}" for i, title in enumerate(processed_video_titles)])
-        return 201, response
+    progress.finish_video(video_id, timings=result.to_dict())
+    return 201, context["meta_data"]['title']
 
 
 def video_with_id_already_downloaded(id: str):
@@ -318,16 +503,11 @@ def model_exists(model_name: str):
     Example:
         model_exists("llama3.2-vision")
     """
-    try:
-        # Get the list of available models
-        result = subprocess.run(["ollama", "list"], capture_output=True, text=True, check=True)
-        models = result.stdout.splitlines()
-        # Check if the specified model is in the list
-        return any(model_name in model for model in models), "Model not found" # Message here is only used, if False is returned. It does not make sense in the True case.
-    except subprocess.CalledProcessError as e:
-        # Error occured while checking models
-        return False, "Error occured"
-    except FileNotFoundError:
-        # Ollama command-line tool is not installed or not in PATH
+    # Model list of the cached Ollama health probe instead of one `ollama list` process per model
+    ollama_health = get_health_checker().check("ollama")
+    if not ollama_health.healthy:
         return False, "Ollama not found"
+    models = ollama_health.details["models"]
+    # Check if the specified model is in the list, with or without tag
+    return any(model == model_name or model.startswith(f"{model_name}:") for model in models), "Model not found" # Message here is only used, if False is returned. It does not make sense in the True case.
     
\ No newline at end of file
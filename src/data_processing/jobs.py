@@ -0,0 +1,381 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Callable, Iterator
+from urllib.parse import urlparse, parse_qs
+
+# Same logger as .logger, without configuring the log file on import
+log = logging.getLogger("data_processing")
+
+INGESTION_JOB_WORKERS = int(os.getenv("INGESTION_JOB_WORKERS", "1"))
+INGESTION_MAX_FINISHED_JOBS = int(os.getenv("INGESTION_MAX_FINISHED_JOBS", "100"))
+
+FINISHED_STATES = ("succeeded", "failed", "cancelled")
+
+job_manager = None
+job_manager_lock = threading.Lock()
+
+
+class JobCancelled(Exception):
+    """Raised inside the pipeline at the next stage boundary after a job was cancelled."""
+
+
+class PipelineProgress:
+    """
+    Progress callbacks of download_pipeline_youtube.
+
+    This base class does nothing, so the pipeline can still be called directly. JobProgress records the
+    progress of an ingestion job.
+    """
+
+    def start_video(self, video_id: str, index: int, total: int):
+        """Called before a video is processed, index starts at 1."""
+
+    def start_stage(self, video_id: str, stage: str):
+        """Called before each stage of a video. Independent stages of a video can run at the same time."""
+
+    def finish_stage(self, video_id: str, stage: str, state: str = "done"):
+        """Called after a stage of a video finished ("done"), failed ("failed") or was skipped ("skipped") when resuming."""
+
+    def finish_video(self, video_id: str, state: str = "done", timings: dict | None = None):
+        """
+        Called after a video was processed ("done") or skipped ("skipped").
+
+        `timings` is the StageGraphResult.to_dict() of a processed video: the seconds per stage and the critical path.
+        """
+
+    def fail_video(self, video_id: str, message: str):
+        """Called after processing a video failed, the other videos of a playlist continue."""
+
+
+class Job:
+    """
+    State of one ingestion job.
+
+    Every change is appended to `events`, which the SSE stream replays and follows.
+    """
+
+    def __init__(self, key: str, url: str, parameters: dict):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.url = url
+        self.parameters = parameters
+        self.state = "queued"
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.status_code = None
+        self.message = None
+        self.videos: dict[str, dict] = {}
+        self.events: list[dict] = []
+        self.condition = threading.Condition()
+        self.cancel_requested = threading.Event()
+        self.done = threading.Event()
+
+    @property
+    def finished(self) -> bool:
+        return self.state in FINISHED_STATES
+
+    def add_event(self, event_type: str, **data):
+        with self.condition:
+            self.events.append({"id": len(self.events) + 1, "type": event_type, "job_id": self.id, "time": time.time(), **data})
+            self.condition.notify_all()
+
+    def set_state(self, state: str, status_code: int | None = None, message: str | None = None):
+        with self.condition:
+            self.state = state
+            if state == "running":
+                self.started_at = time.time()
+            if state in FINISHED_STATES:
+                self.finished_at = time.time()
+                self.status_code = status_code
+                self.message = message
+            # In the same critical section, so a reader seeing the final state also sees its event
+            self.add_event("state", state=state, status_code=status_code, message=message)
+        if state in FINISHED_STATES:
+            self.done.set()
+
+    def to_dict(self) -> dict:
+        with self.condition:
+            return {
+                "job_id": self.id,
+                "key": self.key,
+                "url": self.url,
+                "state": self.state,
+                "created_at": self.created_at,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+                "status_code": self.status_code,
+                "message": self.message,
+                "videos": {video_id: {**video, "running": list(video["running"]), "stages": {name: dict(stage) for name, stage in video["stages"].items()}} for video_id, video in self.videos.items()},
+                "cancel_requested": self.cancel_requested.is_set()
+            }
+
+
+class JobProgress(PipelineProgress):
+    """Records the per-video and per-stage progress of a job and stops it at the next stage after a cancellation."""
+
+    def __init__(self, manager: "JobManager", job: Job):
+        self.manager = manager
+        self.job = job
+
+    def _check_cancelled(self):
+        if self.job.cancel_requested.is_set():
+            raise JobCancelled(f"Job {self.job.id} was cancelled")
+
+    def _finish_running_stage(self, video: dict, state: str):
+        for stage in video["stages"].values():
+            if stage["state"] == "running":
+                stage["state"] = state
+                stage["finished_at"] = time.time()
+        video["running"] = []
+
+    def start_video(self, video_id: str, index: int, total: int):
+        self._check_cancelled()
+        # Another job processing the same video at the moment finishes it first, it is skipped here afterwards
+        self.manager.claim_video(self.job, video_id)
+        with self.job.condition:
+            self.job.videos[video_id] = {"index": index, "total": total, "state": "running", "stage": None, "running": [], "stages": {}}
+        self.job.add_event("video", video_id=video_id, index=index, total=total, state="running")
+
+    def start_stage(self, video_id: str, stage: str):
+        self._check_cancelled()
+        with self.job.condition:
+            video = self.job.videos[video_id]
+            video["stage"] = stage
+            video["running"].append(stage)
+            video["stages"][stage] = {"state": "running", "started_at": time.time(), "finished_at": None}
+        self.job.add_event("stage", video_id=video_id, index=video["index"], total=video["total"], stage=stage, state="running")
+
+    def finish_stage(self, video_id: str, stage: str, state: str = "done"):
+        with self.job.condition:
+            video = self.job.videos[video_id]
+            video["stages"].setdefault(stage, {"started_at": None}).update(state=state, finished_at=time.time())
+            if stage in video["running"]:
+                video["running"].remove(stage)
+            video["stage"] = video["running"][-1] if video["running"] else None
+        self.job.add_event("stage", video_id=video_id, index=video["index"], total=video["total"], stage=stage, state=state)
+
+    def finish_video(self, video_id: str, state: str = "done", timings: dict | None = None):
+        with self.job.condition:
+            video = self.job.videos[video_id]
+            self._finish_running_stage(video, "done")
+            video["state"] = state
+            video["stage"] = None
+            if timings is not None:
+                video["timings"] = timings
+        self.job.add_event("video", video_id=video_id, index=video["index"], total=video["total"], state=state)
+        self.manager.release_video(self.job, video_id)
+
+    def fail_video(self, video_id: str, message: str):
+        with self.job.condition:
+            video = self.job.videos.get(video_id)
+            if video is None:
+                return
+            self._finish_running_stage(video, "failed")
+            video["state"] = "failed"
+            video["stage"] = None
+            video["error"] = message
+        self.job.add_event("video", video_id=video_id, index=video["index"], total=video["total"], state="failed", message=message)
+        self.manager.release_video(self.job, video_id)
+
+    def fail_running(self, state: str = "failed"):
+        """Mark the video and stage which were running when the pipeline stopped."""
+        with self.job.condition:
+            for video in self.job.videos.values():
+                if video["state"] == "running":
+                    self._finish_running_stage(video, state)
+                    video["state"] = state
+
+
+def get_job_key(url: str) -> str:
+    """
+    Key for the deduplication of jobs: the video ID of a video URL or the playlist ID of a playlist URL.
+
+    Example:
+        get_job_key("https://www.youtube.com/watch?v=dQw4w9WgXcQ") # "video:dQw4w9WgXcQ"
+    """
+    query = parse_qs(urlparse(url).query)
+    if "list" in query:
+        return f"playlist:{query['list'][0]}"
+    if "v" in query:
+        return f"video:{query['v'][0]}"
+    return f"url:{url}"
+
+
+class JobManager:
+    """
+    Runs ingestion jobs on a bounded thread pool.
+
+    A submission for a video or playlist which is already queued or running returns the existing job. A video
+    is processed by one job at a time, a job reaching a video that another job is processing waits for it.
+    Jobs are kept in memory, the last `max_finished_jobs` finished jobs can still be queried.
+
+    Example:
+        job, created = get_job_manager().submit(url, lambda progress: download_pipeline_youtube(url, progress=progress))
+    """
+
+    def __init__(self, workers: int = INGESTION_JOB_WORKERS, max_finished_jobs: int = INGESTION_MAX_FINISHED_JOBS):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ingestion-job")
+        self.max_finished_jobs = max_finished_jobs
+        self.jobs: dict[str, Job] = {}
+        self.active_keys: dict[str, str] = {}
+        self.active_videos: dict[str, str] = {}
+        self.lock = threading.Lock()
+
+    def submit(self, url: str, run: Callable[[PipelineProgress], tuple[int, str]], parameters: dict | None = None) -> tuple[Job, bool]:
+        """
+        Enqueue a job unless one for the same video or playlist is queued or running.
+
+        Args:
+            url (str): YouTube video or playlist URL.
+            run (Callable): Runs the pipeline with the given progress and returns its status code and message.
+            parameters (dict, optional): Request parameters, only reported.
+
+        Returns:
+            tuple: The job and True if it was created, False if an existing job was returned.
+        """
+        key = get_job_key(url)
+        with self.lock:
+            existing_id = self.active_keys.get(key)
+            if existing_id is not None:
+                log.info("JobManager: Deduplicated submission for %s to job %s.", key, existing_id)
+                return self.jobs[existing_id], False
+            job = Job(key, url, parameters or {})
+            self.jobs[job.id] = job
+            self.active_keys[key] = job.id
+            self._prune()
+        job.add_event("state", state="queued")
+        log.info("JobManager: Queued job %s for %s.", job.id, key)
+        self.executor.submit(self._run, job, run)
+        return job, True
+
+    def _run(self, job: Job, run: Callable[[PipelineProgress], tuple[int, str]]):
+        progress = JobProgress(self, job)
+        try:
+            if job.cancel_requested.is_set():
+                job.set_state("cancelled", 499, "The job was cancelled before it started.")
+                return
+            job.set_state("running")
+            status_code, message = run(progress)
+            if status_code in range(200, 300):
+                job.set_state("succeeded", status_code, message)
+            else:
+                progress.fail_running()
+                job.set_state("failed", status_code, message)
+        except JobCancelled:
+            progress.fail_running("cancelled")
+            job.set_state("cancelled", 499, "The job was cancelled.")
+        except Exception as e:
+            log.error("JobManager: Job %s failed: %s.", job.id, e)
+            progress.fail_running()
+            job.set_state("failed", 500, f"Internal error: {e}")
+        finally:
+            with self.lock:
+                self.active_keys.pop(job.key, None)
+                for video_id in [video_id for video_id, job_id in self.active_videos.items() if job_id == job.id]:
+                    del self.active_videos[video_id]
+            log.info("JobManager: Job %s %s.", job.id, job.state)
+
+    def _prune(self):
+        finished = sorted((job for job in self.jobs.values() if job.finished), key=lambda job: job.finished_at)
+        for job in finished[:max(0, len(finished) - self.max_finished_jobs)]:
+            del self.jobs[job.id]
+
+    def claim_video(self, job: Job, video_id: str):
+        """Wait until no other job processes the video, then claim it for `job`."""
+        while True:
+            with self.lock:
+                owner_id = self.active_videos.get(video_id)
+                # A finished owner may already be pruned from the jobs
+                owner = self.jobs.get(owner_id) if owner_id is not None else None
+                if owner is None or owner_id == job.id:
+                    self.active_videos[video_id] = job.id
+                    return
+            log.info("JobManager: Job %s waits for job %s to finish video %s.", job.id, owner_id, video_id)
+            owner.done.wait(timeout=1)
+            if job.cancel_requested.is_set():
+                raise JobCancelled(f"Job {job.id} was cancelled")
+
+    def release_video(self, job: Job, video_id: str):
+        with self.lock:
+            if self.active_videos.get(video_id) == job.id:
+                del self.active_videos[video_id]
+
+    def get(self, job_id: str) -> Job | None:
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> Job | None:
+        """Request the cancellation of a job. A running job stops before its next stage."""
+        job = self.get(job_id)
+        if job is not None and not job.finished:
+            job.cancel_requested.set()
+            job.add_event("cancel_requested")
+            log.info("JobManager: Cancellation of job %s requested.", job_id)
+        return job
+
+    def events(self, job_id: str, after: int = 0, heartbeat: float = 15) -> Iterator[dict | None]:
+        """
+        Replay the events of a job after the event ID `after` and follow new events until the job finished.
+
+        Yields:
+            dict: The next event, or None after `heartbeat` seconds without events.
+        """
+        job = self.get(job_id)
+        if job is None:
+            return
+        index = after
+        while True:
+            with job.condition:
+                if index >= len(job.events) and not job.finished:
+                    job.condition.wait(timeout=heartbeat)
+                new_events = job.events[index:]
+                finished = job.finished
+            index += len(new_events)
+            if not new_events and not finished:
+                yield None
+            for event in new_events:
+                yield event
+            if finished and index >= len(job.events):
+                return
+
+    async def events_async(self, job_id: str, after: int = 0, heartbeat: float = 15, poll: float = 0.5) -> AsyncIterator[dict | None]:
+        """
+        Same as events for the event loop: polls the events every `poll` seconds instead of waiting on the condition,
+        so a subscriber does not hold a thread for the whole job.
+        """
+        job = self.get(job_id)
+        if job is None:
+            return
+        index = after
+        idle = 0.0
+        while True:
+            with job.condition:
+                new_events = job.events[index:]
+                finished = job.finished
+            index += len(new_events)
+            for event in new_events:
+                yield event
+            if finished and index >= len(job.events):
+                return
+            if new_events:
+                idle = 0.0
+            elif idle >= heartbeat:
+                idle = 0.0
+                yield None
+            await asyncio.sleep(poll)
+            idle += poll
+
+
+def get_job_manager() -> JobManager:
+    global job_manager
+
+    with job_manager_lock:
+        if job_manager is None:
+            job_manager = JobManager()
+        return job_manager
@@ -0,0 +1,142 @@
+"""
+Concurrent model calls of the ingestion.
+
+The Gemini and Ollama clients only offer blocking calls, so LLMClient runs them on a thread pool from an asyncio
+event loop. A semaphore bounds the calls in flight per map and the "llm" resource class (resources.py) the stages
+issuing them across videos. The rate limiter of the provider (rate_limiter.py) still spaces the calls within the
+quota, and the model cache answers repeated calls without a request. n calls take about the latency of one call
+times n / LLM_CONCURRENCY.
+
+LLM_TIMEOUT is the timeout of the HTTP request itself (model_calls.py), so waiting for the rate limiter does not count
+against it and a timed out request does not keep running on its thread.
+"""
+
+import asyncio
+import logging
+import os
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Same logger as .logger, without configuring the log file on import
+log = logging.getLogger("data_processing")
+
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "8"))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "120"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+
+llm_client = None
+llm_client_lock = threading.Lock()
+
+
+class EmptyResponseError(Exception):
+    """Raised by a call whose response could not be used, the call is retried like a transient failure."""
+
+
+def is_transient_error(error: BaseException) -> bool:
+    """Timeouts, connection errors, 5xx responses and empty responses are retried, everything else is raised."""
+    if isinstance(error, (asyncio.TimeoutError, TimeoutError, ConnectionError, EmptyResponseError)):
+        return True
+    if type(error).__name__ in ("ServiceUnavailable", "InternalServerError", "DeadlineExceeded", "ConnectError", "ConnectTimeout", "ReadTimeout"):
+        return True
+    status_code = getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+    return isinstance(status_code, int) and status_code >= 500
+
+
+class LLMClient:
+    """
+    Runs blocking model calls concurrently with bounded concurrency and retries.
+
+    Example:
+        descriptions = get_llm_client().map(lambda path: chat_ollama("llama3.2-vision", prompt, image_paths=[path]), image_paths)
+    """
+
+    def __init__(self, concurrency: int = LLM_CONCURRENCY, max_retries: int = LLM_MAX_RETRIES, base_backoff: float = 1):
+        self.concurrency = max(1, concurrency)
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+
+    async def call(self, function: Callable[[], object], semaphore: asyncio.Semaphore, executor: ThreadPoolExecutor):
+        """
+        One call on the thread pool, retried with exponential backoff and jitter after a transient failure.
+
+        The call is not timed here: the rate limiter retries 429s itself and the HTTP request has its own timeout,
+        whose error is retried like any other transient failure.
+        """
+        loop = asyncio.get_running_loop()
+        for attempt in range(self.max_retries + 1):
+            try:
+                async with semaphore:
+                    return await loop.run_in_executor(executor, function)
+            except Exception as e:
+                if not is_transient_error(e) or attempt == self.max_retries:
+                    raise
+                backoff = random.uniform(0, self.base_backoff * 2 ** attempt)
+                log.warning("LLMClient: Attempt %s failed with %s, retrying in %.1fs.", attempt + 1, type(e).__name__, backoff)
+                await asyncio.sleep(backoff)
+
+    async def map_async(self, function: Callable[[object], object], items: Iterable, on_result: Callable[[int, object], None] | None = None, return_exceptions: bool = False) -> list:
+        """
+        Call `function` for every item concurrently.
+
+        Args:
+            function (Callable): Blocking call for one item.
+            items (Iterable): Inputs of the calls.
+            on_result (Callable, optional): Called with the index and result of every call as soon as it finished,
+                one at a time, e.g. to persist results incrementally.
+            return_exceptions (bool, optional): Return the exception of a failed call in its place instead of raising it.
+
+        Returns:
+            list: The results in the order of the items.
+        """
+        items = list(items)
+        semaphore = asyncio.Semaphore(self.concurrency)
+        # One thread per call in flight
+        executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="llm-call")
+
+        async def run(index: int, item):
+            try:
+                result = await self.call(lambda: function(item), semaphore, executor)
+            except Exception as e:
+                if not return_exceptions:
+                    raise
+                log.error("LLMClient: Call %s of %s failed: %s.", index + 1, len(items), e)
+                return e
+            if on_result is not None:
+                on_result(index, result)
+            return result
+
+        tasks = [asyncio.ensure_future(run(index, item)) for index, item in enumerate(items)]
+        try:
+            return await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+        finally:
+            # Calls of cancelled tasks which already started finish on their own
+            executor.shutdown(wait=False)
+
+    def map(self, function: Callable[[object], object], items: Iterable, on_result: Callable[[int, object], None] | None = None, return_exceptions: bool = False) -> list:
+        """Blocking map_async for the synchronous pipeline, runs its own event loop on the calling thread."""
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(self.map_async(function, items, on_result, return_exceptions))
+        # Called from a coroutine: the loop of the caller can not be blocked, so run on a separate thread
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            return executor.submit(asyncio.run, self.map_async(function, items, on_result, return_exceptions)).result()
+
+
+def get_llm_client() -> LLMClient:
+    global llm_client
+
+    with llm_client_lock:
+        if llm_client is None:
+            llm_client = LLMClient()
+        return llm_client
@@ -52,12 +52,20 @@ def write_empty_line(filename: str):
 
 def clean_up_logger():
     # Clean up logging
-    # Read file content
-    with open(os.getenv("LOG_FILE_PATH"), "r") as file:
-        lines = file.readlines()
-    # Process lines
-    while lines and "HTTP Request: POST" in lines[-1]:
-        lines.pop()
-    # Write the result back to the file
-    with open(os.getenv("LOG_FILE_PATH"), "w") as file:
-        file.writelines(lines)
+    # Videos are processed in parallel, hold the handler locks so no record is written between reading and rewriting the file
+    handlers = logging.getLogger().handlers
+    for handler in handlers:
+        handler.acquire()
+    try:
+        # Read file content
+        with open(os.getenv("LOG_FILE_PATH"), "r") as file:
+            lines = file.readlines()
+        # Process lines
+        while lines and "HTTP Request: POST" in lines[-1]:
+            lines.pop()
+        # Write the result back to the file
+        with open(os.getenv("LOG_FILE_PATH"), "w") as file:
+            file.writelines(lines)
+    finally:
+        for handler in reversed(handlers):
+            handler.release()
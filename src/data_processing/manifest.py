@@ -0,0 +1,133 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+# Same logger as .logger, without configuring the log file on import
+log = logging.getLogger("data_processing")
+
+MANIFEST_FILE = "manifest.json"
+MANIFEST_VERSION = 1
+
+
+def hash_output(path: str) -> str | None:
+    """
+    SHA-256 of a file, or of the names and contents of all files below a folder.
+
+    Returns:
+        str: The hex digest, None if the path does not exist.
+    """
+    if os.path.isfile(path):
+        paths = [path]
+    elif os.path.isdir(path):
+        paths = sorted(os.path.join(root, name) for root, _, names in os.walk(path) for name in names)
+    else:
+        return None
+    sha256 = hashlib.sha256()
+    for file_path in paths:
+        sha256.update(os.path.relpath(file_path, path).encode("utf-8"))
+        with open(file_path, "rb") as file:
+            for block in iter(lambda: file.read(1 << 20), b""):
+                sha256.update(block)
+    return sha256.hexdigest()
+
+
+class VideoManifest:
+    """
+    Completion markers of the stages of one video, stored in `<video folder>/manifest.json`.
+
+    A stage is complete if it finished with the same parameters and all of its outputs still have the recorded
+    hash. Several stages of a video run at the same time, so one instance is shared by them and every change is
+    written atomically.
+
+    Example:
+        manifest = VideoManifest("dQw4w9WgXcQ", "media/dQw4w9WgXcQ")
+        if not manifest.is_complete("audio", {"local_model": False}):
+            ...
+            manifest.mark_done("audio", {"local_model": False}, outputs=["transcripts/dQw4w9WgXcQ.txt"])
+    """
+
+    def __init__(self, video_id: str, folder: str):
+        self.video_id = video_id
+        self.folder = folder
+        self.path = os.path.join(folder, MANIFEST_FILE)
+        self.lock = threading.RLock()
+        self.data = {"video_id": video_id, "version": MANIFEST_VERSION, "stages": {}}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "r", encoding="utf-8") as file:
+                    data = json.load(file)
+                if data.get("version") == MANIFEST_VERSION:
+                    self.data = data
+                else:
+                    log.warning("VideoManifest: Ignoring manifest of video %s with version %s.", video_id, data.get("version"))
+            except (OSError, ValueError) as e:
+                log.warning("VideoManifest: Manifest of video %s could not be read, all stages run again: %s.", video_id, e)
+
+    @property
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    def stage(self, name: str) -> dict | None:
+        with self.lock:
+            return self.data["stages"].get(name)
+
+    def _save(self):
+        os.makedirs(self.folder, exist_ok=True)
+        temporary_path = f"{self.path}.{threading.get_ident()}.tmp"
+        with open(temporary_path, "w", encoding="utf-8") as file:
+            json.dump(self.data, file, indent=2, default=str)
+        os.replace(temporary_path, self.path)
+
+    def start(self, name: str, parameters: dict) -> bool:
+        """
+        Record the start of a stage.
+
+        Returns:
+            bool: True if the partial results of an earlier attempt used the same parameters and can be continued.
+        """
+        with self.lock:
+            previous = self.data["stages"].get(name)
+            resumable = previous is not None and previous.get("parameters") == parameters
+            self.data["stages"][name] = {"state": "running", "parameters": parameters, "started_at": time.time()}
+            self._save()
+            return resumable
+
+    def mark_done(self, name: str, parameters: dict, outputs: list[str] = (), data: dict | None = None):
+        """
+        Record a finished stage with the hashes of its outputs, relative to the video folder.
+
+        A stage rewriting the output of an earlier stage (embedding extends the chunk CSV) also updates the hash
+        recorded for that stage, so the earlier stage stays complete.
+        """
+        hashes = {output: hash_output(os.path.join(self.folder, output)) for output in outputs}
+        with self.lock:
+            for other in self.data["stages"].values():
+                for output in other.get("outputs", {}):
+                    if output in hashes:
+                        other["outputs"][output] = hashes[output]
+            self.data["stages"][name] = {"state": "done", "parameters": parameters, "finished_at": time.time(), "outputs": hashes, "data": data}
+            self._save()
+
+    def mark_failed(self, name: str, error: str):
+        with self.lock:
+            stage = self.data["stages"].setdefault(name, {})
+            stage.update(state="failed", error=error, finished_at=time.time())
+            self._save()
+
+    def is_complete(self, name: str, parameters: dict) -> bool:
+        """True if the stage finished with these parameters and its outputs are unchanged."""
+        stage = self.stage(name)
+        if stage is None or stage.get("state") != "done" or stage.get("parameters") != parameters:
+            return False
+        for output, recorded in stage.get("outputs", {}).items():
+            if recorded is None or hash_output(os.path.join(self.folder, output)) != recorded:
+                log.warning("VideoManifest: Output %s of stage %s of video %s changed, the stage runs again.", output, name, self.video_id)
+                return False
+        return True
+
+    def to_dict(self) -> dict:
+        with self.lock:
+            return json.loads(json.dumps(self.data, default=str))
@@ -0,0 +1,142 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Same logger as .logger, without configuring the log file on import
+log = logging.getLogger("data_processing")
+
+MODEL_CACHE_ENABLED = os.getenv("MODEL_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+MODEL_CACHE_PATH = os.getenv("MODEL_CACHE_PATH", "db/model_cache.sqlite")
+MODEL_CACHE_MAX_MB = float(os.getenv("MODEL_CACHE_MAX_MB", "512"))
+
+model_cache = None
+model_cache_lock = threading.Lock()
+
+
+class ModelCache:
+    """
+    Persistent cache of model responses in SQLite.
+
+    An entry is addressed by provider, model, prompt hash and input hash (see model_calls.py), so the same request
+    is answered from the cache across videos, jobs and restarts. Once the stored responses exceed `max_bytes`, the
+    least recently used entries are evicted. Hits and misses are counted per provider and kind of call.
+
+    Example:
+        cache = ModelCache("db/model_cache.sqlite", max_bytes=512 * 1024 * 1024)
+        value = cache.get(key)
+    """
+
+    def __init__(self, path: str, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.counters = defaultdict(lambda: {"hits": 0, "misses": 0})
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS model_cache (
+                key TEXT PRIMARY KEY,
+                provider TEXT NOT NULL,
+                model TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                prompt_hash TEXT NOT NULL,
+                input_hash TEXT NOT NULL,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_used_at REAL NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        self.connection.execute("CREATE INDEX IF NOT EXISTS model_cache_last_used_at ON model_cache (last_used_at)")
+        self.connection.commit()
+
+    def get(self, key: str, provider: str = "", kind: str = ""):
+        """
+        Cached response for the key, None on a miss.
+        """
+        with self.lock:
+            row = self.connection.execute("SELECT value FROM model_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.counters[(provider, kind)]["misses"] += 1
+                return None
+            self.connection.execute("UPDATE model_cache SET last_used_at = ?, hits = hits + 1 WHERE key = ?", (time.time(), key))
+            self.connection.commit()
+            self.counters[(provider, kind)]["hits"] += 1
+        return json.loads(row[0])
+
+    def put(self, key: str, value, provider: str, model: str, kind: str, prompt_hash: str, input_hash: str):
+        """
+        Store a JSON serializable response and evict the least recently used entries above the size limit.
+        """
+        serialized = json.dumps(value)
+        now = time.time()
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO model_cache (key, provider, model, kind, prompt_hash, input_hash, value, size, created_at, last_used_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, provider, model, kind, prompt_hash, input_hash, serialized, len(serialized.encode("utf-8")), now, now)
+            )
+            self._evict()
+            self.connection.commit()
+
+    def _evict(self):
+        total = self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM model_cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        evicted = 0
+        for key, size in self.connection.execute("SELECT key, size FROM model_cache ORDER BY last_used_at").fetchall():
+            if total <= self.max_bytes:
+                break
+            self.connection.execute("DELETE FROM model_cache WHERE key = ?", (key,))
+            total -= size
+            evicted += 1
+        log.info("ModelCache: Evicted %s entries, %s bytes remain.", evicted, total)
+
+    def clear(self):
+        with self.lock:
+            self.connection.execute("DELETE FROM model_cache")
+            self.connection.commit()
+
+    def stats(self) -> dict:
+        """
+        Entries and size of the cache, and hits, misses and hit rate of this process per provider and kind.
+        """
+        with self.lock:
+            entries, size = self.connection.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM model_cache").fetchone()
+            counters = {f"{provider}/{kind}": dict(values) for (provider, kind), values in self.counters.items()}
+        for values in counters.values():
+            values["hit_rate"] = round(values["hits"] / (values["hits"] + values["misses"]), 3)
+        hits = sum(values["hits"] for values in counters.values())
+        misses = sum(values["misses"] for values in counters.values())
+        return {
+            "entries": entries,
+            "size_bytes": size,
+            "max_bytes": self.max_bytes,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / (hits + misses), 3) if hits + misses else None,
+            "calls": counters
+        }
+
+
+def get_model_cache() -> ModelCache | None:
+    """Process-wide cache at MODEL_CACHE_PATH, None if MODEL_CACHE_ENABLED is false."""
+    global model_cache
+
+    if not MODEL_CACHE_ENABLED:
+        return None
+    with model_cache_lock:
+        if model_cache is None:
+            model_cache = ModelCache(MODEL_CACHE_PATH, int(MODEL_CACHE_MAX_MB * 1024 * 1024))
+        return model_cache
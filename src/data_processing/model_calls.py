@@ -0,0 +1,168 @@
+"""
+Generation and embedding calls of the ingestion, answered from the model cache if the same call was made before.
+
+The prompt (instructions, system instruction) and the input (transcript, chunk, image bytes) are hashed separately,
+so the cache can tell which part of a call changed. Re-ingesting a video with other chunking parameters repeats the
+transcript correction, topic, frame descriptions and entity extraction from the cache.
+"""
+
+import hashlib
+import json
+import logging
+from functools import lru_cache
+from typing import Callable
+
+from .llm_client import LLM_TIMEOUT
+from .model_cache import get_model_cache
+from .rate_limiter import get_rate_limiter, estimate_tokens
+from src.providers.providers import get_gemini_client, get_ollama_host
+
+# Same logger as .logger, without configuring the log file on import
+log = logging.getLogger("data_processing")
+
+
+def hash_content(*parts) -> str:
+    """
+    SHA-256 over text, bytes and image parts.
+
+    Example:
+        hash_content("Describe the image", PIL.Image.open("frame0_0.0.jpg"))
+    """
+    sha256 = hashlib.sha256()
+    for part in parts:
+        if part is None:
+            data = b"\x00"
+        elif isinstance(part, bytes):
+            data = part
+        elif isinstance(part, str):
+            data = part.encode("utf-8")
+        elif hasattr(part, "tobytes"):
+            # PIL image: the decoded pixels, independent of the file name
+            data = f"{part.mode}:{part.size}:".encode("utf-8") + part.tobytes()
+        else:
+            data = json.dumps(part, sort_keys=True, default=str).encode("utf-8")
+        sha256.update(len(data).to_bytes(8, "big"))
+        sha256.update(data)
+    return sha256.hexdigest()
+
+
+def cached_call(provider: str, model: str, kind: str, prompt, inputs, call: Callable[[], object]):
+    """
+    Return the cached response of a model call or make the call and cache its response.
+
+    Args:
+        provider (str): "gemini" or "ollama".
+        model (str): Model name.
+        kind (str): "generate", "chat" or "embed".
+        prompt: Instructions of the call, hashed with hash_content.
+        inputs: Content of the call, hashed with hash_content.
+        call (Callable): Makes the call, returns a JSON serializable response. Empty responses are not cached.
+    """
+    cache = get_model_cache()
+    if cache is None:
+        return call()
+    prompt_hash = hash_content(*(prompt if isinstance(prompt, (list, tuple)) else [prompt]))
+    input_hash = hash_content(*(inputs if isinstance(inputs, (list, tuple)) else [inputs]))
+    key = hash_content(provider, model, kind, prompt_hash, input_hash)
+
+    cached = cache.get(key, provider, kind)
+    if cached is not None:
+        log.debug("cached_call: Cache hit for %s %s %s.", provider, model, kind)
+        return cached
+    value = call()
+    if value:
+        cache.put(key, value, provider, model, kind, prompt_hash, input_hash)
+    return value
+
+
+def image_part(image):
+    """
+    Gemini request part with the bytes of a PIL image, in its own format or PNG if it has none.
+
+    Example:
+        image_part(PIL.Image.open("media/abc/frames/frame0_0.0.jpg"))
+    """
+    import io
+    from google.ai import generativelanguage as glm
+    from PIL import Image
+
+    image_format = image.format or "PNG"
+    buffer = io.BytesIO()
+    image.save(buffer, format=image_format)
+    return glm.Part(inline_data=glm.Blob(mime_type=Image.MIME.get(image_format, "image/png"), data=buffer.getvalue()))
+
+
+def generate_gemini(model_name: str, prompt: str, text: str = "", images: list = (), system_instruction: str | None = None, *, api_key: str | None) -> str:
+    """
+    Text of a Gemini response for the prompt followed by the text and images.
+
+    The request is sent with `api_key` and counts against the rate limit of that key, independent of the key of
+    other calls running at the same time.
+
+    Example:
+        generate_gemini("gemini-1.5-flash", prompt, text=transcript_chunk, api_key=API_KEY_GOOGLE_GEMINI)
+    """
+    def call():
+        from google.ai import generativelanguage as glm
+
+        parts = [glm.Part(text=prompt + text), *(image_part(image) for image in images)]
+        request = glm.GenerateContentRequest(model=f"models/{model_name}", contents=[glm.Content(role="user", parts=parts)])
+        if system_instruction:
+            request.system_instruction = glm.Content(parts=[glm.Part(text=system_instruction)])
+        # The client of this key instead of the process-wide one of genai.configure
+        client = get_gemini_client(api_key)
+        limiter = get_rate_limiter("gemini", api_key)
+        # Timeout of the request only, waiting for the limiter is not included
+        response = limiter.call(lambda: client.generate_content(request, timeout=LLM_TIMEOUT), tokens=estimate_tokens(system_instruction, prompt, text, images=len(images)))
+        if not response.candidates:
+            return ""
+        return "".join(part.text for part in response.candidates[0].content.parts)
+
+    return cached_call("gemini", model_name, "generate", [system_instruction, prompt], [text, *images], call)
+
+
+def chat_ollama(model_name: str, prompt: str, text: str = "", image_paths: list[str] = ()) -> str:
+    """
+    Content of an Ollama chat response for one user message with the prompt followed by the text and images.
+
+    Example:
+        chat_ollama("llama3.2-vision", prompt, image_paths=["media/abc/frames/frame0_0.0.jpg"])
+    """
+    def call():
+        message = {"role": "user", "content": prompt + text}
+        if image_paths:
+            message["images"] = list(image_paths)
+        limiter = get_rate_limiter("ollama")
+        return limiter.call(lambda: get_ollama_client().chat(model=model_name, messages=[message]).message.content, tokens=estimate_tokens(prompt, text, images=len(image_paths)))
+
+    images = []
+    for image_path in image_paths:
+        with open(image_path, "rb") as file:
+            images.append(file.read())
+    return cached_call("ollama", model_name, "chat", prompt, [text, *images], call)
+
+
+@lru_cache(maxsize=1)
+def get_ollama_client():
+    """Ollama client whose requests time out after LLM_TIMEOUT seconds."""
+    import ollama
+    return ollama.Client(host=get_ollama_host(), timeout=LLM_TIMEOUT)
+
+
+@lru_cache(maxsize=None)
+def get_ollama_embeddings(model_name: str, base_url: str):
+    from langchain_ollama import OllamaEmbeddings
+    return OllamaEmbeddings(model=model_name, base_url=base_url, client_kwargs={"timeout": LLM_TIMEOUT})
+
+
+def embed_ollama(model_name: str, text: str, base_url: str) -> list[float]:
+    """
+    Embedding of the text with an Ollama embedding model.
+
+    Example:
+        embed_ollama("nomic-embed-text", chunk, get_ollama_host())
+    """
+    def call():
+        return get_rate_limiter("ollama").call(lambda: get_ollama_embeddings(model_name, base_url).embed_query(text), tokens=estimate_tokens(text))
+
+    return cached_call("ollama", model_name, "embed", "", text, call)
@@ -0,0 +1,201 @@
+import hashlib
+import logging
+import os
+import random
+import threading
+import time
+from typing import Callable
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Same logger as .logger, without configuring the log file on import
+log = logging.getLogger("data_processing")
+
+# Budgets per provider and API key, 0 means unlimited. The Gemini defaults are the free tier of gemini-1.5-flash.
+RATE_LIMITS = {
+    "gemini": {"rpm": float(os.getenv("GEMINI_RPM", "15")), "tpm": float(os.getenv("GEMINI_TPM", "1000000"))},
+    "ollama": {"rpm": float(os.getenv("OLLAMA_RPM", "0")), "tpm": float(os.getenv("OLLAMA_TPM", "0"))}
+}
+RATE_LIMIT_MAX_RETRIES = int(os.getenv("RATE_LIMIT_MAX_RETRIES", "6"))
+
+rate_limiters = {}
+rate_limiters_lock = threading.Lock()
+
+
+class RateLimited(Exception):
+    """Raised after a call was still rate limited after RATE_LIMIT_MAX_RETRIES retries."""
+
+
+def is_rate_limited_error(error: Exception) -> bool:
+    """
+    True for a 429 of google.generativeai (ResourceExhausted, TooManyRequests), ollama (ResponseError) or an HTTP client.
+    Only the status code and the exception type count, a "429" in the message can be an id, a port or a token count.
+    """
+    for attribute in ("code", "status_code", "status"):
+        value = getattr(error, attribute, None)
+        value = value() if callable(value) else value
+        if value == 429 or getattr(value, "value", None) == 429:
+            return True
+    response = getattr(error, "response", None)
+    if getattr(response, "status_code", None) == 429:
+        return True
+    return type(error).__name__ in ("ResourceExhausted", "TooManyRequests")
+
+
+def get_retry_after(error: Exception) -> float | None:
+    """Seconds of a Retry-After header of the 429 response, if there is one."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+
+def estimate_tokens(*texts: str, images: int = 0) -> int:
+    """
+    Rough token count of a request: about four characters per token, 258 tokens per image (Gemini).
+    """
+    return sum(len(text or "") for text in texts) // 4 + 258 * images + 1
+
+
+class AdaptiveRateLimiter:
+    """
+    Token buckets for requests and tokens per minute, which adapt to the observed quota.
+
+    The request rate starts at the configured budget. Every 429 halves it, empties the buckets and pauses all calls
+    with an exponential backoff with jitter (or the Retry-After of the response). Every successful call raises it
+    again by a fraction of the budget, up to the budget (AIMD), so the limiter settles just below the real quota.
+
+    Example:
+        limiter = get_rate_limiter("gemini", API_KEY_GOOGLE_GEMINI)
+        text = limiter.call(lambda: model.generate_content(prompt).text, tokens=estimate_tokens(prompt))
+    """
+
+    def __init__(self, name: str, rpm: float, tpm: float, min_rpm: float = 1, increase: float = 0.05, base_backoff: float = 2, max_backoff: float = 60):
+        self.name = name
+        self.max_rpm = rpm
+        self.rpm = rpm
+        self.tpm = tpm
+        self.min_rpm = min(min_rpm, rpm) if rpm else min_rpm
+        self.increase = increase
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.requests = rpm
+        self.tokens = tpm
+        self.updated_at = time.monotonic()
+        self.paused_until = 0.0
+        self.consecutive_rate_limits = 0
+        self.statistics = {"calls": 0, "rate_limited": 0, "waited_seconds": 0.0}
+        self.condition = threading.Condition()
+
+    def _refill(self, now: float):
+        elapsed = now - self.updated_at
+        self.updated_at = now
+        if self.rpm:
+            self.requests = min(self.rpm, self.requests + elapsed * self.rpm / 60)
+        if self.tpm:
+            self.tokens = min(self.tpm, self.tokens + elapsed * self.tpm / 60)
+
+    def acquire(self, tokens: int = 1):
+        """Wait until one request and `tokens` tokens are available and take them."""
+        started_at = time.monotonic()
+        with self.condition:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                # A request larger than the whole token budget only waits for a full bucket
+                tokens_needed = min(tokens, self.tpm) if self.tpm else 0
+                waits = [self.paused_until - now]
+                if self.rpm and self.requests < 1:
+                    waits.append((1 - self.requests) * 60 / self.rpm)
+                if self.tpm and self.tokens < tokens_needed:
+                    waits.append((tokens_needed - self.tokens) * 60 / self.tpm)
+                wait = max(waits)
+                if wait <= 0:
+                    if self.rpm:
+                        self.requests -= 1
+                    if self.tpm:
+                        self.tokens -= tokens_needed
+                    self.statistics["calls"] += 1
+                    self.statistics["waited_seconds"] += now - started_at
+                    return
+                self.condition.wait(timeout=wait)
+
+    def on_success(self):
+        with self.condition:
+            self.consecutive_rate_limits = 0
+            if self.max_rpm and self.rpm < self.max_rpm:
+                self.rpm = min(self.max_rpm, self.rpm + self.increase * self.max_rpm)
+
+    def on_rate_limited(self, retry_after: float | None = None) -> float:
+        """
+        Lower the rate and pause all calls.
+
+        Returns:
+            float: Seconds of the pause.
+        """
+        with self.condition:
+            self.consecutive_rate_limits += 1
+            self.statistics["rate_limited"] += 1
+            if self.rpm:
+                self.rpm = max(self.min_rpm, self.rpm / 2)
+                self.requests = 0
+            if self.tpm:
+                self.tokens = 0
+            backoff = min(self.max_backoff, self.base_backoff * 2 ** (self.consecutive_rate_limits - 1))
+            pause = retry_after if retry_after is not None else random.uniform(backoff / 2, backoff)
+            self.paused_until = max(self.paused_until, time.monotonic() + pause)
+            self.condition.notify_all()
+        log.warning("AdaptiveRateLimiter: %s rate limited, pausing %.1fs, rate lowered to %.1f requests per minute.", self.name, pause, self.rpm)
+        return pause
+
+    def call(self, function: Callable[[], object], tokens: int = 1, max_retries: int = RATE_LIMIT_MAX_RETRIES):
+        """
+        Call `function` within the budget and retry it after a 429.
+
+        Raises:
+            RateLimited: Still rate limited after `max_retries` retries.
+        """
+        for attempt in range(max_retries + 1):
+            self.acquire(tokens)
+            try:
+                result = function()
+            except Exception as e:
+                if not is_rate_limited_error(e):
+                    raise
+                self.on_rate_limited(get_retry_after(e))
+                if attempt == max_retries:
+                    raise RateLimited(f"{self.name} is still rate limited after {max_retries} retries: {e}") from e
+                continue
+            self.on_success()
+            return result
+
+    def stats(self) -> dict:
+        with self.condition:
+            return {"rpm": round(self.rpm, 2), "max_rpm": self.max_rpm, "tpm": self.tpm, **self.statistics}
+
+
+def get_rate_limiter(provider: str, api_key: str | None = None) -> AdaptiveRateLimiter:
+    """
+    Process-wide limiter of a provider and API key, shared by all videos and jobs. The key is only stored hashed.
+
+    Example:
+        get_rate_limiter("gemini", os.getenv("API_KEY_GOOGLE_GEMINI_GRAPHDB"))
+    """
+    key_hash = hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()[:8]
+    with rate_limiters_lock:
+        limiter = rate_limiters.get((provider, key_hash))
+        if limiter is None:
+            limits = RATE_LIMITS.get(provider, {"rpm": 0, "tpm": 0})
+            limiter = AdaptiveRateLimiter(f"{provider}:{key_hash}", limits["rpm"], limits["tpm"])
+            rate_limiters[(provider, key_hash)] = limiter
+        return limiter
+
+
+def get_rate_limiter_stats() -> dict:
+    with rate_limiters_lock:
+        limiters = list(rate_limiters.values())
+    return {limiter.name: limiter.stats() for limiter in limiters}
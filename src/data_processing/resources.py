@@ -0,0 +1,65 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Videos of one playlist processed at the same time
+INGESTION_VIDEO_WORKERS = int(os.getenv("INGESTION_VIDEO_WORKERS", "4"))
+
+# Stages running at the same time per resource class, shared by all videos and jobs of the process
+RESOURCE_LIMITS = {
+    "network": int(os.getenv("INGESTION_NETWORK_CONCURRENCY", "4")),  # video and meta data downloads
+    "cpu": int(os.getenv("INGESTION_CPU_CONCURRENCY", str(max(1, (os.cpu_count() or 2) // 2)))),  # frame extraction and deduplication
+    "llm": int(os.getenv("INGESTION_LLM_CONCURRENCY", "2")),  # Gemini and Ollama calls
+    "db": int(os.getenv("INGESTION_DB_CONCURRENCY", "1"))  # ChromaDB writes
+}
+
+semaphores = {name: threading.BoundedSemaphore(limit) for name, limit in RESOURCE_LIMITS.items()}
+statistics = {name: {"acquired": 0, "active": 0, "wait_seconds": 0.0, "busy_seconds": 0.0} for name in RESOURCE_LIMITS}
+statistics_lock = threading.Lock()
+
+# The topic overview CSV is read, extended and written by every video
+topic_overview_lock = threading.Lock()
+
+
+@contextmanager
+def resource(name: str):
+    """
+    Hold one slot of a resource class while the block runs.
+
+    Args:
+        name (str): "network", "cpu", "llm" or "db".
+
+    Example:
+        with resource("network"):
+            download_youtube_video_pytube(video_url)
+    """
+    requested = time.perf_counter()
+    semaphores[name].acquire()
+    acquired = time.perf_counter()
+    with statistics_lock:
+        statistics[name]["acquired"] += 1
+        statistics[name]["active"] += 1
+        statistics[name]["wait_seconds"] += acquired - requested
+    try:
+        yield
+    finally:
+        with statistics_lock:
+            statistics[name]["active"] -= 1
+            statistics[name]["busy_seconds"] += time.perf_counter() - acquired
+        semaphores[name].release()
+
+
+def get_resource_statistics() -> dict:
+    """
+    Usage of every resource class since the start of the process.
+
+    Returns:
+        dict: Limit, acquisitions, active slots, and the total seconds waited for and spent in a slot per resource class.
+    """
+    with statistics_lock:
+        return {name: {"limit": RESOURCE_LIMITS[name], **values} for name, values in statistics.items()}
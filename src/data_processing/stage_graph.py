@@ -0,0 +1,196 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from dataclasses import dataclass, field
+from typing import Callable
+
+# Same logger as .logger, without configuring the log file on import
+log = logging.getLogger("data_processing")
+
+
+class StageError(Exception):
+    """Raised by a stage to stop the graph with the status code and message returned to the user."""
+
+    def __init__(self, status_code: int, message: str):
+        super().__init__(message)
+        self.status_code = status_code
+        self.message = message
+
+
+@dataclass
+class Stage:
+    """
+    One stage of the per-video pipeline.
+
+    Args:
+        name (str): Name reported to the progress, e.g. "visual".
+        run (Callable): Called with the shared context dict, stores its outputs in it.
+        after (tuple): Names of the stages which have to finish first.
+        restore (Callable, optional): Called with the context instead of `run` if the stage is skipped, loads the
+            outputs of an earlier run which later stages need.
+    """
+    name: str
+    run: Callable[[dict], None]
+    after: tuple[str, ...] = ()
+    restore: Callable[[dict], None] | None = None
+
+
+@dataclass
+class StageTiming:
+    stage: str
+    started_at: float
+    finished_at: float
+    state: str = "done"
+
+    @property
+    def seconds(self) -> float:
+        return self.finished_at - self.started_at
+
+
+@dataclass
+class StageGraphResult:
+    timings: dict[str, StageTiming] = field(default_factory=dict)
+    critical_path: list[str] = field(default_factory=list)
+
+    @property
+    def seconds(self) -> float:
+        if not self.timings:
+            return 0.0
+        return max(t.finished_at for t in self.timings.values()) - min(t.started_at for t in self.timings.values())
+
+    def to_dict(self) -> dict:
+        return {
+            "seconds": round(self.seconds, 3),
+            "stages": {name: {"seconds": round(t.seconds, 3), "state": t.state} for name, t in self.timings.items()},
+            "critical_path": [{"stage": name, "seconds": round(self.timings[name].seconds, 3)} for name in self.critical_path]
+        }
+
+
+class StageGraph:
+    """
+    Runs the stages of a video as soon as the stages they depend on finished.
+
+    Independent stages run at the same time on a thread pool, the resource classes of resources.py still limit
+    the work across videos. After the first failed stage no further stage is started, the running stages finish
+    and the error is raised.
+
+    Example:
+        graph = StageGraph([Stage("download", download), Stage("visual", visual, after=("download",))])
+        result = graph.run(video_id, progress)
+    """
+
+    def __init__(self, stages: list[Stage]):
+        self.stages = {stage.name: stage for stage in stages}
+        if len(self.stages) != len(stages):
+            raise ValueError("Stage names must be unique.")
+        for stage in stages:
+            unknown = [name for name in stage.after if name not in self.stages]
+            if unknown:
+                raise ValueError(f"Stage {stage.name} depends on unknown stages {unknown}.")
+        self.order = self._topological_order()
+
+    def _topological_order(self) -> list[str]:
+        order = []
+        remaining = dict(self.stages)
+        while remaining:
+            ready = [name for name, stage in remaining.items() if all(dependency in order for dependency in stage.after)]
+            if not ready:
+                raise ValueError(f"The stages {sorted(remaining)} depend on each other.")
+            for name in ready:
+                order.append(name)
+                del remaining[name]
+        return order
+
+    def resumable(self, is_complete: Callable[[str], bool]) -> set[str]:
+        """
+        Stages which do not have to run again: complete themselves and only depending on stages which are skipped too.
+
+        Args:
+            is_complete (Callable): True if the results of the stage with this name are still valid.
+        """
+        skip = set()
+        for name in self.order:
+            if all(dependency in skip for dependency in self.stages[name].after) and is_complete(name):
+                skip.add(name)
+        return skip
+
+    def run(self, video_id: str, progress, context: dict | None = None, skip: set[str] = frozenset()) -> StageGraphResult:
+        """
+        Run all stages.
+
+        Args:
+            video_id (str): ID of the video, reported to the progress.
+            progress (PipelineProgress): Receives start_stage and finish_stage.
+            context (dict, optional): Shared inputs and outputs of the stages.
+            skip (set, optional): Stages which are restored instead of run, see resumable.
+
+        Returns:
+            StageGraphResult: Timings and critical path of the stages.
+
+        Raises:
+            StageError: The error of the first failed stage.
+        """
+        context = {} if context is None else context
+        result = StageGraphResult()
+        done = set()
+        running = {}
+        error = None
+
+        for name in self.order:
+            if name in skip:
+                if self.stages[name].restore is not None:
+                    self.stages[name].restore(context)
+                progress.finish_stage(video_id, name, "skipped")
+                done.add(name)
+
+        def run_stage(stage: Stage):
+            progress.start_stage(video_id, stage.name)
+            started_at = time.perf_counter()
+            try:
+                stage.run(context)
+            except BaseException:
+                result.timings[stage.name] = StageTiming(stage.name, started_at, time.perf_counter(), "failed")
+                progress.finish_stage(video_id, stage.name, "failed")
+                raise
+            result.timings[stage.name] = StageTiming(stage.name, started_at, time.perf_counter())
+            progress.finish_stage(video_id, stage.name)
+
+        with ThreadPoolExecutor(max_workers=len(self.stages) or 1, thread_name_prefix=f"stage-{video_id}") as executor:
+            while True:
+                if error is None:
+                    for name in self.order:
+                        stage = self.stages[name]
+                        if name not in done and name not in running.values() and all(dependency in done for dependency in stage.after):
+                            running[executor.submit(run_stage, stage)] = name
+                if not running:
+                    break
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    exception = future.exception()
+                    if exception is None:
+                        done.add(name)
+                    elif error is None:
+                        error = exception
+
+        if error is not None:
+            raise error
+        result.critical_path = self.critical_path(result.timings)
+        log.info("StageGraph: Video %s processed in %.1fs, critical path: %s.", video_id, result.seconds,
+                 " -> ".join(f"{name} ({result.timings[name].seconds:.1f}s)" for name in result.critical_path))
+        return result
+
+    def critical_path(self, timings: dict[str, StageTiming]) -> list[str]:
+        """
+        Chain of stages which determined the total time: starting from the stage which finished last, always the
+        dependency which finished last.
+        """
+        if not timings:
+            return []
+        path = [max(timings, key=lambda name: timings[name].finished_at)]
+        while True:
+            dependencies = [name for name in self.stages[path[-1]].after if name in timings]
+            if not dependencies:
+                break
+            path.append(max(dependencies, key=lambda name: timings[name].finished_at))
+        return list(reversed(path))
@@ -0,0 +1,153 @@
+import asyncio
+import threading
+
+from src.data_processing.jobs import JobManager, get_job_key
+
+VIDEO_URL = "https://www.youtube.com/watch?v=dQw4w9WgXcQ"
+
+
+def fake_pipeline(video_ids, stages=("download", "visual", "graph_db"), started=None, release=None):
+    def run(progress):
+        for index, video_id in enumerate(video_ids, start=1):
+            progress.start_video(video_id, index, len(video_ids))
+            for stage in stages:
+                progress.start_stage(video_id, stage)
+                if started is not None:
+                    started.set()
+                if release is not None:
+                    release.wait(timeout=5)
+            progress.finish_video(video_id)
+        return 201, "processed"
+    return run
+
+
+def test_job_key():
+    assert get_job_key(VIDEO_URL) == "video:dQw4w9WgXcQ"
+    assert get_job_key("https://www.youtube.com/playlist?list=PL123") == "playlist:PL123"
+    assert get_job_key("https://www.youtube.com/watch?v=abc&list=PL123") == "playlist:PL123"
+
+
+def test_job_reports_progress_per_video_and_stage():
+    manager = JobManager(workers=1)
+    job, created = manager.submit(VIDEO_URL, fake_pipeline(["a", "b"]))
+
+    assert created
+    assert job.done.wait(timeout=5)
+    status = job.to_dict()
+    assert status["state"] == "succeeded"
+    assert status["status_code"] == 201
+    assert status["videos"]["b"]["index"] == 2
+    assert {stage: value["state"] for stage, value in status["videos"]["a"]["stages"].items()} == \
+           {"download": "done", "visual": "done", "graph_db": "done"}
+
+    events = list(manager.events(job.id))
+    assert [event["id"] for event in events] == list(range(1, len(events) + 1))
+    assert [event["stage"] for event in events if event["type"] == "stage"] == ["download", "visual", "graph_db"] * 2
+    assert events[-1]["state"] == "succeeded"
+    assert [event["id"] for event in manager.events(job.id, after=len(events) - 1)] == [len(events)]
+
+
+def test_async_events_follow_a_running_job():
+    manager = JobManager(workers=1)
+    started, release = threading.Event(), threading.Event()
+    job, _ = manager.submit(VIDEO_URL, fake_pipeline(["a"], started=started, release=release))
+    assert started.wait(timeout=5)
+
+    async def follow():
+        events = []
+        async for event in manager.events_async(job.id, heartbeat=0.02, poll=0.01):
+            if event is None and not release.is_set():
+                # The loop keeps running while the job waits, release it after the first heartbeat
+                release.set()
+            events.append(event)
+        return events
+
+    events = asyncio.run(follow())
+    assert None in events
+    received = [event for event in events if event is not None]
+    assert [event["id"] for event in received] == list(range(1, len(received) + 1))
+    assert received[-1]["state"] == "succeeded"
+
+
+def test_concurrent_submissions_for_the_same_video_are_deduplicated():
+    manager = JobManager(workers=2)
+    started, release = threading.Event(), threading.Event()
+    job, created = manager.submit(VIDEO_URL, fake_pipeline(["dQw4w9WgXcQ"], started=started, release=release))
+    started.wait(timeout=5)
+
+    duplicate, duplicate_created = manager.submit(VIDEO_URL, fake_pipeline(["dQw4w9WgXcQ"]))
+    release.set()
+
+    assert created and not duplicate_created
+    assert duplicate is job
+    assert job.done.wait(timeout=5)
+    assert manager.submit(VIDEO_URL, fake_pipeline(["dQw4w9WgXcQ"]))[1] is True
+
+
+def test_cancelled_job_stops_at_the_next_stage():
+    manager = JobManager(workers=1)
+    started, release = threading.Event(), threading.Event()
+    job, _ = manager.submit(VIDEO_URL, fake_pipeline(["a"], started=started, release=release))
+    started.wait(timeout=5)
+
+    manager.cancel(job.id)
+    release.set()
+
+    assert job.done.wait(timeout=5)
+    status = job.to_dict()
+    assert status["state"] == "cancelled"
+    assert status["videos"]["a"]["state"] == "cancelled"
+    assert status["videos"]["a"]["stages"]["download"]["state"] == "cancelled"
+    assert "visual" not in status["videos"]["a"]["stages"]
+
+
+def test_failed_pipeline_marks_the_running_stage():
+    def run(progress):
+        progress.start_video("a", 1, 1)
+        progress.start_stage("a", "download")
+        return 500, "Internal error when trying to download the video."
+
+    manager = JobManager(workers=1)
+    job, _ = manager.submit(VIDEO_URL, run)
+
+    assert job.done.wait(timeout=5)
+    status = job.to_dict()
+    assert status["state"] == "failed"
+    assert status["status_code"] == 500
+    assert status["videos"]["a"]["stages"]["download"]["state"] == "failed"
+
+
+def test_failed_video_does_not_fail_the_job():
+    def run(progress):
+        progress.start_video("a", 1, 2)
+        progress.start_stage("a", "download")
+        progress.fail_video("a", "Internal error when trying to download the video.")
+        progress.start_video("b", 2, 2)
+        progress.start_stage("b", "download")
+        progress.finish_video("b")
+        return 207, "partially processed"
+
+    manager = JobManager(workers=1)
+    job, _ = manager.submit(VIDEO_URL, run)
+
+    assert job.done.wait(timeout=5)
+    status = job.to_dict()
+    assert status["state"] == "succeeded"
+    assert status["status_code"] == 207
+    assert status["videos"]["a"]["state"] == "failed"
+    assert status["videos"]["a"]["stages"]["download"]["state"] == "failed"
+    assert status["videos"]["a"]["error"] == "Internal error when trying to download the video."
+    assert status["videos"]["b"]["state"] == "done"
+    assert manager.active_videos == {}
+
+
+def test_claim_video_of_a_pruned_owner():
+    manager = JobManager(workers=1)
+    job, _ = manager.submit(VIDEO_URL, fake_pipeline([]))
+    assert job.done.wait(timeout=5)
+    # The entry of a finished job which was pruned before it released the video
+    manager.active_videos["a"] = "pruned-job"
+
+    manager.claim_video(job, "a")
+
+    assert manager.active_videos["a"] == job.id
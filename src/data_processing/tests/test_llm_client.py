@@ -0,0 +1,84 @@
+import threading
+import time
+
+import pytest
+
+from src.data_processing.llm_client import LLMClient, EmptyResponseError
+
+
+def test_results_keep_the_order_of_the_items():
+    client = LLMClient(concurrency=4)
+
+    results = client.map(lambda item: time.sleep(0.05 * (3 - item)) or item * 10, [0, 1, 2, 3])
+
+    assert results == [0, 10, 20, 30]
+
+
+def test_calls_run_concurrently_up_to_the_limit():
+    client = LLMClient(concurrency=4)
+    active = []
+    peak = []
+    lock = threading.Lock()
+
+    def call(item):
+        with lock:
+            active.append(item)
+            peak.append(len(active))
+        time.sleep(0.1)
+        with lock:
+            active.remove(item)
+        return item
+
+    started_at = time.monotonic()
+    client.map(call, range(8))
+
+    assert max(peak) == 4
+    # Two rounds of four calls instead of eight sequential calls
+    assert time.monotonic() - started_at < 0.5
+
+
+def test_transient_failures_are_retried():
+    client = LLMClient(concurrency=2, max_retries=3, base_backoff=0.01)
+    attempts = []
+
+    def call(item):
+        attempts.append(item)
+        if attempts.count(item) < 3:
+            raise EmptyResponseError("empty response")
+        return item
+
+    assert client.map(call, ["a", "b"]) == ["a", "b"]
+    assert attempts.count("a") == 3
+
+
+def test_timeouts_and_other_errors():
+    client = LLMClient(concurrency=2, max_retries=1, base_backoff=0.01)
+    attempts = []
+
+    def call(item):
+        attempts.append(item)
+        if item == "slow":
+            # Raised by the HTTP client after its own timeout
+            raise TimeoutError("request timed out")
+        if item == "invalid":
+            raise ValueError("invalid prompt")
+        return item
+
+    results = client.map(call, ["fast", "slow", "invalid"], return_exceptions=True)
+    assert results[0] == "fast"
+    assert isinstance(results[1], TimeoutError)
+    assert isinstance(results[2], ValueError)
+    assert attempts.count("slow") == 2
+    assert attempts.count("invalid") == 1
+
+    with pytest.raises(ValueError):
+        client.map(call, ["invalid"])
+
+
+def test_results_are_reported_as_they_arrive():
+    client = LLMClient(concurrency=2)
+    arrived = []
+
+    client.map(lambda item: time.sleep(item) or item, [0.1, 0], on_result=lambda index, result: arrived.append(index))
+
+    assert arrived == [1, 0]
@@ -0,0 +1,45 @@
+from src.data_processing.manifest import VideoManifest
+
+
+def write(path, content):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(content)
+
+
+def test_stage_is_complete_until_its_output_changes(tmp_path):
+    write(tmp_path / "transcripts" / "a.txt", "{0.0} Hello")
+    manifest = VideoManifest("a", str(tmp_path))
+    manifest.start("audio", {"local_model": False})
+    manifest.mark_done("audio", {"local_model": False}, outputs=["transcripts/a.txt"])
+
+    reloaded = VideoManifest("a", str(tmp_path))
+    assert reloaded.is_complete("audio", {"local_model": False})
+    assert not reloaded.is_complete("audio", {"local_model": True})
+
+    write(tmp_path / "transcripts" / "a.txt", "{0.0} Hello world")
+    assert not reloaded.is_complete("audio", {"local_model": False})
+
+
+def test_failed_or_interrupted_stage_is_not_complete(tmp_path):
+    manifest = VideoManifest("a", str(tmp_path))
+
+    assert manifest.start("visual", {"seconds_between_frames": 30}) is False
+    assert not manifest.is_complete("visual", {"seconds_between_frames": 30})
+    # An interrupted attempt with the same parameters can be continued
+    assert VideoManifest("a", str(tmp_path)).start("visual", {"seconds_between_frames": 30}) is True
+
+    manifest.mark_failed("graph_db", "connection refused")
+    assert manifest.stage("graph_db")["state"] == "failed"
+    assert not manifest.is_complete("graph_db", {})
+
+
+def test_rewritten_output_keeps_earlier_stage_complete(tmp_path):
+    write(tmp_path / "transcripts_chunks" / "a.csv", "chunks\nHello\n")
+    manifest = VideoManifest("a", str(tmp_path))
+    manifest.mark_done("chunking", {}, outputs=["transcripts_chunks/a.csv"])
+
+    write(tmp_path / "transcripts_chunks" / "a.csv", "chunks,chunks_embedded\nHello,[0.1]\n")
+    manifest.mark_done("embedding", {}, outputs=["transcripts_chunks/a.csv"])
+
+    assert manifest.is_complete("chunking", {})
+    assert manifest.is_complete("embedding", {})
@@ -0,0 +1,53 @@
+from src.data_processing import model_calls
+from src.data_processing.model_cache import ModelCache
+from src.data_processing.model_calls import cached_call, hash_content
+
+
+def test_cache_hit_and_miss_are_counted(tmp_path):
+    cache = ModelCache(str(tmp_path / "cache.sqlite"), max_bytes=1024 * 1024)
+
+    assert cache.get("key", "gemini", "generate") is None
+    cache.put("key", "Data Science", "gemini", "gemini-1.5-flash", "generate", "p", "i")
+    assert cache.get("key", "gemini", "generate") == "Data Science"
+
+    stats = cache.stats()
+    assert stats["entries"] == 1
+    assert stats["hits"] == 1 and stats["misses"] == 1
+    assert stats["hit_rate"] == 0.5
+    assert stats["calls"]["gemini/generate"]["hit_rate"] == 0.5
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = ModelCache(str(tmp_path / "cache.sqlite"), max_bytes=25)
+    cache.put("a", "x" * 10, "ollama", "llama3.2", "chat", "p", "a")
+    cache.put("b", "x" * 10, "ollama", "llama3.2", "chat", "p", "b")
+    cache.get("a")
+    cache.put("c", "x" * 10, "ollama", "llama3.2", "chat", "p", "c")
+
+    assert cache.get("a") == "x" * 10
+    assert cache.get("b") is None
+    assert cache.get("c") == "x" * 10
+    assert cache.stats()["size_bytes"] <= 25
+
+
+def test_cached_call_is_keyed_by_prompt_and_input(tmp_path, monkeypatch):
+    cache = ModelCache(str(tmp_path / "cache.sqlite"), max_bytes=1024 * 1024)
+    monkeypatch.setattr(model_calls, "get_model_cache", lambda: cache)
+    calls = []
+
+    def call(response):
+        return lambda: calls.append(response) or response
+
+    assert cached_call("gemini", "gemini-1.5-flash", "generate", "Describe", [b"image-1"], call("first")) == "first"
+    assert cached_call("gemini", "gemini-1.5-flash", "generate", "Describe", [b"image-1"], call("again")) == "first"
+    assert cached_call("gemini", "gemini-1.5-flash", "generate", "Describe", [b"image-2"], call("second")) == "second"
+    assert cached_call("ollama", "llava", "generate", "Describe", [b"image-1"], call("third")) == "third"
+    # Empty responses are not cached
+    assert cached_call("gemini", "gemini-1.5-flash", "generate", "Topic", "", call("")) == ""
+    assert cached_call("gemini", "gemini-1.5-flash", "generate", "Topic", "", call("Gaming")) == "Gaming"
+    assert calls == ["first", "second", "third", "", "Gaming"]
+
+
+def test_hash_content_separates_parts():
+    assert hash_content("ab", "c") != hash_content("a", "bc")
+    assert hash_content(None) != hash_content("")
@@ -0,0 +1,86 @@
+import time
+
+import pytest
+
+from src.data_processing import rate_limiter
+from src.data_processing.rate_limiter import AdaptiveRateLimiter, RateLimited, get_rate_limiter, is_rate_limited_error
+
+
+class ResourceExhausted(Exception):
+    """Same name as the google.api_core exception of a 429"""
+
+
+class ResponseError(Exception):
+    def __init__(self, status_code):
+        super().__init__("error")
+        self.status_code = status_code
+
+
+def test_requests_wait_for_the_bucket_to_refill():
+    limiter = AdaptiveRateLimiter("gemini", rpm=600, tpm=0)
+    limiter.requests = 0
+
+    started_at = time.monotonic()
+    limiter.acquire()
+    assert 0.05 < time.monotonic() - started_at < 1
+
+
+def test_token_budget_limits_large_requests():
+    limiter = AdaptiveRateLimiter("gemini", rpm=0, tpm=60000)
+    limiter.acquire(tokens=60000)
+
+    started_at = time.monotonic()
+    limiter.acquire(tokens=200)
+    assert 0.1 < time.monotonic() - started_at < 1
+
+
+def test_rate_limit_halves_the_rate_and_success_restores_it(monkeypatch):
+    monkeypatch.setattr(rate_limiter.random, "uniform", lambda low, high: 0.01)
+    limiter = AdaptiveRateLimiter("gemini", rpm=600, tpm=0, base_backoff=0.02)
+    calls = []
+
+    def generate():
+        calls.append(1)
+        if len(calls) < 3:
+            raise ResourceExhausted("429 Resource has been exhausted")
+        return "Data Science"
+
+    assert limiter.call(generate) == "Data Science"
+    assert len(calls) == 3
+    assert limiter.stats()["rate_limited"] == 2
+    assert limiter.rpm == pytest.approx(600 / 4 + 0.05 * 600)
+
+    for _ in range(20):
+        limiter.on_success()
+    assert limiter.rpm == 600
+
+
+def test_call_gives_up_after_max_retries_and_passes_other_errors(monkeypatch):
+    monkeypatch.setattr(rate_limiter.random, "uniform", lambda low, high: 0)
+    limiter = AdaptiveRateLimiter("ollama", rpm=0, tpm=0)
+
+    def always_limited():
+        raise ResponseError(429)
+
+    def broken():
+        raise ValueError("invalid prompt")
+
+    with pytest.raises(RateLimited):
+        limiter.call(always_limited, max_retries=2)
+    with pytest.raises(ValueError):
+        limiter.call(broken)
+    assert limiter.stats()["rate_limited"] == 3
+
+
+def test_limiters_are_shared_per_provider_and_key():
+    assert get_rate_limiter("gemini", "key-1") is get_rate_limiter("gemini", "key-1")
+    assert get_rate_limiter("gemini", "key-1") is not get_rate_limiter("gemini", "key-2")
+    assert "key-1" not in get_rate_limiter("gemini", "key-1").name
+
+
+def test_rate_limited_errors_are_detected():
+    assert is_rate_limited_error(ResourceExhausted("quota"))
+    assert is_rate_limited_error(ResponseError(429))
+    assert not is_rate_limited_error(ResponseError(500))
+    assert not is_rate_limited_error(ValueError("invalid prompt"))
+    assert not is_rate_limited_error(ValueError("chunk 429 exceeds the 4290 token limit"))
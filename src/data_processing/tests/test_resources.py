@@ -0,0 +1,33 @@
+import threading
+import time
+
+from src.data_processing import resources
+from src.data_processing.resources import resource, get_resource_statistics
+
+
+def test_resource_limits_concurrent_stages(monkeypatch):
+    monkeypatch.setitem(resources.semaphores, "db", threading.BoundedSemaphore(1))
+    active = []
+    peak = []
+    lock = threading.Lock()
+
+    def write():
+        with resource("db"):
+            with lock:
+                active.append(1)
+                peak.append(len(active))
+            time.sleep(0.02)
+            with lock:
+                active.pop()
+
+    threads = [threading.Thread(target=write) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert max(peak) == 1
+    statistics = get_resource_statistics()["db"]
+    assert statistics["acquired"] >= 4
+    assert statistics["active"] == 0
+    assert statistics["wait_seconds"] > 0
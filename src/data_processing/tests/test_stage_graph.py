@@ -0,0 +1,102 @@
+import threading
+import time
+
+import pytest
+
+from src.data_processing.jobs import PipelineProgress
+from src.data_processing.stage_graph import Stage, StageGraph, StageError
+
+
+class RecordingProgress(PipelineProgress):
+    def __init__(self):
+        self.events = []
+
+    def start_stage(self, video_id, stage):
+        self.events.append(("start", stage))
+
+    def finish_stage(self, video_id, stage, state="done"):
+        self.events.append((state, stage))
+
+
+def sleep(seconds, output=None):
+    def run(context):
+        time.sleep(seconds)
+        if output is not None:
+            context[output] = True
+    return run
+
+
+def test_independent_stages_run_concurrently():
+    barrier = threading.Barrier(2, timeout=2)
+    graph = StageGraph([
+        Stage("download", sleep(0)),
+        Stage("visual", lambda context: barrier.wait(), after=("download",)),
+        Stage("audio", lambda context: barrier.wait()),
+        Stage("graph_db", sleep(0), after=("visual", "audio"))
+    ])
+
+    result = graph.run("a", RecordingProgress())
+
+    assert set(result.timings) == {"download", "visual", "audio", "graph_db"}
+    assert result.timings["graph_db"].started_at >= max(result.timings["visual"].finished_at, result.timings["audio"].finished_at)
+
+
+def test_critical_path_follows_the_slowest_dependency():
+    graph = StageGraph([
+        Stage("download", sleep(0.05)),
+        Stage("visual", sleep(0.1), after=("download",)),
+        Stage("audio", sleep(0.01)),
+        Stage("graph_db", sleep(0), after=("visual", "audio"))
+    ])
+
+    result = graph.run("a", RecordingProgress())
+
+    assert result.critical_path == ["download", "visual", "graph_db"]
+    assert [entry["stage"] for entry in result.to_dict()["critical_path"]] == ["download", "visual", "graph_db"]
+
+
+def test_failed_stage_stops_its_dependents():
+    def fail(context):
+        raise StageError(500, "Internal error when trying to download the video.")
+
+    progress = RecordingProgress()
+    graph = StageGraph([
+        Stage("download", fail),
+        Stage("visual", sleep(0), after=("download",)),
+        Stage("audio", sleep(0.05, "transcript"))
+    ])
+    context = {}
+
+    with pytest.raises(StageError) as error:
+        graph.run("a", progress, context)
+
+    assert error.value.status_code == 500
+    assert ("failed", "download") in progress.events
+    assert ("start", "visual") not in progress.events
+    # Stages already running finish
+    assert context == {"transcript": True}
+
+
+def test_cyclic_and_unknown_dependencies_are_rejected():
+    with pytest.raises(ValueError):
+        StageGraph([Stage("a", sleep(0), after=("b",)), Stage("b", sleep(0), after=("a",))])
+    with pytest.raises(ValueError):
+        StageGraph([Stage("a", sleep(0), after=("missing",))])
+
+
+def test_completed_stages_are_restored_and_dependents_run_again():
+    ran = []
+    progress = RecordingProgress()
+    graph = StageGraph([
+        Stage("metadata", lambda context: ran.append("metadata"), restore=lambda context: context.update(title="Test")),
+        Stage("audio", lambda context: ran.append("audio")),
+        Stage("topic", lambda context: ran.append(("topic", context["title"])), after=("metadata", "audio"))
+    ])
+
+    skip = graph.resumable(lambda name: name in ("metadata", "topic"))
+    graph.run("a", progress, skip=skip)
+
+    # topic is complete, but audio runs again, so topic has to run again as well
+    assert skip == {"metadata"}
+    assert ran == ["audio", ("topic", "Test")]
+    assert ("skipped", "metadata") in progress.events
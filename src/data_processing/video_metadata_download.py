@@ -7,9 +7,10 @@ from pytube import (
 )
 import yt_dlp
 from dotenv import load_dotenv
-import google.generativeai as genai
 
 from .logger import log
+from .resources import topic_overview_lock
+from .model_calls import generate_gemini
 
 # Env variables
 load_dotenv() 
@@ -227,6 +228,28 @@ def extract_youtube_video_id(url: str) -> str:
         raise ValueError("YouTube Video ID could not be extracted from the URL")
 
 
+def extract_youtube_playlist_id(url: str) -> str:
+    """
+    Extract YouTube playlist id from a YouTube playlist URL.
+
+    Args:
+        url (str): URL of a YouTube playlist or of a video within a playlist.
+
+    Returns:
+        playlist_id (str): ID of the YouTube playlist.
+
+    Example:
+        extract_youtube_playlist_id("https://www.youtube.com/playlist?list=PLexample")
+    """
+
+    playlist_id = re.search(r"[?&]list=([a-zA-Z0-9_-]+)", url)
+    if playlist_id:
+        return playlist_id.group(1)
+    else:
+        log.warning("YouTube Playlist ID could not be extracted from the URL")
+        raise ValueError("YouTube Playlist ID could not be extracted from the URL")
+
+
 def create_topic_video(videoid: str, video_title: str, video_transcript: str, video_transcript_len: int = 500, gemini_model: str = "gemini-1.5-flash"):
     """
     Create chunks based on LLM.
@@ -244,8 +267,6 @@ def create_topic_video(videoid: str, video_title: str, video_transcript: str, vi
     transcript_cleaned = re.sub(r'\s+', ' ', re.sub(r'\{.*?\}', '', video_transcript)).strip()[:video_transcript_len].rsplit(' ', 1)[0] if len(video_transcript) > video_transcript_len else video_transcript
     csv_path = os.getenv("TOPIC_OVERVIEW_PATH")
 
-    genai.configure(api_key=API_KEY_GOOGLE_GEMINI)
-    model = genai.GenerativeModel(gemini_model)
     prompt = (
         f"""
         Based on the provided information, categorize the following YouTube video into a broad topic area such as Data Science, Web Development, Digital Marketing, Health and Wellness, Gaming, etc.
@@ -260,37 +281,39 @@ def create_topic_video(videoid: str, video_title: str, video_transcript: str, vi
         """
     )
     
-    response = model.generate_content(prompt)
-    response = response.text
+    response = generate_gemini(gemini_model, prompt, api_key=API_KEY_GOOGLE_GEMINI)
     log.info("create_topic_video: Successfully generated a topic category for video %s.", video_title)
 
-    if os.path.exists(csv_path):
-        df = pd.read_csv(csv_path)
+    # Other videos of a playlist may add their topic at the same time
+    with topic_overview_lock:
+        if os.path.exists(csv_path):
+            df = pd.read_csv(csv_path)
+            # A resumed or repeated run replaces the row of the video instead of adding another one
+            df = df[df["video_id"] != videoid]
 
-        unique_topics = df["video_topic"].unique()
+            unique_topics = df["video_topic"].unique()
 
-        prompt = f"""
-        Consider the topic: {response}. Compare it with the following list of predefined topics: {unique_topics}. 
+            prompt = f"""
+            Consider the topic: {response}. Compare it with the following list of predefined topics: {unique_topics}. 
 
-        1. If '{response}' closely matches any of the predefined topics, return the matching topic.
-        2. If there is no close match, return '{response}' as it is.
+            1. If '{response}' closely matches any of the predefined topics, return the matching topic.
+            2. If there is no close match, return '{response}' as it is.
 
-        Ensure the comparison accounts for synonymous terms or slight variations in phrasing.
+            Ensure the comparison accounts for synonymous terms or slight variations in phrasing.
 
-        Please provide your response in the format:
-        [Insert Topic]
-        """
-        final_topic = model.generate_content(prompt)
-        final_topic = final_topic.text
+            Please provide your response in the format:
+            [Insert Topic]
+            """
+            final_topic = generate_gemini(gemini_model, prompt, api_key=API_KEY_GOOGLE_GEMINI)
 
-        new_row = {"video_id": videoid, "video_topic": final_topic}
-        df = pd.concat([df, pd.DataFrame([new_row])], ignore_index=True)
-        log.info("create_topic_video: Appended category %s for video %s to %s.", final_topic, video_title, csv_path)
+            new_row = {"video_id": videoid, "video_topic": final_topic}
+            df = pd.concat([df, pd.DataFrame([new_row])], ignore_index=True)
+            log.info("create_topic_video: Stored category %s for video %s in %s.", final_topic, video_title, csv_path)
     
-    else:
-        # Create topic_overview.csv if it does not already exist
-        df = pd.DataFrame([{"video_id": videoid, "video_topic": response}])
-        log.info("create_topic_video: Created %s with category %s for video %s.", csv_path, response, video_title)
+        else:
+            # Create topic_overview.csv if it does not already exist
+            df = pd.DataFrame([{"video_id": videoid, "video_topic": response}])
+            log.info("create_topic_video: Created %s with category %s for video %s.", csv_path, response, video_title)
     
-    df.to_csv(csv_path, index=False)
+        df.to_csv(csv_path, index=False)
 
@@ -1,17 +1,18 @@
 import time
 import os
 import re
+from functools import lru_cache
 import PIL.Image
 import cv2
 from dotenv import load_dotenv
-import google.generativeai as genai
 import pandas as pd
-import ollama
 import torch
 import clip
 
 # Import other functions of the data_processing package
 from .logger import log, clean_up_logger
+from .model_calls import generate_gemini, chat_ollama
+from .llm_client import get_llm_client
 
 # Env variables
 load_dotenv() 
@@ -88,9 +89,6 @@ def create_image_description(video_id: str, gemini_model: str="gemini-1.5-flash"
         log.info("create_image_description: Start creating image descriptions for video with ID %s using %s as LLM.", video_id, gemini_model)
     else:
         log.info("create_image_description: Start creating image descriptions for video with ID %s using %s as LLM.", video_id, local_llm)
-    # Configure and load genai model
-    genai.configure(api_key=API_KEY_GOOGLE_GEMINI)
-    model = genai.GenerativeModel(gemini_model)
 
     # Paths
     frames_path_dir = f"{os.getenv('PROCESSED_VIDEOS_PATH').replace('_video_id_', video_id)}/frames"
@@ -98,71 +96,72 @@ def create_image_description(video_id: str, gemini_model: str="gemini-1.5-flash"
     file_frame_desc = "frame_descriptions.csv"
 
     all_image_files = os.listdir(frames_path_dir)
-
-    descriptions = []
-
-    requests_made = 0
-    # Iterate through all image files
-    for file in all_image_files:
+    file_path_frame_desc = f"{path_dir_frame_desc}/{file_frame_desc}"
+
+    # Every description is appended to the CSV right away, frames described by an interrupted earlier run are skipped
+    described_files = set()
+    if os.path.exists(file_path_frame_desc) and os.path.getsize(file_path_frame_desc) > 0:
+        described_files = set(pd.read_csv(file_path_frame_desc, dtype={"file_name": str})["file_name"])
+        log.info("create_image_description: Resuming with %s existing image descriptions for video with ID %s.", len(described_files), video_id)
+
+    prompt = (
+            "Describe the extracted image from the instructional video, focusing solely on the relevant content related to "
+            "the subject of the lesson: AI. Ignore irrelevant elements such as facecams or placeholders that are not related to "
+            "the topic. Focus on describing concepts, diagrams, graphs, key points, or any other visual content in the image. "
+            "If key points or visual representations of constructs, concepts, or models are shown, place them in context, "
+            "explain their significance, and describe how they relate to the topic. Provide a coherent text block, with no formatting, "
+            "bullet points, or other structural elements, just a clear and concise explanation of the image content. Also no line breaks or other special characters!"
+        )
+
+    pending_files = [file for file in all_image_files if file.replace(".jpg", "").split("_", 1)[0] not in described_files]
+    os.makedirs(path_dir_frame_desc, exist_ok=True)
+
+    def describe(file):
         image_file_path = frames_path_dir + "/" + file
-        image_file = PIL.Image.open(image_file_path)
-
-        prompt = (
-                "Describe the extracted image from the instructional video, focusing solely on the relevant content related to "
-                "the subject of the lesson: AI. Ignore irrelevant elements such as facecams or placeholders that are not related to "
-                "the topic. Focus on describing concepts, diagrams, graphs, key points, or any other visual content in the image. "
-                "If key points or visual representations of constructs, concepts, or models are shown, place them in context, "
-                "explain their significance, and describe how they relate to the topic. Provide a coherent text block, with no formatting, "
-                "bullet points, or other structural elements, just a clear and concise explanation of the image content. Also no line breaks or other special characters!"
-            )
-
         if not local_model:
-            if requests_made >= 10:
-                log.info("create_image_descriptions: Successfully created %s image descriptions.", requests_made)
-                log.warning("create_image_description: Too many API calls. Sleep for 60 seconds.")
-                time.sleep(60)
-                requests_made = 0
-
-            # Generate response
-            response = model.generate_content(
-                [prompt, image_file]
-            )
-
-            requests_made += 1
-        
-        else:
-            response = ollama.chat(
-                model=local_llm,
-                messages=[{
-                    "role": "user",
-                    "content": prompt,
-                    "images": [image_file_path]
-                }]
-            )
-            clean_up_logger()
-            if requests_made >= 10:
-                log.info("create_image_descriptions: Successfully created %s image descriptions.", requests_made)
-                requests_made = 0
-
-        if not os.path.exists(path_dir_frame_desc):
-            os.makedirs(path_dir_frame_desc)
+            return generate_gemini(gemini_model, prompt, images=[PIL.Image.open(image_file_path)], api_key=API_KEY_GOOGLE_GEMINI)
+        return chat_ollama(local_llm, prompt, image_paths=[image_file_path])
 
+    descriptions = 0
 
+    def save_description(index, response):
+        nonlocal descriptions
         # Save response in a designated file
-        filename = file.replace(".jpg", "")        
+        filename = pending_files[index].replace(".jpg", "")
         timestamp_ms = filename.split("_", 1)[1]
         filename = filename.split("_",1)[0]
         frame_time_s = float(timestamp_ms) / 1000
-        if not local_model:
-            descriptions.append({"video_id": video_id, "file_name": filename, "description": response.text.strip(), "time_in_s": frame_time_s})
-        else:
-            descriptions.append({"video_id": video_id, "file_name": filename, "description": response.message.content.strip(), "time_in_s": frame_time_s})
+        description = {"video_id": video_id, "file_name": filename, "description": response.strip(), "time_in_s": frame_time_s}
+        append_image_description(file_path_frame_desc, description)
+        descriptions += 1
         log.debug("creating_image_description: Successfully created an image description for file %s.", filename)
+        if descriptions % 10 == 0:
+            log.info("create_image_descriptions: Successfully created %s image descriptions.", descriptions)
+
+    # The frames are described concurrently (see llm_client.py), every description is saved as soon as it arrives
+    get_llm_client().map(describe, pending_files, on_result=save_description)
+    if local_model:
+        clean_up_logger()
+
+    if not os.path.exists(file_path_frame_desc):
+        pd.DataFrame(columns=["video_id", "file_name", "description", "time_in_s"]).to_csv(file_path_frame_desc, index=False)
 
-    df = pd.DataFrame(descriptions)
-    df.to_csv(f"{path_dir_frame_desc}/{file_frame_desc}", index=False)
+    log.info("creating_image_description: Successfully described all %s images for video with ID %s.", descriptions + len(described_files), video_id)
+
+
+def append_image_description(file_path: str, description: dict):
+    """
+    Append one image description to the frame descriptions CSV, written with its header if it does not exist yet.
 
-    log.info("creating_image_description: Successfully described all %s images for video with ID %s.", len(descriptions), video_id)
+    Args:
+        file_path (str): Path of the frame descriptions CSV.
+        description (dict): Row with the columns video_id, file_name, description and time_in_s.
+    """
+    write_header = not os.path.exists(file_path) or os.path.getsize(file_path) == 0
+    with open(file_path, "a", encoding="utf-8", newline="") as file:
+        pd.DataFrame([description]).to_csv(file, header=write_header, index=False)
+        file.flush()
+        os.fsync(file.fileno())
 
 
 def extract_number(filename):
@@ -181,6 +180,20 @@ def extract_number(filename):
     return int(match.group(1)) if match else float('inf')
 
 
+@lru_cache(maxsize=1)
+def get_clip_model():
+    """
+    Load the CLIP model once per process, it is shared by all videos.
+
+    Returns:
+        tuple: The model, its image preprocessing function and the device it runs on.
+    """
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    log.info("get_clip_model: Loading CLIP model ViT-B/32 on %s.", device)
+    model, preprocess = clip.load("ViT-B/32", device=device)
+    return model, preprocess, device
+
+
 def remove_duplicate_images(video_id:str, threshold: int=0.9):
     """
      Args:
@@ -204,8 +217,7 @@ def remove_duplicate_images(video_id:str, threshold: int=0.9):
 
     file_names_sorted = [os.path.join(frames_path_dir, filename) for filename in file_names_sorted]
 
-    device = "cuda" if torch.cuda.is_available() else "cpu"
-    model, preprocess = clip.load("ViT-B/32", device=device)
+    model, preprocess, device = get_clip_model()
 
     if len(file_names_sorted) <= 1:
         log.warning("remove_duplicate_images: Skipped removing duplicate images, because less than two images are available.")
@@ -0,0 +1,179 @@
+import asyncio
+import os
+import threading
+from dotenv import load_dotenv
+from neo4j import AsyncGraphDatabase, READ_ACCESS, WRITE_ACCESS, unit_of_work
+
+load_dotenv()
+
+# Connection settings shared by the RAG queries and the ingestion pipeline
+NEO4J_MAX_CONNECTION_POOL_SIZE = int(os.getenv("NEO4J_MAX_CONNECTION_POOL_SIZE", "50"))
+NEO4J_CONNECTION_ACQUISITION_TIMEOUT = float(os.getenv("NEO4J_CONNECTION_ACQUISITION_TIMEOUT", "10"))
+NEO4J_QUERY_TIMEOUT = float(os.getenv("NEO4J_QUERY_TIMEOUT", "15"))
+NEO4J_DATABASE = os.getenv("NEO4J_DATABASE") or None
+
+ENTITY_NAME_INDEX = "entity_name_fulltext"
+
+graph_connection = None
+graph_connection_lock = threading.Lock()
+
+
+async def _run_query(tx, query: str, parameters: dict):
+    result = await tx.run(query, parameters)
+    return await result.data()
+
+
+class GraphConnection:
+    """
+    Shared access to Neo4j through the async driver.
+
+    The driver is created lazily on the first query. It lives on a dedicated event loop thread, so the
+    synchronous RAG and pipeline code can use the blocking `read`/`write` wrappers, while async code
+    awaits `read_async`/`write_async` on the same connection pool.
+    Reads run as managed read transactions, which a cluster routes to read replicas when the URI uses
+    the `neo4j://` scheme. Every transaction gets a server-side timeout.
+    """
+
+    def __init__(self, uri: str, user: str, password: str,
+                 max_connection_pool_size: int = NEO4J_MAX_CONNECTION_POOL_SIZE,
+                 connection_acquisition_timeout: float = NEO4J_CONNECTION_ACQUISITION_TIMEOUT,
+                 query_timeout: float = NEO4J_QUERY_TIMEOUT,
+                 database: str | None = NEO4J_DATABASE):
+        self.uri = uri
+        self.auth = (user, password)
+        self.max_connection_pool_size = max_connection_pool_size
+        self.connection_acquisition_timeout = connection_acquisition_timeout
+        self.query_timeout = query_timeout
+        self.database = database
+        self._driver = None
+        self._loop = None
+        self._lock = threading.Lock()
+
+    def _get_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name="neo4j-event-loop", daemon=True).start()
+            return self._loop
+
+    def _submit(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self._get_loop()).result()
+
+    async def _get_driver(self):
+        if self._driver is None:
+            self._driver = AsyncGraphDatabase.driver(
+                self.uri,
+                auth=self.auth,
+                max_connection_pool_size=self.max_connection_pool_size,
+                connection_acquisition_timeout=self.connection_acquisition_timeout
+            )
+        return self._driver
+
+    async def read_async(self, query: str, parameters: dict | None = None, timeout: float | None = None) -> list[dict]:
+        driver = await self._get_driver()
+        work = unit_of_work(timeout=timeout or self.query_timeout)(_run_query)
+        async with driver.session(database=self.database, default_access_mode=READ_ACCESS) as session:
+            return await session.execute_read(work, query, parameters or {})
+
+    async def write_async(self, query: str, parameters: dict | None = None, timeout: float | None = None) -> list[dict]:
+        driver = await self._get_driver()
+        work = unit_of_work(timeout=timeout or self.query_timeout)(_run_query)
+        async with driver.session(database=self.database, default_access_mode=WRITE_ACCESS) as session:
+            return await session.execute_write(work, query, parameters or {})
+
+    async def read_many_async(self, queries: list[str], timeout: float | None = None) -> list[list[dict]]:
+        return await asyncio.gather(*(self.read_async(query, timeout=timeout) for query in queries))
+
+    async def verify_connectivity_async(self):
+        driver = await self._get_driver()
+        await driver.verify_connectivity()
+
+    async def close_async(self):
+        if self._driver is not None:
+            await self._driver.close()
+            self._driver = None
+
+    def read(self, query: str, parameters: dict | None = None, timeout: float | None = None) -> list[dict]:
+        """
+        Run a query in a managed read transaction.
+
+        Args:
+            query (str): Cypher query.
+            parameters (dict, optional): Query parameters.
+            timeout (float, optional): Transaction timeout in seconds. Defaults to NEO4J_QUERY_TIMEOUT.
+
+        Returns:
+            list[dict]: The records of the result.
+        """
+        return self._submit(self.read_async(query, parameters, timeout))
+
+    def write(self, query: str, parameters: dict | None = None, timeout: float | None = None) -> list[dict]:
+        """
+        Run a query in a managed write transaction.
+
+        Args:
+            query (str): Cypher query.
+            parameters (dict, optional): Query parameters.
+            timeout (float, optional): Transaction timeout in seconds. Defaults to NEO4J_QUERY_TIMEOUT.
+
+        Returns:
+            list[dict]: The records of the result.
+        """
+        return self._submit(self.write_async(query, parameters, timeout))
+
+    def read_many(self, queries: list[str], timeout: float | None = None) -> list[list[dict]]:
+        """
+        Run independent read queries concurrently, each in its own read transaction.
+
+        Returns:
+            list[list[dict]]: The records of each query in the order of the queries.
+        """
+        return self._submit(self.read_many_async(queries, timeout))
+
+    def verify_connectivity(self):
+        self._submit(self.verify_connectivity_async())
+
+    def close(self):
+        if self._loop is not None:
+            self._submit(self.close_async())
+
+
+def get_graph_connection(uri: str | None = None, user: str | None = None, password: str | None = None) -> GraphConnection:
+    """
+    Return the process-wide graph connection, creating it on the first call.
+    The credentials default to the NEO4J_URI, NEO4J_USER and NEO4J_PASSWORD env variables.
+    No network connection is opened before the first query.
+
+    Example:
+        get_graph_connection().read("MATCH (n:Entity) RETURN count(n) AS count")
+    """
+    global graph_connection
+
+    with graph_connection_lock:
+        if graph_connection is None:
+            graph_connection = GraphConnection(
+                uri=uri or os.getenv("NEO4J_URI"),
+                user=user or os.getenv("NEO4J_USER"),
+                password=password or os.getenv("NEO4J_PASSWORD")
+            )
+        return graph_connection
+
+
+def close_graph_connection():
+    global graph_connection
+
+    with graph_connection_lock:
+        if graph_connection is not None:
+            graph_connection.close()
+            graph_connection = None
+
+
+def create_entity_name_index(connection: GraphConnection):
+    """
+    Creates the full-text index on the entity names, which is used to link questions to entities.
+    The statement is a no-op if the index already exists.
+    """
+    connection.write(f"""
+        CREATE FULLTEXT INDEX {ENTITY_NAME_INDEX} IF NOT EXISTS
+        FOR (n:Entity) ON EACH [n.name]
+    """)
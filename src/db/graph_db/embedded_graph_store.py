@@ -0,0 +1,335 @@
+import json
+import os
+import re
+import threading
+import numpy as np
+
+from src.db.graph_db.graph_store import GraphStore
+
+
+def tokenize_name(name: str) -> list[str]:
+    return re.findall(r"[a-z0-9]+", name.lower())
+
+
+class EmbeddedGraphStore(GraphStore):
+    """
+    In-process graph store for small deployments and tests.
+
+    Relations are kept as compressed sparse row (CSR) arrays: the outgoing relations of entity i are
+    indices[indptr[i]:indptr[i + 1]] with their type ids in relation_ids at the same positions. A second
+    CSR holds the incoming relations, so neighborhoods can be expanded in both directions.
+    New relations are collected in a pending set and merged into the arrays on the next read or flush.
+
+    The graph is persisted to a directory:
+        entities.json  names and property lists of the entities
+        relations.npz  CSR arrays and the relation type names
+    Changes made by another process are picked up on the next read.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entities_path = os.path.join(path, "entities.json")
+        self.relations_path = os.path.join(path, "relations.npz")
+        self._lock = threading.RLock()
+        self._loaded_mtime = None
+        self._reset()
+        self._load()
+
+    def _reset(self):
+        self.names = []
+        self.name_to_id = {}
+        self.properties = []
+        self.relation_types = []
+        self.relation_type_to_id = {}
+        self.out_indptr = np.zeros(1, dtype=np.int64)
+        self.out_indices = np.zeros(0, dtype=np.int32)
+        self.out_relation_ids = np.zeros(0, dtype=np.int16)
+        self.in_indptr = np.zeros(1, dtype=np.int64)
+        self.in_indices = np.zeros(0, dtype=np.int32)
+        self.in_relation_ids = np.zeros(0, dtype=np.int16)
+        self.pending_relations = set()
+        self.token_index = None
+        self.dirty = False
+
+    # ********************************************************
+    # * Persistence
+
+    def _load(self):
+        if not os.path.exists(self.entities_path) or not os.path.exists(self.relations_path):
+            return
+
+        self._reset()
+        with open(self.entities_path, "r", encoding="utf-8") as file:
+            entities = json.load(file)
+        self.names = [entity["name"] for entity in entities]
+        self.properties = [entity["properties"] for entity in entities]
+        self.name_to_id = {name: i for i, name in enumerate(self.names)}
+
+        with np.load(self.relations_path, allow_pickle=False) as relations:
+            self.relation_types = [str(relation_type) for relation_type in relations["relation_types"]]
+            self.out_indptr = relations["out_indptr"]
+            self.out_indices = relations["out_indices"]
+            self.out_relation_ids = relations["out_relation_ids"]
+            self.in_indptr = relations["in_indptr"]
+            self.in_indices = relations["in_indices"]
+            self.in_relation_ids = relations["in_relation_ids"]
+        self.relation_type_to_id = {relation_type: i for i, relation_type in enumerate(self.relation_types)}
+        self._loaded_mtime = os.path.getmtime(self.relations_path)
+
+    def _reload_if_changed(self):
+        if self.dirty or not os.path.exists(self.relations_path):
+            return
+        if os.path.getmtime(self.relations_path) != self._loaded_mtime:
+            self._load()
+
+    def flush(self) -> None:
+        with self._lock:
+            if not self.dirty:
+                return
+            self._compact()
+            os.makedirs(self.path, exist_ok=True)
+
+            entities = [{"name": name, "properties": properties} for name, properties in zip(self.names, self.properties)]
+            with open(self.entities_path + ".tmp", "w", encoding="utf-8") as file:
+                json.dump(entities, file)
+
+            with open(self.relations_path + ".tmp", "wb") as file:
+                np.savez(
+                    file,
+                    relation_types=np.array(self.relation_types, dtype=str),
+                    out_indptr=self.out_indptr,
+                    out_indices=self.out_indices,
+                    out_relation_ids=self.out_relation_ids,
+                    in_indptr=self.in_indptr,
+                    in_indices=self.in_indices,
+                    in_relation_ids=self.in_relation_ids
+                )
+
+            # entities first, readers reload once the relations file changes
+            os.replace(self.entities_path + ".tmp", self.entities_path)
+            os.replace(self.relations_path + ".tmp", self.relations_path)
+            self._loaded_mtime = os.path.getmtime(self.relations_path)
+            self.dirty = False
+
+    # ********************************************************
+    # * CSR maintenance
+
+    def _edge_arrays(self):
+        """All relations (committed and pending) as parallel source, relation id and target arrays."""
+        counts = np.diff(self.out_indptr)
+        sources = np.repeat(np.arange(len(counts), dtype=np.int32), counts)
+        relation_ids = self.out_relation_ids
+        targets = self.out_indices
+        if self.pending_relations:
+            pending = np.array(sorted(self.pending_relations), dtype=np.int64).reshape(-1, 3)
+            sources = np.concatenate([sources, pending[:, 0].astype(np.int32)])
+            relation_ids = np.concatenate([relation_ids, pending[:, 1].astype(np.int16)])
+            targets = np.concatenate([targets, pending[:, 2].astype(np.int32)])
+        return sources, relation_ids, targets
+
+    @staticmethod
+    def _build_csr(rows, columns, relation_ids, node_count):
+        order = np.lexsort((columns, relation_ids, rows))
+        indptr = np.zeros(node_count + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=node_count), out=indptr[1:])
+        return indptr, columns[order].astype(np.int32), relation_ids[order].astype(np.int16)
+
+    def _rebuild(self, sources, relation_ids, targets):
+        node_count = len(self.names)
+        self.out_indptr, self.out_indices, self.out_relation_ids = self._build_csr(sources, targets, relation_ids, node_count)
+        self.in_indptr, self.in_indices, self.in_relation_ids = self._build_csr(targets, sources, relation_ids, node_count)
+        self.pending_relations = set()
+
+    def _compact(self):
+        if self.pending_relations or len(self.out_indptr) != len(self.names) + 1:
+            self._rebuild(*self._edge_arrays())
+
+    def _has_relation(self, source: int, relation_id: int, target: int) -> bool:
+        if (source, relation_id, target) in self.pending_relations:
+            return True
+        if source + 1 >= len(self.out_indptr):
+            return False
+        start, end = self.out_indptr[source], self.out_indptr[source + 1]
+        return bool(np.any((self.out_indices[start:end] == target) & (self.out_relation_ids[start:end] == relation_id)))
+
+    # ********************************************************
+    # * Writes
+
+    def upsert_entities(self, names: list[str], properties: dict) -> None:
+        with self._lock:
+            for name in dict.fromkeys(names):
+                entity_id = self.name_to_id.get(name)
+                if entity_id is None:
+                    entity_id = len(self.names)
+                    self.name_to_id[name] = entity_id
+                    self.names.append(name)
+                    self.properties.append({})
+                    self.token_index = None
+                entity_properties = self.properties[entity_id]
+                for key, value in properties.items():
+                    # mirrors coalesce(n.key, []) + $key: lists are concatenated, everything else is appended
+                    if isinstance(value, (list, tuple)):
+                        entity_properties.setdefault(key, []).extend(value)
+                    else:
+                        entity_properties.setdefault(key, []).append(value)
+            self.dirty = True
+
+    def merge_relations(self, relation_type: str, pairs: list[tuple[str, str]]) -> None:
+        with self._lock:
+            relation_id = self.relation_type_to_id.get(relation_type)
+            if relation_id is None:
+                relation_id = len(self.relation_types)
+                self.relation_type_to_id[relation_type] = relation_id
+                self.relation_types.append(relation_type)
+            for source, target in pairs:
+                source_id = self.name_to_id.get(source)
+                target_id = self.name_to_id.get(target)
+                # like MATCH ... MATCH ... MERGE, relations to unknown entities are ignored
+                if source_id is None or target_id is None:
+                    continue
+                if not self._has_relation(source_id, relation_id, target_id):
+                    self.pending_relations.add((source_id, relation_id, target_id))
+            self.dirty = True
+
+    def delete_orphans(self) -> None:
+        with self._lock:
+            sources, relation_ids, targets = self._edge_arrays()
+            degree = np.bincount(sources, minlength=len(self.names)) + np.bincount(targets, minlength=len(self.names))
+            keep = degree > 0
+            if keep.all():
+                return
+
+            new_ids = np.cumsum(keep) - 1
+            self.names = [name for name, kept in zip(self.names, keep) if kept]
+            self.properties = [properties for properties, kept in zip(self.properties, keep) if kept]
+            self.name_to_id = {name: i for i, name in enumerate(self.names)}
+            self.token_index = None
+            self._rebuild(new_ids[sources], relation_ids, new_ids[targets])
+            self.dirty = True
+
+    def add_frame_attributes(self, video_id: str, frames: list[dict]) -> None:
+        with self._lock:
+            entities_by_time = {}
+            for entity_id, properties in enumerate(self.properties):
+                for url_id, time in zip(properties.get("url_id", []), properties.get("time", [])):
+                    if url_id == video_id:
+                        entities_by_time.setdefault(time, set()).add(entity_id)
+
+            for frame in frames:
+                for entity_id in sorted(entities_by_time.get(frame["time"], ())):
+                    properties = self.properties[entity_id]
+                    properties.setdefault("frame_name", []).append(frame["frame_name"])
+                    properties.setdefault("frame_description", []).append(frame["description"])
+            self.dirty = True
+
+    def ensure_indexes(self) -> None:
+        with self._lock:
+            self._build_token_index()
+
+    # ********************************************************
+    # * Reads
+
+    def _build_token_index(self):
+        if self.token_index is not None:
+            return
+        self.token_index = {}
+        for entity_id, name in enumerate(self.names):
+            for token in set(tokenize_name(name)):
+                self.token_index.setdefault(token, []).append(entity_id)
+
+    def link_entities(self, terms: list[str], limit: int) -> list[dict]:
+        """
+        Score the entities by the share of their name tokens covered by a term.
+        An exact name match gets an additional bonus, longer matching terms score higher.
+        """
+        with self._lock:
+            self._reload_if_changed()
+            self._build_token_index()
+            scores = {}
+            for term in terms:
+                term_tokens = set(tokenize_name(term))
+                if len(term_tokens) == 0:
+                    continue
+                candidates = set()
+                for token in term_tokens:
+                    candidates.update(self.token_index.get(token, ()))
+                for entity_id in candidates:
+                    name_tokens = set(tokenize_name(self.names[entity_id]))
+                    overlap = len(name_tokens & term_tokens)
+                    score = overlap / len(name_tokens | term_tokens) * len(term_tokens)
+                    if self.names[entity_id].lower() == term.lower():
+                        score += len(term_tokens)
+                    scores[entity_id] = max(scores.get(entity_id, 0.0), score)
+
+            ranked = sorted(scores.items(), key=lambda item: (-item[1], self.names[item[0]]))[:limit]
+            return [{"name": self.names[entity_id], "score": score} for entity_id, score in ranked]
+
+    def expand_neighborhood(self, names: list[str], hops: int, limit: int) -> list[dict]:
+        with self._lock:
+            self._reload_if_changed()
+            self._compact()
+            frontier = np.array([self.name_to_id[name] for name in names if name in self.name_to_id], dtype=np.int64)
+            visited = set(frontier.tolist())
+            relations = []
+            seen = set()
+
+            for _ in range(max(1, min(int(hops), 2))):
+                if len(frontier) == 0:
+                    break
+                next_frontier = []
+                for indptr, indices, relation_ids, outgoing in (
+                        (self.out_indptr, self.out_indices, self.out_relation_ids, True),
+                        (self.in_indptr, self.in_indices, self.in_relation_ids, False)):
+                    starts, ends = indptr[frontier], indptr[frontier + 1]
+                    counts = ends - starts
+                    if counts.sum() == 0:
+                        continue
+                    positions = np.concatenate([np.arange(start, end) for start, end in zip(starts, ends)])
+                    origins = np.repeat(frontier, counts)
+                    neighbors = indices[positions]
+                    for origin, relation_id, neighbor in zip(origins.tolist(), relation_ids[positions].tolist(), neighbors.tolist()):
+                        edge = (origin, relation_id, neighbor) if outgoing else (neighbor, relation_id, origin)
+                        if edge not in seen:
+                            seen.add(edge)
+                            relations.append(edge)
+                    next_frontier.append(neighbors)
+                frontier = np.setdiff1d(np.concatenate(next_frontier) if next_frontier else np.zeros(0, dtype=np.int64),
+                                        np.fromiter(visited, dtype=np.int64))
+                visited.update(frontier.tolist())
+
+            return [
+                {"source": self.names[source], "relation": self.relation_types[relation_id], "target": self.names[target]}
+                for source, relation_id, target in relations[:limit]
+            ]
+
+    def get_entities(self, names: list[str]) -> list[dict]:
+        with self._lock:
+            self._reload_if_changed()
+            entities = []
+            for name in names:
+                entity_id = self.name_to_id.get(name)
+                if entity_id is None:
+                    continue
+                properties = self.properties[entity_id]
+                entities.append({
+                    "name": name,
+                    "text": properties.get("text", []),
+                    "time": properties.get("time", []),
+                    "url_id": properties.get("url_id", [])
+                })
+            return entities
+
+    def get_full_graph(self) -> dict:
+        with self._lock:
+            self._reload_if_changed()
+            self._compact()
+            nodes = [
+                {"node": {"name": name, **properties}, "type": "Entity", "properties": {"name": name, **properties}}
+                for name, properties in zip(self.names, self.properties)
+            ]
+            sources, relation_ids, targets = self._edge_arrays()
+            relationships = [
+                {"start": {"name": self.names[source]}, "type": self.relation_types[relation_id], "end": {"name": self.names[target]}, "properties": {}}
+                for source, relation_id, target in zip(sources.tolist(), relation_ids.tolist(), targets.tolist())
+            ]
+            return {"nodes": nodes, "relationships": relationships}
@@ -0,0 +1,193 @@
+import os
+from abc import ABC, abstractmethod
+import threading
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# "neo4j" uses the Neo4j server, "embedded" keeps the graph in-process and persists it to EMBEDDED_GRAPH_PATH
+GRAPH_BACKEND = os.getenv("GRAPH_BACKEND", "neo4j")
+EMBEDDED_GRAPH_PATH = os.getenv("EMBEDDED_GRAPH_PATH", "db/graphdb")
+
+LUCENE_SPECIAL_CHARACTERS = set('+-&|!(){}[]^"~*?:\\/')
+
+graph_store = None
+graph_store_lock = threading.Lock()
+
+
+class GraphStore(ABC):
+    """
+    Operations on the entity graph used by the ingestion pipeline and the RAG graph retrieval.
+
+    Entities are identified by their name. Their properties are parallel lists, one entry per transcript
+    chunk the entity was found in, e.g. text[i], time[i] and url_id[i] belong to the same chunk.
+    """
+
+    # Whether arbitrary (LLM generated) Cypher queries can be run against the store
+    supports_cypher = False
+
+    @abstractmethod
+    def upsert_entities(self, names: list[str], properties: dict) -> None:
+        """Create missing entities and append the properties to the property lists of every entity."""
+
+    @abstractmethod
+    def merge_relations(self, relation_type: str, pairs: list[tuple[str, str]]) -> None:
+        """Create a relation of the given type between existing entities, unless it already exists."""
+
+    @abstractmethod
+    def delete_orphans(self) -> None:
+        """Delete all entities without relations."""
+
+    @abstractmethod
+    def add_frame_attributes(self, video_id: str, frames: list[dict]) -> None:
+        """Append frame_name and description of each frame to the entities found at the frame's chunk time of the video."""
+
+    @abstractmethod
+    def ensure_indexes(self) -> None:
+        """Create the indexes needed for entity linking."""
+
+    @abstractmethod
+    def link_entities(self, terms: list[str], limit: int) -> list[dict]:
+        """Return the entities whose names best match the terms as dicts with name and score, best first."""
+
+    @abstractmethod
+    def expand_neighborhood(self, names: list[str], hops: int, limit: int) -> list[dict]:
+        """Return the relations within `hops` hops of the entities as dicts with source, relation and target."""
+
+    @abstractmethod
+    def get_entities(self, names: list[str]) -> list[dict]:
+        """Return name, text, time and url_id of the entities."""
+
+    @abstractmethod
+    def get_full_graph(self) -> dict:
+        """
+        Return all entities and relations, for inspection:
+        {"nodes": [{node, type, properties}], "relationships": [{start, type, end, properties}]}
+        """
+
+    def flush(self) -> None:
+        """Persist pending changes."""
+
+    def close(self) -> None:
+        self.flush()
+
+
+def escape_lucene(term: str) -> str:
+    return "".join(f"\\{char}" if char in LUCENE_SPECIAL_CHARACTERS else char for char in term)
+
+
+class Neo4jGraphStore(GraphStore):
+    """Graph store backed by the Neo4j server through the shared connection."""
+
+    supports_cypher = True
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def upsert_entities(self, names: list[str], properties: dict) -> None:
+        assignments = ",\n            ".join(f"n.{key} = coalesce(n.{key}, []) + ${key}" for key in properties)
+        query = f"""
+        UNWIND $names AS name
+        MERGE (n:Entity {{name: name}})
+        SET {assignments}
+        """
+        self.connection.write(query, parameters={"names": list(dict.fromkeys(names)), **properties})
+
+    def merge_relations(self, relation_type: str, pairs: list[tuple[str, str]]) -> None:
+        query = f"""
+            UNWIND $pairs AS pair
+            MATCH (a:Entity {{name: pair.source}})
+            MATCH (b:Entity {{name: pair.target}})
+            MERGE (a)-[:{relation_type}]->(b)
+        """
+        self.connection.write(query, parameters={"pairs": [{"source": source, "target": target} for source, target in pairs]})
+
+    def delete_orphans(self) -> None:
+        self.connection.write("""
+            MATCH (n:Entity)
+            WHERE NOT (n)--()
+            DELETE n
+        """)
+
+    def add_frame_attributes(self, video_id: str, frames: list[dict]) -> None:
+        query = """
+        UNWIND $frames AS frame
+        MATCH (n:Entity)
+        WHERE
+        ANY(i IN RANGE(0, SIZE(n.url_id) - 1)
+            WHERE n.url_id[i] = $id AND n.time[i] = frame.time)
+        SET n.frame_name = coalesce(n.frame_name, []) + frame.frame_name,
+            n.frame_description = coalesce(n.frame_description, []) + frame.description
+        """
+        self.connection.write(query, parameters={"id": video_id, "frames": frames})
+
+    def ensure_indexes(self) -> None:
+        from src.db.graph_db.connection import create_entity_name_index
+        create_entity_name_index(self.connection)
+
+    def link_entities(self, terms: list[str], limit: int) -> list[dict]:
+        from src.db.graph_db.connection import ENTITY_NAME_INDEX
+        return self.connection.read(f"""
+            CALL db.index.fulltext.queryNodes('{ENTITY_NAME_INDEX}', $query) YIELD node, score
+            RETURN node.name AS name, score
+            ORDER BY score DESC
+            LIMIT $limit
+        """, {"query": " OR ".join(f'"{escape_lucene(term)}"' for term in terms), "limit": limit})
+
+    def expand_neighborhood(self, names: list[str], hops: int, limit: int) -> list[dict]:
+        hops = max(1, min(int(hops), 2))
+        return self.connection.read(f"""
+            MATCH path = (seed:Entity)-[*1..{hops}]-(:Entity)
+            WHERE seed.name IN $names
+            UNWIND relationships(path) AS r
+            WITH DISTINCT r
+            RETURN startNode(r).name AS source, type(r) AS relation, endNode(r).name AS target
+            LIMIT $limit
+        """, {"names": names, "limit": limit})
+
+    def get_entities(self, names: list[str]) -> list[dict]:
+        return self.connection.read("""
+            MATCH (n:Entity)
+            WHERE n.name IN $names
+            RETURN n.name AS name, n.text AS text, n.time AS time, n.url_id AS url_id
+        """, {"names": names})
+
+    def get_full_graph(self) -> dict:
+        return self.connection.read("""
+            MATCH (n)
+            OPTIONAL MATCH (n)-[r]->(m)
+            RETURN collect(distinct {
+                node: n,
+                type: labels(n)[0],
+                properties: properties(n)
+            }) as nodes,
+            collect(distinct {
+                start: startNode(r),
+                type: type(r),
+                end: endNode(r),
+                properties: properties(r)
+            }) as relationships
+        """)[0]
+
+
+def get_graph_store(uri: str | None = None, user: str | None = None, password: str | None = None) -> GraphStore:
+    """
+    Return the process-wide graph store of the configured GRAPH_BACKEND, creating it on the first call.
+    The connection arguments are only used by the Neo4j backend.
+
+    Example:
+        get_graph_store().link_entities(["neural network"], limit=5)
+    """
+    global graph_store
+
+    with graph_store_lock:
+        if graph_store is None:
+            if GRAPH_BACKEND == "embedded":
+                from src.db.graph_db.embedded_graph_store import EmbeddedGraphStore
+                graph_store = EmbeddedGraphStore(EMBEDDED_GRAPH_PATH)
+            elif GRAPH_BACKEND == "neo4j":
+                from src.db.graph_db.connection import get_graph_connection
+                graph_store = Neo4jGraphStore(get_graph_connection(uri, user, password))
+            else:
+                raise ValueError(f"Unknown GRAPH_BACKEND: {GRAPH_BACKEND}. Use 'neo4j' or 'embedded'.")
+        return graph_store
@@ -0,0 +1,81 @@
+import pytest
+
+from src.db.graph_db.embedded_graph_store import EmbeddedGraphStore
+
+
+def chunk_properties(time, text, url_id="video1"):
+    return {"time": time, "text": text, "url_id": url_id, "tags": ["ml", "ai"]}
+
+
+@pytest.fixture(scope="function")
+def store(tmp_path):
+    store = EmbeddedGraphStore(str(tmp_path / "graphdb"))
+    store.upsert_entities(["neural network", "layer", "weight"], chunk_properties(10, "A neural network has layers."))
+    store.upsert_entities(["neural network", "gradient descent"], chunk_properties(20, "Gradient descent trains networks."))
+    store.upsert_entities(["orphan"], chunk_properties(30, "Unrelated."))
+    store.merge_relations("HAS", [("neural network", "layer"), ("layer", "weight"), ("neural network", "layer")])
+    store.merge_relations("TRAINS", [("gradient descent", "neural network"), ("gradient descent", "unknown")])
+    return store
+
+
+def test_upsert_appends_properties(store):
+    entity = store.get_entities(["neural network"])[0]
+    assert entity["time"] == [10, 20]
+    assert entity["text"] == ["A neural network has layers.", "Gradient descent trains networks."]
+    assert store.properties[store.name_to_id["layer"]]["tags"] == ["ml", "ai"]
+
+
+def test_merge_relations_is_idempotent(store):
+    relations = store.expand_neighborhood(["layer"], hops=1, limit=10)
+    assert sorted((r["source"], r["relation"], r["target"]) for r in relations) == [
+        ("layer", "HAS", "weight"),
+        ("neural network", "HAS", "layer")
+    ]
+
+
+def test_expand_neighborhood_two_hops(store):
+    relations = store.expand_neighborhood(["weight"], hops=2, limit=10)
+    assert {(r["source"], r["target"]) for r in relations} == {("layer", "weight"), ("neural network", "layer")}
+    assert len(store.expand_neighborhood(["weight"], hops=2, limit=1)) == 1
+
+
+def test_delete_orphans_keeps_relations(store):
+    store.delete_orphans()
+    assert "orphan" not in store.name_to_id
+    assert store.get_entities(["orphan"]) == []
+    relations = store.expand_neighborhood(["gradient descent"], hops=1, limit=10)
+    assert [(r["source"], r["relation"], r["target"]) for r in relations] == [("gradient descent", "TRAINS", "neural network")]
+
+
+def test_link_entities_prefers_exact_match(store):
+    linked = store.link_entities(["neural network", "network"], limit=2)
+    assert linked[0]["name"] == "neural network"
+    assert store.link_entities(["transformer"], limit=5) == []
+
+
+def test_add_frame_attributes(store):
+    store.add_frame_attributes("video1", [{"time": 20, "frame_name": "frame_20.jpg", "description": "A plot"}])
+    properties = store.properties[store.name_to_id["gradient descent"]]
+    assert properties["frame_name"] == ["frame_20.jpg"]
+    assert "frame_name" not in store.properties[store.name_to_id["layer"]]
+
+
+def test_get_full_graph(store):
+    graph = store.get_full_graph()
+    assert {node["properties"]["name"] for node in graph["nodes"]} == {"neural network", "layer", "weight", "gradient descent", "orphan"}
+    assert sorted((r["start"]["name"], r["type"], r["end"]["name"]) for r in graph["relationships"]) == [
+        ("gradient descent", "TRAINS", "neural network"),
+        ("layer", "HAS", "weight"),
+        ("neural network", "HAS", "layer")
+    ]
+
+
+def test_flush_and_reload(store, tmp_path):
+    store.delete_orphans()
+    store.flush()
+
+    reloaded = EmbeddedGraphStore(str(tmp_path / "graphdb"))
+    assert reloaded.names == store.names
+    assert reloaded.get_entities(["layer"]) == store.get_entities(["layer"])
+    assert reloaded.expand_neighborhood(["neural network"], hops=1, limit=10) == \
+        store.expand_neighborhood(["neural network"], hops=1, limit=10)
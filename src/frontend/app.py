@@ -8,48 +8,33 @@ import requests
 import logging
 import json
 import re
+import uuid
+import codecs
+
+try:
+    from .data_access import transaction, initialize_database, get_chat_history_page
+    from .metadata_cache import get_metadata_cache
+except ImportError:
+    # Started with "streamlit run", the directory of the script is on the path
+    from data_access import transaction, initialize_database, get_chat_history_page
+    from metadata_cache import get_metadata_cache
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 DB_PATH = "src/frontend/database/chatbot.db"
 BASE_URL = "http://localhost:8000"
+HISTORY_PAGE_SIZE = 20
+CHAT_TIMEOUT = (5, 300) # seconds to connect, seconds between two received chunks
+METADATA_TIMEOUT = (5, 60)
+# Backend metadata is fresh for 5 minutes, afterwards it is served for up to an hour while it is reloaded in the background
+metadata_cache = get_metadata_cache(ttl=300, stale_ttl=3600)
 
 # Database Initialization
 def init_db():
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    # Users
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS users (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        username TEXT UNIQUE,
-        password TEXT
-    )
-    """)
-    # Chat history
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS chat_history (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        username TEXT,
-        message TEXT,
-        response TEXT,
-        message_timestamp TEXT,
-        response_timestamp TEXT
-    )
-    """)
-    # Support requests
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS support_requests (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        username TEXT,
-        message TEXT
-    )
-    """)
-
-    # Add admin user
-    admin_password = hash_password("admin")
-    cursor.execute("INSERT OR IGNORE INTO users (username, password) VALUES ('admin', ?)", (admin_password,))
-    conn.commit()
-    conn.close()
+    if initialize_database(DB_PATH):
+        # Add admin user
+        admin_password = hash_password("admin")
+        with transaction(DB_PATH) as cursor:
+            cursor.execute("INSERT OR IGNORE INTO users (username, password) VALUES ('admin', ?)", (admin_password,))
 
 
 def hash_password(password):
@@ -57,24 +42,18 @@ def hash_password(password):
 
 
 def register_user(username, password, db_path=DB_PATH):
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
     try:
-        cursor.execute("INSERT INTO users (username, password) VALUES (?, ?)",(username, hash_password(password)))
-        conn.commit()
+        with transaction(db_path) as cursor:
+            cursor.execute("INSERT INTO users (username, password) VALUES (?, ?)",(username, hash_password(password)))
         return True
     except sqlite3.IntegrityError:
         return False # User already exists
-    finally:
-        conn.close()
 
 
 def authenticate_user(username, password, db_path=DB_PATH):
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    cursor.execute("SELECT password FROM users WHERE username = ?", (username,))
-    result = cursor.fetchone()
-    conn.close()
+    with transaction(db_path) as cursor:
+        cursor.execute("SELECT password FROM users WHERE username = ?", (username,))
+        result = cursor.fetchone()
     if result:
         stored_password = result[0]
         return stored_password == hash_password(password)
@@ -95,8 +74,10 @@ def get_chat_response(prompt, message_history=None, model_id=None, database=None
     if st.session_state.settings["video_id"]:
         video_id = st.session_state.settings["video_id"]
 
+    # The backend keeps the history of the conversation, only its ID is sent
+    conversation_id = None
     if st.session_state.settings["history"]:
-        message_history = get_chat_history(st.session_state.username, True)
+        conversation_id = st.session_state.conversation_id
 
     if st.session_state.settings["database"] != "All":
         database = st.session_state.settings["database"]
@@ -115,10 +96,42 @@ def get_chat_response(prompt, message_history=None, model_id=None, database=None
         "plaintext": st.session_state.settings["plaintext"],
         "mode": st.session_state.settings["mode"],
         "use_logical_routing": st.session_state.settings["use_logical_routing"],
-        "use_semantic_routing": st.session_state.settings["use_semantic_routing"]
+        "use_semantic_routing": st.session_state.settings["use_semantic_routing"],
+        "conversation_id": conversation_id
     }
-    response = requests.post(f"{BASE_URL}/chat", json=payload)
-    return response.iter_lines()
+    started = time.perf_counter()
+    response = get_http_session().post(f"{BASE_URL}/chat", json=payload, stream=True, timeout=CHAT_TIMEOUT)
+    return iter_text_deltas(response, started)
+
+
+@st.cache_resource
+def get_http_session():
+    # One session per Streamlit server: the connection to the backend is kept alive between requests and reruns
+    return requests.Session()
+
+
+def iter_text_deltas(response, started):
+    """
+    Yield the text of a streamed response as soon as it arrives and log the client-side time to first token.
+
+    Args:
+        response: Response of a request with stream=True
+        started: time.perf_counter() before the request was sent
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    first_token = None
+    for chunk in response.iter_content(chunk_size=None):
+        delta = decoder.decode(chunk)
+        if not delta:
+            continue
+        if first_token is None:
+            first_token = time.perf_counter() - started
+            logging.info(f"Time to first token: {first_token:.2f}s")
+        yield delta
+    delta = decoder.decode(b"", final=True)
+    if delta:
+        yield delta
+    logging.info(f"Response streamed in {time.perf_counter() - started:.2f}s")
 
 
 def get_analyze_response(prompt, ytvideo, chunk_max_length=550, chunk_overlap_length=50, embedding_model="nomic-embed-text"):
@@ -136,18 +149,13 @@ def get_analyze_response(prompt, ytvideo, chunk_max_length=550, chunk_overlap_le
     source_placeholder = st.empty()
     response_content = ""
 
+    # The backend processes the video in a job and answers with its progress stream
+    if response.status_code == 202:
+        return iter_job_progress(response.json()["events_url"])
+
     # Error Handling
     if response.status_code != 200:
-        if response.status_code == 400:
-            response_content = "The input parameters or the configuration could not be validated."     
-        elif response.status_code == 404:
-            response_content = "The requested video URL does not exist."      
-        elif response.status_code == 415:
-            response_content = "The video URL exists, but its type is not supported."  
-        elif response.status_code == 424:
-            response_content = "Either an env variable is not set, the API key does not work or the local models are not available."
-        else:
-            response_content= "Something went wrong, most probably a backend programming error."
+        response_content = get_analyze_error_message(response.status_code)
         source_placeholder.markdown(response_content)  
         st.session_state.messages.append({"role": "assistant", "content": response_content, "sources": []})
         save_chat(st.session_state.username, prompt, response_content)
@@ -155,68 +163,114 @@ def get_analyze_response(prompt, ytvideo, chunk_max_length=550, chunk_overlap_le
     return response.iter_lines()
 
 
+def get_analyze_error_message(status_code):
+    if status_code == 400:
+        return "The input parameters or the configuration could not be validated."     
+    elif status_code == 404:
+        return "The requested video URL does not exist."      
+    elif status_code == 415:
+        return "The video URL exists, but its type is not supported."  
+    elif status_code == 424:
+        return "Either an env variable is not set, the API key does not work or the local models are not available."
+    else:
+        return "Something went wrong, most probably a backend programming error."
+
+
+ANALYZE_STAGES = {
+    "download": "Downloading the video",
+    "metadata": "Extracting the meta data",
+    "visual": "Describing the frames",
+    "audio": "Processing the transcript",
+    "topic": "Creating the topic",
+    "chunking": "Chunking the transcript",
+    "embedding": "Embedding the chunks",
+    "vector_db": "Loading into the vector database",
+    "graph_db": "Loading into the graph database"
+}
+
+
+def format_job_event(event):
+    if event["type"] == "stage" and event["state"] == "running":
+        return f"Video {event['index']}/{event['total']}: {ANALYZE_STAGES.get(event['stage'], event['stage'])}"
+    if event["type"] == "video" and event["state"] == "skipped":
+        return f"Video {event['index']}/{event['total']} was already processed."
+    if event["type"] == "state" and event["state"] == "succeeded":
+        return event["message"]
+    if event["type"] == "state" and event["state"] == "failed":
+        return f"{get_analyze_error_message(event['status_code'])} {event['message']}"
+    if event["type"] == "state" and event["state"] == "cancelled":
+        return "The analysis was cancelled."
+    return None
+
+
+def iter_job_progress(events_url):
+    """Follow the server-sent events of an analyze job, one JSON line with a message per progress update"""
+    response = get_http_session().get(f"{BASE_URL}{events_url}", stream=True, timeout=CHAT_TIMEOUT)
+    for line in response.iter_lines(decode_unicode=True):
+        if not line or not line.startswith("data: "):
+            continue
+        message = format_job_event(json.loads(line[len("data: "):]))
+        if message:
+            yield json.dumps({"message": message + "\n\n"}).encode("utf-8")
+
+
 def save_chat(username, message, response, db_path=DB_PATH):
     import datetime
     message_timestamp = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
     response_timestamp = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
 
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    cursor.execute("INSERT INTO chat_history (username, message, response, message_timestamp, response_timestamp) VALUES (?, ?, ?, ?, ?)", (username, message, response, message_timestamp, response_timestamp))
-    conn.commit()
-    conn.close()
+    with transaction(db_path) as cursor:
+        cursor.execute("INSERT INTO chat_history (username, message, response, message_timestamp, response_timestamp) VALUES (?, ?, ?, ?, ?)", (username, message, response, message_timestamp, response_timestamp))
 
 
 def get_chat_history(username, forChatParameter: Optional[bool] = False, db_path=DB_PATH):
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    cursor.execute("""
-    SELECT message, response, message_timestamp, response_timestamp
-    FROM chat_history
-    WHERE username = ?
-    ORDER BY message_timestamp ASC
-    """, (username,))
-    history = cursor.fetchall()
-    conn.close()
+    with transaction(db_path) as cursor:
+        cursor.execute("""
+        SELECT message, response, message_timestamp, response_timestamp
+        FROM chat_history
+        WHERE username = ?
+        ORDER BY message_timestamp ASC, id ASC
+        """, (username,))
+        history = cursor.fetchall()
     if forChatParameter:
         history = [{"message": request[0], "response": request[1]} for request in history]
     return history
 
 def send_support_request(username, message, db_path=DB_PATH):
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    cursor.execute("INSERT INTO support_requests (username, message) VALUES (?, ?)", (username, message))
-    conn.commit()
-    conn.close()
+    with transaction(db_path) as cursor:
+        cursor.execute("INSERT INTO support_requests (username, message) VALUES (?, ?)", (username, message))
     return "Support request submitted successfully!"
 
 
 def get_all_support_requests(db_path=DB_PATH):
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    cursor.execute("SELECT username, message FROM support_requests")
-    requests = cursor.fetchall()
-    conn.close()
+    with transaction(db_path) as cursor:
+        cursor.execute("SELECT username, message FROM support_requests")
+        requests = cursor.fetchall()
     return requests
 
 
-def get_available_models():
+def fetch_available_models():
     excluded_model_name = "nomic-embed-text"
+    response = get_http_session().get(f"{BASE_URL}/model", timeout=METADATA_TIMEOUT)
+    if response.status_code != 200:
+        raise ValueError(f"Error fetching models: {response.status_code}")
+    models = response.json()
+    if not isinstance(models, list) or not all(isinstance(model, str) for model in models):
+        raise ValueError("Unexpected response format.")
+    if excluded_model_name:
+        models = [model for model in models if model != excluded_model_name]
+    return models
+
+
+def get_available_models():
+    # The backend queries every model provider for /model, so the list is shared by all sessions
     try:
-        response = requests.get(f"{BASE_URL}/model")
-        if response.status_code == 200:
-            models = response.json()
-            if isinstance(models, list) and all(isinstance(model, str) for model in models):
-                if excluded_model_name:
-                    models = [model for model in models if model != excluded_model_name]
-                return models
-            else:
-                st.error("Unexpected response format.")
-                return []
-        else:
-            st.error(f"Error fetching models: {response.status_code}")
-            return []
-    except requests.ConnectionError:
+        return metadata_cache.get("models", fetch_available_models)
+    except ValueError as e:
+        st.error(str(e))
+        return []
+    except requests.RequestException:
+        # Connection errors and timeouts of a slow backend
         st.error("Unable to connect to the backend.")
         return []
 
@@ -293,6 +347,9 @@ if "username" not in st.session_state:
 if "page" not in st.session_state:
     st.session_state.page = "Login"
 
+if "conversation_id" not in st.session_state:
+    st.session_state.conversation_id = str(uuid.uuid4())
+
 # Dark Mode
 if "dark_mode" not in st.session_state:
     st.session_state.dark_mode = False
@@ -396,6 +453,8 @@ if st.sidebar.button("Logout", key="logout"):
     st.session_state.page = "Login"
     st.session_state.username = None
     st.session_state.messages = []
+    st.session_state.conversation_id = str(uuid.uuid4())
+    st.session_state.history_cursors = [None]
     st.rerun()
 
 if  st.session_state.page == "Settings":
@@ -529,11 +588,13 @@ elif  st.session_state.page == "Chat":
                             combined_content = ""
                             all_sources = set()
                             buffer = ""
+                            content_placeholder = st.empty()
 
                             for line in lines:
                                 if line:
                                     try:
-                                        buffer += line.decode("utf-8")
+                                        # Chat deltas are text, the response of /analyze consists of lines in bytes
+                                        buffer += line.decode("utf-8") if isinstance(line, bytes) else line
 
                                         while buffer:
                                             try:
@@ -547,10 +608,11 @@ elif  st.session_state.page == "Chat":
                                                 buffer = buffer[index:].lstrip()
                                             except json.JSONDecodeError:
                                                 break
+                                        content_placeholder.write(combined_content)
                                     except Exception as e:
                                         print(f"Fehler beim Verarbeiten der Zeile: {e}")
 
-                            st.write(combined_content)
+                            content_placeholder.write(combined_content)
                             if int(len(all_sources)) != 0:
                                 st.write("Sources: " + ", ".join(all_sources))
                                 content = combined_content + "Sources: " + ", ".join(all_sources)
@@ -564,12 +626,11 @@ elif  st.session_state.page == "Chat":
 
                     else:
                         if lines:
+                            content_placeholder = st.empty()
                             for line in lines:
                                 if line:
-                                    word = line.decode("utf-8")
-                                    response_content += word + " "
-                                    st.markdown(response_content)
-                                    time.sleep(0.05)
+                                    response_content += line.decode("utf-8") + " " if isinstance(line, bytes) else line
+                                    content_placeholder.markdown(response_content)
 
                             st.session_state.messages.append(
                                 {"role": "assistant", "content": response_content, "sources": []}
@@ -585,11 +646,21 @@ elif  st.session_state.page == "Support":
 
 elif  st.session_state.page == "Chat History":
     st.title(f"Chat History - {st.session_state.username}")
-    history = get_chat_history(st.session_state.username)
+    # Cursors of the pages shown so far, only one page is loaded per render
+    if "history_cursors" not in st.session_state:
+        st.session_state.history_cursors = [None]
+    history, older_cursor = get_chat_history_page(st.session_state.username, st.session_state.history_cursors[-1], HISTORY_PAGE_SIZE, db_path=DB_PATH)
     if history:
-        for message, response, msg_time, resp_time in history:
+        for message, response, msg_time, resp_time in reversed(history):
             st.write(f"**You ({msg_time}):** {message}")
             st.write(f"**Bot ({resp_time}):** {response}")
+        newer_column, older_column = st.columns(2)
+        if len(st.session_state.history_cursors) > 1 and newer_column.button("Newer chats"):
+            st.session_state.history_cursors.pop()
+            st.rerun()
+        if older_cursor is not None and older_column.button("Older chats"):
+            st.session_state.history_cursors.append(older_cursor)
+            st.rerun()
     else:
         st.info("No chat history found.")
 
@@ -0,0 +1,182 @@
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import List, Optional, Tuple
+
+# One connection per database file and process. Streamlit reruns the script of every session in its own thread,
+# so the connection is shared between threads and every access is serialized with a lock. Because the connection
+# stays open, its cache of prepared statements is reused across page renders.
+connections = {}
+connections_lock = threading.Lock()
+
+SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT UNIQUE,
+        password TEXT
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS chat_history (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT,
+        message TEXT,
+        response TEXT,
+        message_timestamp TEXT,
+        response_timestamp TEXT
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS support_requests (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT,
+        message TEXT
+    )
+    """,
+]
+
+INDEXES = {
+    "chat_history": "CREATE INDEX IF NOT EXISTS chat_history_by_user_time ON chat_history (username, message_timestamp, id)",
+}
+
+
+class CachedConnection:
+    def __init__(self, db_path: str):
+        self.lock = threading.RLock()
+        self.connection = sqlite3.connect(db_path, check_same_thread=False, cached_statements=256)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.identity = file_identity(db_path)
+        self.initialized = False
+        ensure_indexes(self.connection)
+
+
+def file_identity(db_path: str) -> Optional[Tuple[int, int]]:
+    try:
+        stat = os.stat(db_path)
+    except FileNotFoundError:
+        return None
+    return stat.st_dev, stat.st_ino
+
+
+def ensure_indexes(connection: sqlite3.Connection):
+    """Create the indexes of all tables which already exist"""
+    tables = {row[0] for row in connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    for table, statement in INDEXES.items():
+        if table in tables:
+            connection.execute(statement)
+    connection.commit()
+
+
+def get_cached_connection(db_path: str) -> CachedConnection:
+    """
+    Return the connection of the process for the database file, opened on the first call.
+
+    The connection is reopened if the file was replaced or deleted, e.g. by a reset of the database.
+    While the old connection is open its file cannot be freed, so a new file never has the same inode.
+    """
+    key = os.path.abspath(db_path)
+    with connections_lock:
+        cached = connections.get(key)
+        if cached is not None and cached.identity != file_identity(db_path):
+            with cached.lock:
+                cached.connection.close()
+            cached = None
+        if cached is None:
+            cached = CachedConnection(db_path)
+            connections[key] = cached
+        return cached
+
+
+@contextmanager
+def transaction(db_path: str):
+    """
+    Cursor on the shared connection. Commits if the block succeeds, rolls back otherwise.
+
+    Example:
+        with transaction(DB_PATH) as cursor:
+            cursor.execute("INSERT INTO support_requests (username, message) VALUES (?, ?)", ("user", "Help"))
+    """
+    cached = get_cached_connection(db_path)
+    with cached.lock:
+        cursor = cached.connection.cursor()
+        try:
+            yield cursor
+            cached.connection.commit()
+        except BaseException:
+            cached.connection.rollback()
+            raise
+        finally:
+            cursor.close()
+
+
+def initialize_database(db_path: str) -> bool:
+    """
+    Create the tables and indexes, once per process and database file.
+
+    Returns:
+        bool: True if the schema was created by this call
+    """
+    cached = get_cached_connection(db_path)
+    with cached.lock:
+        if cached.initialized:
+            return False
+        with transaction(db_path) as cursor:
+            for statement in SCHEMA:
+                cursor.execute(statement)
+        ensure_indexes(cached.connection)
+        cached.initialized = True
+        return True
+
+
+def close_connections():
+    with connections_lock:
+        for cached in connections.values():
+            with cached.lock:
+                cached.connection.close()
+        connections.clear()
+
+
+def get_chat_history_page(username: str, before: Optional[Tuple[str, int]] = None, page_size: int = 20,
+                          db_path: str = None) -> Tuple[List[tuple], Optional[Tuple[str, int]]]:
+    """
+    Page of the chat history of a user, newest chats first.
+
+    Uses keyset pagination on (message_timestamp, id): every page is a range scan of the
+    chat_history_by_user_time index, so its cost does not grow with the number of older chats.
+
+    Args:
+        username: User whose chats are returned
+        before: Cursor returned with the previous page, None for the newest chats
+        page_size: Number of chats per page
+
+    Returns:
+        Tuple of the chats (message, response, message_timestamp, response_timestamp) and the cursor
+        of the next older page, or None if there are no older chats
+    """
+    with transaction(db_path) as cursor:
+        if before is None:
+            cursor.execute("""
+            SELECT message, response, message_timestamp, response_timestamp, id
+            FROM chat_history
+            WHERE username = ?
+            ORDER BY message_timestamp DESC, id DESC
+            LIMIT ?
+            """, (username, page_size + 1))
+        else:
+            cursor.execute("""
+            SELECT message, response, message_timestamp, response_timestamp, id
+            FROM chat_history
+            WHERE username = ? AND (message_timestamp, id) < (?, ?)
+            ORDER BY message_timestamp DESC, id DESC
+            LIMIT ?
+            """, (username, before[0], before[1], page_size + 1))
+        rows = cursor.fetchall()
+
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_cursor = (rows[-1][2], rows[-1][4])
+    return [row[:4] for row in rows], next_cursor
@@ -0,0 +1,84 @@
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict
+
+
+class StaleWhileRevalidateCache:
+    """
+    Process-wide cache for backend metadata such as the available models.
+
+    A value younger than `ttl` seconds is returned as is. An older value is still returned immediately,
+    while a background thread loads a fresh one, as long as it is younger than `ttl + stale_ttl`.
+    Only a missing or expired value blocks the caller. Failed loads are not cached, a stale value is kept instead.
+
+    Example:
+        cache = StaleWhileRevalidateCache(ttl=300, stale_ttl=3600)
+        models = cache.get("models", fetch_available_models)
+    """
+
+    def __init__(self, ttl: float, stale_ttl: float):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.entries: Dict[str, tuple] = {}
+        self.refreshing = set()
+        self.lock = threading.Lock()
+        self.key_locks: Dict[str, threading.Lock] = {}
+
+    def get(self, key: str, loader: Callable[[], Any]) -> Any:
+        with self.lock:
+            entry = self.entries.get(key)
+            key_lock = self.key_locks.setdefault(key, threading.Lock())
+
+        if entry is not None:
+            value, loaded_at = entry
+            age = time.monotonic() - loaded_at
+            if age < self.ttl:
+                return value
+            if age < self.ttl + self.stale_ttl:
+                self.refresh_in_background(key, loader)
+                return value
+
+        # Only one session loads a missing value, the others wait for it
+        with key_lock:
+            with self.lock:
+                entry = self.entries.get(key)
+            if entry is not None and time.monotonic() - entry[1] < self.ttl:
+                return entry[0]
+            return self.load(key, loader)
+
+    def load(self, key: str, loader: Callable[[], Any]) -> Any:
+        value = loader()
+        with self.lock:
+            self.entries[key] = (value, time.monotonic())
+        return value
+
+    def refresh_in_background(self, key: str, loader: Callable[[], Any]):
+        with self.lock:
+            if key in self.refreshing:
+                return
+            self.refreshing.add(key)
+
+        def run():
+            try:
+                self.load(key, loader)
+                logging.info(f"Refreshed cached {key}")
+            except Exception as e:
+                logging.warning(f"Refreshing cached {key} failed, keeping the stale value: {e}")
+            finally:
+                with self.lock:
+                    self.refreshing.discard(key)
+
+        threading.Thread(target=run, name=f"refresh-{key}", daemon=True).start()
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+metadata_caches: Dict[tuple, StaleWhileRevalidateCache] = {}
+
+
+def get_metadata_cache(ttl: float, stale_ttl: float) -> StaleWhileRevalidateCache:
+    """Cache shared by all sessions. Streamlit reruns app.py for every interaction, this module is only imported once"""
+    return metadata_caches.setdefault((ttl, stale_ttl), StaleWhileRevalidateCache(ttl, stale_ttl))
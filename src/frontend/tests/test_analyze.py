@@ -1,4 +1,5 @@
 import sys
+import json
 import os
 import pytest
 import streamlit as st
@@ -81,5 +82,42 @@ def test_get_analyze_response_error(mock_streamlit, mock_requests_post):
     expected_message = "The requested video URL does not exist."
     assert st.session_state.messages[-1]["content"] == expected_message
 
+def test_get_analyze_response_follows_job_progress(mock_streamlit, mock_requests_post):
+    st.session_state.settings = {
+        "chunk_max_length": 550,
+        "chunk_overlap_length": 50,
+        "max_limit_similarity": 0.8,
+        "embedding_model": "nomic-embed-text",
+        "seconds_between_frames": 1,
+        "local_model": True,
+        "enabled_detailed_chunking": False
+    }
+    st.session_state.username = "testuser"
+    st.session_state.messages = []
+
+    mock_response = MagicMock()
+    mock_response.status_code = 202
+    mock_response.json.return_value = {"job_id": "job1", "events_url": "/jobs/job1/events"}
+    mock_requests_post.return_value = mock_response
+
+    events = [
+        'data: {"id": 1, "type": "state", "state": "running"}',
+        "",
+        'data: {"id": 2, "type": "stage", "video_id": "dQw4w9WgXcQ", "index": 1, "total": 1, "stage": "download", "state": "running"}',
+        ": keep-alive",
+        'data: {"id": 3, "type": "state", "state": "succeeded", "status_code": 201, "message": "YouTube video with title Test successfully processed!"}'
+    ]
+    mock_events = MagicMock()
+    mock_events.iter_lines.return_value = iter(events)
+
+    with patch('app.requests.Session.get', return_value=mock_events) as mock_get:
+        lines = list(get_analyze_response("Analyze this video", "https://www.youtube.com/watch?v=dQw4w9WgXcQ"))
+
+    mock_get.assert_called_once_with(f"{BASE_URL}/jobs/job1/events", stream=True, timeout=(5, 300))
+    assert [json.loads(line)["message"] for line in lines] == [
+        "Video 1/1: Downloading the video\n\n",
+        "YouTube video with title Test successfully processed!\n\n"
+    ]
+
 if __name__ == "__main__":
     pytest.main()
\ No newline at end of file
@@ -16,7 +16,7 @@ def mock_streamlit():
 
 @pytest.fixture
 def mock_requests_post():
-    with patch('app.requests.post') as mock_post:
+    with patch('app.requests.Session.post') as mock_post:
         yield mock_post
 
 def test_get_chat_response(mock_streamlit, mock_requests_post):
@@ -38,13 +38,13 @@ def test_get_chat_response(mock_streamlit, mock_requests_post):
     st.session_state.username = "testuser"
 
     mock_response = MagicMock()
-    mock_response.iter_lines.return_value = iter([b"line1", b"line2"])
+    mock_response.iter_content.return_value = iter([b"line1", b"line2 \xc3", b"\xa4"])
     mock_requests_post.return_value = mock_response
 
     prompt = "What is the capital of France?"
     response = get_chat_response(prompt)
 
-    assert list(response) == [b"line1", b"line2"]
+    assert list(response) == ["line1", "line2 ", "ä"]
 
     expected_payload = {
         "prompt": prompt,
@@ -63,12 +63,13 @@ def test_get_chat_response(mock_streamlit, mock_requests_post):
         "plaintext": False,
         "mode": "fast",
         "use_logical_routing": False,
-        "use_semantic_routing": False
+        "use_semantic_routing": False,
+        "conversation_id": None
     }
 
     print(mock_requests_post.call_args)
     print(st.session_state.settings)
-    mock_requests_post.assert_called_once_with(f"{BASE_URL}/chat", json=expected_payload)
+    mock_requests_post.assert_called_once_with(f"{BASE_URL}/chat", json=expected_payload, stream=True, timeout=(5, 300))
 
 if __name__ == "__main__":
     pytest.main()
\ No newline at end of file
@@ -7,6 +7,7 @@ import pytest
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from ..app import register_user, authenticate_user, save_chat, get_chat_history, hash_password, send_support_request, get_all_support_requests, get_available_models
+from ..data_access import close_connections, get_chat_history_page
 
 DB_PATH = "test_chatbot.db"
 
@@ -41,6 +42,7 @@ def setup_database():
     conn.commit()
     yield
     conn.close()
+    close_connections()
     os.remove(DB_PATH)
 
 def test_register_user(setup_database):
@@ -62,6 +64,23 @@ def test_save_chat_and_get_history(setup_database):
     assert history[0][0] == "Hello!"
     assert history[0][1] == "Hi there!"
 
+def test_get_chat_history_page(setup_database):
+    for i in range(5):
+        save_chat("testuser", f"Question {i}", f"Answer {i}", db_path=DB_PATH)
+    save_chat("otheruser", "Other question", "Other answer", db_path=DB_PATH)
+
+    first_page, cursor = get_chat_history_page("testuser", page_size=2, db_path=DB_PATH)
+    second_page, cursor = get_chat_history_page("testuser", cursor, page_size=2, db_path=DB_PATH)
+    last_page, cursor = get_chat_history_page("testuser", cursor, page_size=2, db_path=DB_PATH)
+
+    assert [chat[0] for chat in first_page + second_page + last_page] == [f"Question {i}" for i in range(4, -1, -1)]
+    assert cursor is None
+
+    conn = sqlite3.connect(DB_PATH)
+    plan = conn.execute("EXPLAIN QUERY PLAN SELECT id FROM chat_history WHERE username = ? ORDER BY message_timestamp DESC, id DESC", ("testuser",)).fetchall()
+    conn.close()
+    assert "chat_history_by_user_time" in str(plan)
+
 def test_hash_password(setup_database):
     hashed = hash_password("testpass")
     assert hashed == hash_password("testpass")
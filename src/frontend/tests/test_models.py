@@ -1,17 +1,22 @@
 import sys
 import os
+import threading
+import time
 import requests
 import pytest
 from unittest.mock import patch
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from ..app import get_available_models
+from ..app import get_available_models, metadata_cache
+from ..metadata_cache import StaleWhileRevalidateCache
 
 @pytest.fixture
 def mock_requests_get():
-    with patch('app.requests.get') as mock_get:
+    metadata_cache.clear()
+    with patch('app.requests.Session.get') as mock_get:
         yield mock_get
+    metadata_cache.clear()
 
 def test_get_available_models_success(mock_requests_get):
     mock_requests_get.return_value.status_code = 200
@@ -40,5 +45,37 @@ def test_get_available_models_connection_error(mock_requests_get):
     models = get_available_models()
     assert models == []
 
+def test_get_available_models_timeout(mock_requests_get):
+    mock_requests_get.side_effect = requests.Timeout
+
+    models = get_available_models()
+    assert models == []
+
+def test_get_available_models_is_cached(mock_requests_get):
+    mock_requests_get.return_value.status_code = 200
+    mock_requests_get.return_value.json.return_value = ["model1"]
+
+    assert get_available_models() == ["model1"]
+    assert get_available_models() == ["model1"]
+    assert mock_requests_get.call_count == 1
+
+def test_stale_value_is_served_while_revalidating():
+    cache = StaleWhileRevalidateCache(ttl=0, stale_ttl=60)
+    loaded = threading.Event()
+    assert cache.get("models", lambda: ["old"]) == ["old"]
+
+    def load_new():
+        loaded.set()
+        return ["new"]
+
+    assert cache.get("models", load_new) == ["old"]
+    assert loaded.wait(timeout=5)
+    cache.ttl = 60
+    for _ in range(50):
+        if cache.get("models", lambda: ["unused"]) == ["new"]:
+            break
+        time.sleep(0.01)
+    assert cache.get("models", lambda: ["unused"]) == ["new"]
+
 if __name__ == "__main__":
     pytest.main()
\ No newline at end of file
@@ -0,0 +1,254 @@
+"""
+Dependency health and warmup state of a worker
+
+/ready reports the cached result of every probe together with its latency and is only 200 when the warmup
+finished and all READY_REQUIRED_DEPENDENCIES are healthy, so a load balancer keeps cold or broken workers out of
+rotation. /warmup preloads the models and opens the database connections before the first request.
+The probes run in the background every HEALTH_PROBE_INTERVAL seconds, request validation such as /analyze reads
+the cached results instead of calling the dependencies itself.
+"""
+
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, asdict
+from typing import Callable
+
+import requests
+from dotenv import load_dotenv
+
+from src.providers.providers import get_ollama_host, get_gemini_base_url
+
+load_dotenv()
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+CHROMA_DB_DIR = os.path.join(ROOT_DIR, "db", "chromadb")
+
+HEALTH_CACHE_TTL = float(os.getenv("HEALTH_CACHE_TTL", "60"))
+HEALTH_PROBE_INTERVAL = float(os.getenv("HEALTH_PROBE_INTERVAL", "15"))
+HEALTH_PROBE_TIMEOUT = float(os.getenv("HEALTH_PROBE_TIMEOUT", "2"))
+READY_REQUIRED_DEPENDENCIES = [name.strip() for name in os.getenv("READY_REQUIRED_DEPENDENCIES", "chroma,neo4j").split(",")
+                               if name.strip()]
+WARMUP_ON_STARTUP = os.getenv("WARMUP_ON_STARTUP", "true").lower() == "true"
+
+health_checker = None
+health_checker_lock = threading.Lock()
+warmup = None
+warmup_lock = threading.Lock()
+
+
+@dataclass
+class DependencyHealth:
+    name: str
+    healthy: bool
+    latency_ms: float
+    checked_at: float
+    error: str | None = None
+    details: dict | None = None
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+def check_ollama(timeout: float = HEALTH_PROBE_TIMEOUT) -> dict:
+    """The Ollama server is running, the details list its models"""
+    response = requests.get(f"{get_ollama_host()}/api/tags", timeout=timeout)
+    response.raise_for_status()
+    return {"models": [model["name"] for model in response.json()["models"]]}
+
+
+def check_gemini(timeout: float = HEALTH_PROBE_TIMEOUT) -> dict:
+    """The Gemini API accepts the API key of the ingestion pipeline"""
+    api_key = os.getenv("API_KEY_GOOGLE_GEMINI")
+    if not api_key:
+        raise ValueError("API_KEY_GOOGLE_GEMINI is not set")
+    response = requests.get(f"{get_gemini_base_url()}/v1beta/models", params={"key": api_key}, timeout=timeout)
+    response.raise_for_status()
+    return {"models": [model["name"].replace("models/", "") for model in response.json().get("models", [])]}
+
+
+def check_youtube(timeout: float = HEALTH_PROBE_TIMEOUT):
+    requests.head("https://www.youtube.com", allow_redirects=True, timeout=timeout).raise_for_status()
+
+
+def check_neo4j():
+    """Open the shared connection pool and verify it, the embedded backend is loaded instead"""
+    from src.db.graph_db.graph_store import GRAPH_BACKEND, get_graph_store
+    if GRAPH_BACKEND == "neo4j":
+        from src.db.graph_db.connection import get_graph_connection
+        get_graph_connection().verify_connectivity()
+    else:
+        get_graph_store()
+
+
+def check_chroma():
+    import chromadb
+    chromadb.PersistentClient(path=CHROMA_DB_DIR).heartbeat()
+
+
+DEFAULT_CHECKS = {
+    "ollama": check_ollama,
+    "neo4j": check_neo4j,
+    "chroma": check_chroma,
+    "gemini": check_gemini,
+    "youtube": check_youtube
+}
+
+
+def probe(name: str, check: Callable[[], dict | None]) -> DependencyHealth:
+    """Run one check, a raised exception marks the dependency as unhealthy, a returned dict becomes the details"""
+    start = time.perf_counter()
+    details = None
+    try:
+        details = check()
+        error = None
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    latency_ms = round((time.perf_counter() - start) * 1000, 2)
+    return DependencyHealth(name=name, healthy=error is None, latency_ms=latency_ms, checked_at=time.time(), error=error,
+                            details=details)
+
+
+class HealthChecker:
+    """
+    Probes dependencies and caches the results for `ttl` seconds
+
+    Concurrent callers share one probe per dependency instead of probing it at the same time. After start(), a
+    background thread refreshes every dependency each `interval` seconds, so check() is answered from the cache.
+
+    Example:
+        checker = HealthChecker({"ollama": check_ollama}, ttl=60)
+        checker.start(interval=15)
+        checker.check("ollama").healthy
+    """
+
+    def __init__(self, checks: dict[str, Callable[[], dict | None]], ttl: float = HEALTH_CACHE_TTL):
+        self.checks = checks
+        self.ttl = ttl
+        self.results: dict[str, DependencyHealth] = {}
+        self.locks = {name: threading.Lock() for name in checks}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def check(self, name: str) -> DependencyHealth:
+        with self.locks[name]:
+            cached = self.results.get(name)
+            if cached is not None and time.time() - cached.checked_at < self.ttl:
+                return cached
+            return self._probe(name)
+
+    def refresh(self, name: str) -> DependencyHealth:
+        with self.locks[name]:
+            return self._probe(name)
+
+    def _probe(self, name: str) -> DependencyHealth:
+        result = probe(name, self.checks[name])
+        previous = self.results.get(name)
+        if not result.healthy and (previous is None or previous.healthy):
+            logging.warning(f"Dependency {name} is unhealthy: {result.error}")
+        elif result.healthy and previous is not None and not previous.healthy:
+            logging.info(f"Dependency {name} is healthy again")
+        self.results[name] = result
+        return result
+
+    def start(self, interval: float = HEALTH_PROBE_INTERVAL):
+        """Probe all dependencies now and then every `interval` seconds in a background thread"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+
+        def run():
+            while not self._stop.is_set():
+                for name in self.checks:
+                    if self._stop.is_set():
+                        break
+                    self.refresh(name)
+                self._stop.wait(interval)
+
+        self._thread = threading.Thread(target=run, name="health-checks", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def report(self, names: list[str] | None = None) -> dict[str, dict]:
+        return {name: self.check(name).to_dict() for name in (names or self.checks)}
+
+
+class Warmup:
+    """
+    Runs the warmup steps of the worker once and records how long every step took
+
+    The state is "cold" before the first run, then "running", "done" or "failed" if a step raised.
+    """
+
+    def __init__(self):
+        self.state = "cold"
+        self.steps: dict[str, dict] = {}
+        self.lock = threading.Lock()
+
+    def run(self, steps: dict[str, Callable[[], None]]) -> dict:
+        with self.lock:
+            self.state = "running"
+            self.steps = {}
+            failed = False
+            for name, step in steps.items():
+                start = time.perf_counter()
+                try:
+                    step()
+                    error = None
+                except Exception as e:
+                    error = f"{type(e).__name__}: {e}"
+                    failed = True
+                    logging.warning(f"Warmup step {name} failed: {error}")
+                self.steps[name] = {"seconds": round(time.perf_counter() - start, 3), "error": error}
+            self.state = "failed" if failed else "done"
+            logging.info(f"Warmup {self.state}: {self.steps}")
+            return self.status()
+
+    def run_in_background(self, steps: dict[str, Callable[[], None]]):
+        threading.Thread(target=self.run, args=(steps,), name="warmup", daemon=True).start()
+
+    def status(self) -> dict:
+        return {"state": self.state, "steps": dict(self.steps)}
+
+
+def get_health_checker() -> HealthChecker:
+    global health_checker
+
+    with health_checker_lock:
+        if health_checker is None:
+            health_checker = HealthChecker(DEFAULT_CHECKS)
+        return health_checker
+
+
+def get_warmup() -> Warmup:
+    global warmup
+
+    with warmup_lock:
+        if warmup is None:
+            warmup = Warmup()
+        return warmup
+
+
+def readiness(checker: HealthChecker | None = None, warmup_state: Warmup | None = None,
+              required: list[str] | None = None) -> dict:
+    """
+    Readiness of the worker
+
+    Returns:
+        dict with "ready", the warmup status and the health of every dependency
+    """
+    checker = checker or get_health_checker()
+    warmup_state = warmup_state or get_warmup()
+    required = READY_REQUIRED_DEPENDENCIES if required is None else required
+
+    dependencies = checker.report()
+    ready = warmup_state.state == "done" and all(dependencies[name]["healthy"] for name in required if name in dependencies)
+    return {
+        "ready": ready,
+        "warmup": warmup_state.status(),
+        "required": required,
+        "dependencies": dependencies
+    }
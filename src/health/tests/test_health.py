@@ -0,0 +1,75 @@
+import time
+
+from src.health.health import HealthChecker, Warmup, readiness
+
+
+def failing_check():
+    raise ConnectionError("connection refused")
+
+
+def test_health_checker_caches_results_for_ttl():
+    calls = []
+    checker = HealthChecker({"ollama": lambda: calls.append(1)}, ttl=60)
+
+    first = checker.check("ollama")
+    second = checker.check("ollama")
+
+    assert first.healthy and first.error is None
+    assert second is first
+    assert len(calls) == 1
+
+    checker.ttl = 0
+    checker.check("ollama")
+    assert len(calls) == 2
+
+
+def test_failing_probe_is_reported_with_error():
+    checker = HealthChecker({"neo4j": failing_check}, ttl=60)
+
+    report = checker.report()
+
+    assert report["neo4j"]["healthy"] is False
+    assert report["neo4j"]["error"] == "ConnectionError: connection refused"
+    assert report["neo4j"]["latency_ms"] >= 0
+
+
+def test_warmup_records_steps_and_failures():
+    warmup = Warmup()
+    assert warmup.status() == {"state": "cold", "steps": {}}
+
+    status = warmup.run({"embedding_model": lambda: None, "reranker": failing_check})
+
+    assert status["state"] == "failed"
+    assert status["steps"]["embedding_model"]["error"] is None
+    assert status["steps"]["reranker"]["error"] == "ConnectionError: connection refused"
+
+    assert warmup.run({"embedding_model": lambda: None})["state"] == "done"
+
+
+def test_ready_only_after_warmup_and_with_healthy_required_dependencies():
+    checker = HealthChecker({"chroma": lambda: None, "ollama": failing_check}, ttl=60)
+    warmup = Warmup()
+
+    assert readiness(checker, warmup, required=["chroma"])["ready"] is False
+
+    warmup.run({})
+    report = readiness(checker, warmup, required=["chroma"])
+    assert report["ready"] is True
+    assert report["dependencies"]["ollama"]["healthy"] is False
+
+    assert readiness(checker, warmup, required=["chroma", "ollama"])["ready"] is False
+
+
+def test_background_probes_refresh_the_cache():
+    calls = []
+    checker = HealthChecker({"ollama": lambda: calls.append(1) or {"models": ["llama3.2:latest"]}}, ttl=60)
+
+    checker.start(interval=0.01)
+    deadline = time.time() + 2
+    while len(calls) < 3 and time.time() < deadline:
+        time.sleep(0.01)
+    checker.stop()
+
+    assert len(calls) >= 3
+    result = checker.check("ollama")
+    assert result.details == {"models": ["llama3.2:latest"]}
@@ -0,0 +1,75 @@
+import os
+from functools import lru_cache
+from dotenv import load_dotenv
+
+load_dotenv()
+
+DEFAULT_OLLAMA_HOST = "http://localhost:11434"
+DEFAULT_GEMINI_API_ENDPOINT = "https://generativelanguage.googleapis.com"
+
+
+def with_scheme(address: str) -> str:
+    return address if address.startswith(("http://", "https://")) else f"http://{address}"
+
+
+def get_ollama_host() -> str:
+    """
+    Base URL of the Ollama server, OLLAMA_HOST or the local default.
+    The ollama client library reads the same variable, so every Ollama call goes to the same server.
+    """
+    return with_scheme(os.getenv("OLLAMA_HOST") or DEFAULT_OLLAMA_HOST).rstrip("/")
+
+
+def get_gemini_api_endpoint() -> str | None:
+    """GEMINI_API_ENDPOINT, e.g. http://localhost:11500 for the stand-in server, None for the Google API"""
+    endpoint = os.getenv("GEMINI_API_ENDPOINT")
+    return with_scheme(endpoint).rstrip("/") if endpoint else None
+
+
+def get_gemini_base_url() -> str:
+    return get_gemini_api_endpoint() or DEFAULT_GEMINI_API_ENDPOINT
+
+
+def configure_gemini(api_key: str | None):
+    """
+    Configure google.generativeai with the API key and, if GEMINI_API_ENDPOINT is set, the endpoint.
+    A custom endpoint is called over REST, the gRPC transport cannot reach plain HTTP servers.
+
+    Example:
+        configure_gemini(os.getenv("API_KEY_GOOGLE_GEMINI"))
+        model = genai.GenerativeModel("gemini-1.5-flash")
+    """
+    import google.generativeai as genai
+
+    endpoint = get_gemini_api_endpoint()
+    if endpoint is None:
+        genai.configure(api_key=api_key)
+    else:
+        genai.configure(api_key=api_key, transport="rest", client_options={"api_endpoint": endpoint})
+
+
+@lru_cache(maxsize=None)
+def get_gemini_client(api_key: str | None):
+    """
+    Gemini client for one API key, with the endpoint of configure_gemini.
+    genai.configure sets one key for the whole process, callers using different keys at the same time need their own client.
+
+    Example:
+        request = glm.GenerateContentRequest(model="models/gemini-1.5-flash", contents=[glm.Content(role="user", parts=[glm.Part(text=prompt)])])
+        get_gemini_client(os.getenv("API_KEY_GOOGLE_GEMINI_GRAPHDB")).generate_content(request)
+    """
+    from google.ai import generativelanguage as glm
+    from google.api_core.client_options import ClientOptions
+
+    endpoint = get_gemini_api_endpoint()
+    if endpoint is None:
+        return glm.GenerativeServiceClient(client_options=ClientOptions(api_key=api_key))
+    return glm.GenerativeServiceClient(client_options=ClientOptions(api_key=api_key, api_endpoint=endpoint), transport="rest")
+
+
+def get_gemini_chat_options() -> dict:
+    """Keyword arguments for ChatGoogleGenerativeAI which point it to GEMINI_API_ENDPOINT, if set"""
+    endpoint = get_gemini_api_endpoint()
+    if endpoint is None:
+        return {}
+    return {"transport": "rest", "client_options": {"api_endpoint": endpoint}}
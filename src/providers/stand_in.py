@@ -0,0 +1,320 @@
+"""
+Stand-in server for the parts of the Ollama and Gemini REST APIs the project uses
+
+Ollama: GET /, GET /api/tags, POST /api/chat, /api/generate, /api/embed, /api/embeddings
+Gemini: GET /{version}/models, POST /{version}/models/{model}:generateContent, :streamGenerateContent,
+        :embedContent, :batchEmbedContents
+
+Answers are deterministic per prompt, embeddings are hashed bags of words, so similar texts get similar vectors.
+Latency, streaming cadence and 429 responses are configurable, see StandInConfig.
+
+Usage:
+    python -m src.providers.stand_in --port 11500
+    OLLAMA_HOST=http://localhost:11500 GEMINI_API_ENDPOINT=http://localhost:11500 uvicorn main:app
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from functools import lru_cache
+
+import numpy as np
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+
+VOCABULARY = (
+    "the model learns patterns from data and uses them to make predictions about new inputs while the video "
+    "explains how training works why more data helps and where the limits of the approach are in practice"
+).split()
+
+
+@dataclass
+class StandInConfig:
+    latency_ms: float = 50  # before every non-streamed response and embedding
+    ttft_ms: float = 300  # before the first token of a generated answer
+    tokens_per_second: float = 50
+    max_tokens: int = 200
+    embedding_dimensions: int = 768
+    gemini_requests_per_minute: int = 0  # 429 beyond this many Gemini requests in 60 seconds, 0 for no limit
+    rate_limit_probability: float = 0.0  # probability of a 429 for any model request
+    seed: int = 0
+    ollama_models: list[str] = field(default_factory=lambda: ["llama3.2:latest", "llama3.2-vision:latest", "nomic-embed-text:latest"])
+    gemini_models: list[str] = field(default_factory=lambda: ["gemini-1.5-flash", "gemini-1.5-pro", "text-embedding-004"])
+    responses_path: str | None = None  # JSON list of {"match": "...", "response": "..."} for scripted answers
+
+    @classmethod
+    def from_env(cls) -> "StandInConfig":
+        config = cls()
+        for name, value in vars(config).items():
+            env_value = os.getenv(f"STAND_IN_{name.upper()}")
+            if env_value is None:
+                continue
+            if isinstance(value, list):
+                setattr(config, name, [item.strip() for item in env_value.split(",") if item.strip()])
+            elif isinstance(value, bool) or value is None:
+                setattr(config, name, env_value)
+            else:
+                setattr(config, name, type(value)(env_value))
+        return config
+
+
+@lru_cache(maxsize=100_000)
+def token_vector(token: str, dimensions: int) -> np.ndarray:
+    seed = int.from_bytes(hashlib.sha256(token.encode("utf-8")).digest()[:8], "little")
+    return np.random.default_rng(seed).standard_normal(dimensions).astype(np.float32)
+
+
+def embed(text: str, dimensions: int) -> list[float]:
+    tokens = [token for token in "".join(c.lower() if c.isalnum() else " " for c in text).split() if token]
+    vector = np.zeros(dimensions, dtype=np.float32)
+    for token in tokens:
+        vector += token_vector(token, dimensions)
+    norm = np.linalg.norm(vector)
+    return (vector / norm if norm > 0 else vector).tolist()
+
+
+class StandIn:
+    def __init__(self, config: StandInConfig):
+        self.config = config
+        self.random = random.Random(config.seed)
+        self.lock = threading.Lock()
+        self.gemini_requests = deque()
+        self.scripted_responses = []
+        if config.responses_path:
+            with open(config.responses_path, "r", encoding="utf-8") as file:
+                self.scripted_responses = json.load(file)
+
+    def answer_tokens(self, prompt: str) -> list[str]:
+        for scripted in self.scripted_responses:
+            if scripted["match"] in prompt:
+                words = scripted["response"].split(" ")
+                return [word if index == 0 else " " + word for index, word in enumerate(words)]
+        generator = random.Random(hashlib.sha256(f"{self.config.seed}:{prompt}".encode("utf-8")).digest())
+        length = generator.randint(max(1, self.config.max_tokens // 2), self.config.max_tokens)
+        return [generator.choice(VOCABULARY) if index == 0 else " " + generator.choice(VOCABULARY) for index in range(length)]
+
+    def is_rate_limited(self, api: str) -> bool:
+        with self.lock:
+            if self.config.rate_limit_probability > 0 and self.random.random() < self.config.rate_limit_probability:
+                return True
+            if api == "gemini" and self.config.gemini_requests_per_minute > 0:
+                now = time.monotonic()
+                while self.gemini_requests and now - self.gemini_requests[0] >= 60:
+                    self.gemini_requests.popleft()
+                if len(self.gemini_requests) >= self.config.gemini_requests_per_minute:
+                    return True
+                self.gemini_requests.append(now)
+            return False
+
+    async def stream_tokens(self, tokens: list[str]):
+        """Yield the tokens on a fixed schedule after the time to first token"""
+        start = time.perf_counter() + self.config.ttft_ms / 1000
+        for index, token in enumerate(tokens):
+            delay = start + index / self.config.tokens_per_second - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            yield token
+
+    async def generation_delay(self, tokens: list[str]):
+        await asyncio.sleep(self.config.ttft_ms / 1000 + len(tokens) / self.config.tokens_per_second)
+
+
+def now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def ollama_prompt(body: dict) -> str:
+    if "messages" in body:
+        return "\n".join(str(message.get("content", "")) for message in body["messages"])
+    return str(body.get("prompt", ""))
+
+
+def gemini_prompt(body: dict) -> str:
+    texts = []
+    for content in body.get("contents", []):
+        for part in content.get("parts", []):
+            if "text" in part:
+                texts.append(part["text"])
+    return "\n".join(texts)
+
+
+def gemini_response(model: str, text: str, prompt: str, finished: bool = True) -> dict:
+    response = {
+        "candidates": [{
+            "content": {"parts": [{"text": text}], "role": "model"},
+            "index": 0,
+            "safetyRatings": []
+        }],
+        "modelVersion": model
+    }
+    if finished:
+        response["candidates"][0]["finishReason"] = "STOP"
+        response["usageMetadata"] = {
+            "promptTokenCount": len(prompt.split()),
+            "candidatesTokenCount": len(text.split()),
+            "totalTokenCount": len(prompt.split()) + len(text.split())
+        }
+    return response
+
+
+def rate_limit_response(api: str) -> JSONResponse:
+    if api == "gemini":
+        content = {"error": {"code": 429, "message": "Resource has been exhausted (e.g. check quota).", "status": "RESOURCE_EXHAUSTED"}}
+    else:
+        content = {"error": "too many requests"}
+    return JSONResponse(content=content, status_code=429, headers={"Retry-After": "1"})
+
+
+def create_app(config: StandInConfig | None = None) -> FastAPI:
+    stand_in = StandIn(config or StandInConfig.from_env())
+    config = stand_in.config
+    app = FastAPI(title="Ollama and Gemini stand-in")
+    app.state.stand_in = stand_in
+
+    # Ollama
+
+    @app.get("/")
+    async def ollama_root():
+        return PlainTextResponse("Ollama is running")
+
+    @app.get("/api/tags")
+    async def ollama_tags():
+        return {"models": [
+            {
+                "name": name,
+                "model": name,
+                "modified_at": now_iso(),
+                "size": 0,
+                "digest": hashlib.sha256(name.encode("utf-8")).hexdigest(),
+                "details": {"format": "gguf", "family": name.split(":")[0]}
+            } for name in config.ollama_models
+        ]}
+
+    @app.post("/api/chat")
+    @app.post("/api/generate")
+    async def ollama_generate(request: Request):
+        body = await request.json()
+        if stand_in.is_rate_limited("ollama"):
+            return rate_limit_response("ollama")
+        is_chat = request.url.path == "/api/chat"
+        model = body.get("model", "")
+        tokens = stand_in.answer_tokens(ollama_prompt(body))
+
+        def message(text: str, done: bool) -> dict:
+            result = {"model": model, "created_at": now_iso(), "done": done}
+            if is_chat:
+                result["message"] = {"role": "assistant", "content": text}
+            else:
+                result["response"] = text
+            if done:
+                result.update({"done_reason": "stop", "eval_count": len(tokens), "prompt_eval_count": 0})
+            return result
+
+        if body.get("stream", True) is False:
+            await stand_in.generation_delay(tokens)
+            return message("".join(tokens), True)
+
+        async def stream():
+            async for token in stand_in.stream_tokens(tokens):
+                yield json.dumps(message(token, False)) + "\n"
+            yield json.dumps(message("", True)) + "\n"
+
+        return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+    @app.post("/api/embed")
+    async def ollama_embed(request: Request):
+        body = await request.json()
+        if stand_in.is_rate_limited("ollama"):
+            return rate_limit_response("ollama")
+        inputs = body.get("input", [])
+        inputs = [inputs] if isinstance(inputs, str) else inputs
+        await asyncio.sleep(config.latency_ms / 1000)
+        return {"model": body.get("model", ""), "embeddings": [embed(text, config.embedding_dimensions) for text in inputs]}
+
+    @app.post("/api/embeddings")
+    async def ollama_embeddings(request: Request):
+        body = await request.json()
+        if stand_in.is_rate_limited("ollama"):
+            return rate_limit_response("ollama")
+        await asyncio.sleep(config.latency_ms / 1000)
+        return {"embedding": embed(str(body.get("prompt", "")), config.embedding_dimensions)}
+
+    # Gemini
+
+    @app.get("/{version}/models")
+    async def gemini_models(version: str):
+        return {"models": [
+            {
+                "name": f"models/{name}",
+                "displayName": name,
+                "supportedGenerationMethods": ["embedContent"] if "embedding" in name else ["generateContent", "countTokens"]
+            } for name in config.gemini_models
+        ]}
+
+    @app.post("/{version}/models/{model_action}")
+    async def gemini_model_action(version: str, model_action: str, request: Request):
+        model, _, action = model_action.partition(":")
+        body = await request.json()
+        if stand_in.is_rate_limited("gemini"):
+            return rate_limit_response("gemini")
+
+        if action == "embedContent":
+            await asyncio.sleep(config.latency_ms / 1000)
+            return {"embedding": {"values": embed(gemini_prompt({"contents": [body.get("content", {})]}), config.embedding_dimensions)}}
+
+        if action == "batchEmbedContents":
+            await asyncio.sleep(config.latency_ms / 1000)
+            return {"embeddings": [
+                {"values": embed(gemini_prompt({"contents": [item.get("content", {})]}), config.embedding_dimensions)}
+                for item in body.get("requests", [])
+            ]}
+
+        prompt = gemini_prompt(body)
+        tokens = stand_in.answer_tokens(prompt)
+
+        if action == "generateContent":
+            await stand_in.generation_delay(tokens)
+            return gemini_response(model, "".join(tokens), prompt)
+
+        if action == "streamGenerateContent":
+            if request.query_params.get("alt") == "sse":
+                async def stream():
+                    async for token in stand_in.stream_tokens(tokens):
+                        yield f"data: {json.dumps(gemini_response(model, token, prompt, finished=False))}\r\n\r\n"
+                    yield f"data: {json.dumps(gemini_response(model, '', prompt))}\r\n\r\n"
+                return StreamingResponse(stream(), media_type="text/event-stream")
+
+            # Without alt=sse the REST API streams one JSON array
+            async def stream_array():
+                yield "["
+                async for token in stand_in.stream_tokens(tokens):
+                    yield json.dumps(gemini_response(model, token, prompt, finished=False)) + ",\r\n"
+                yield json.dumps(gemini_response(model, "", prompt)) + "]"
+            return StreamingResponse(stream_array(), media_type="application/json")
+
+        return JSONResponse(content={"error": {"code": 404, "message": f"Unknown action {action}", "status": "NOT_FOUND"}},
+                            status_code=404)
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stand-in server for the Ollama and Gemini APIs")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11500)
+    args = parser.parse_args()
+
+    import uvicorn
+    uvicorn.run(create_app(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
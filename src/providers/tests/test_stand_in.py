@@ -0,0 +1,57 @@
+import json
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from src.providers.stand_in import create_app, StandInConfig
+
+
+@pytest.fixture(scope="function")
+def client():
+    config = StandInConfig(latency_ms=0, ttft_ms=0, tokens_per_second=10000, max_tokens=8, gemini_requests_per_minute=2)
+    return TestClient(create_app(config))
+
+
+def test_ollama_chat_stream_matches_blocking_answer(client):
+    request = {"model": "llama3.2", "messages": [{"role": "user", "content": "What is a neural network?"}]}
+
+    lines = [json.loads(line) for line in client.post("/api/chat", json=request).text.splitlines()]
+    blocking = client.post("/api/chat", json={**request, "stream": False}).json()
+
+    assert lines[-1]["done"] is True
+    assert "".join(line["message"]["content"] for line in lines) == blocking["message"]["content"]
+    assert blocking["message"]["content"] != client.post("/api/chat", json={**request, "stream": False, "messages": [{"role": "user", "content": "Other"}]}).json()["message"]["content"]
+
+
+def test_embeddings_are_deterministic_and_similar_for_similar_texts(client):
+    first = client.post("/api/embed", json={"model": "nomic-embed-text", "input": ["neural network training", "bitcoin"]}).json()["embeddings"]
+    second = client.post("/api/embeddings", json={"model": "nomic-embed-text", "prompt": "neural network"}).json()["embedding"]
+
+    assert len(first[0]) == 768
+    assert np.dot(first[0], second) > np.dot(first[1], second)
+    assert client.post("/api/embeddings", json={"prompt": "neural network"}).json()["embedding"] == second
+
+
+def test_gemini_generate_content_and_rate_limit(client):
+    request = {"contents": [{"role": "user", "parts": [{"text": "Summarize the video"}]}]}
+
+    answer = client.post("/v1beta/models/gemini-1.5-flash:generateContent", json=request).json()
+    stream = client.post("/v1beta/models/gemini-1.5-flash:streamGenerateContent?alt=sse", json=request).text
+    chunks = [json.loads(line[len("data: "):]) for line in stream.split("\r\n\r\n") if line.startswith("data: ")]
+
+    assert "".join(chunk["candidates"][0]["content"]["parts"][0]["text"] for chunk in chunks) == answer["candidates"][0]["content"]["parts"][0]["text"]
+    limited = client.post("/v1beta/models/gemini-1.5-flash:generateContent", json=request)
+    assert limited.status_code == 429
+    assert limited.json()["error"]["status"] == "RESOURCE_EXHAUSTED"
+    assert "models/gemini-1.5-flash" in [model["name"] for model in client.get("/v1beta/models").json()["models"]]
+
+
+def test_scripted_responses(tmp_path):
+    responses_path = tmp_path / "responses.json"
+    responses_path.write_text(json.dumps([{"match": "extract entities", "response": "['neural network', 'layer']"}]))
+    client = TestClient(create_app(StandInConfig(ttft_ms=0, responses_path=str(responses_path))))
+
+    answer = client.post("/v1beta/models/gemini-1.5-flash:generateContent", json={"contents": [{"parts": [{"text": "Please extract entities"}]}]}).json()
+
+    assert answer["candidates"][0]["content"]["parts"][0]["text"] == "['neural network', 'layer']"
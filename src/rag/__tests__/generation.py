@@ -6,6 +6,9 @@ from langchain_core.output_parsers import StrOutputParser
 from langchain_core.runnables import RunnablePassthrough
 
 from ..rag.rag import rag
+from src.providers.providers import get_ollama_host
+from ..constants.config import DEFAULT_MODEL, DEFAULT_MODEL_PARAMETER_TEMPERATURE, DEFAULT_MODEL_PARAMETER_TOP_P, \
+    DEFAULT_MODEL_PARAMETER_TOP_K
 
 compliance_prompt = """
 You are comparing a submitted answer to an expert answer on a given question. Here is the data:
@@ -62,18 +65,24 @@ def load_test_data():
 def save_test_data(df: pd.DataFrame):
     df.to_csv(CSV_PATH, index=False)
 
-def rag_test_data(database_path: str):
+def rag_test_data(model_id: str = DEFAULT_MODEL, knowledge_base: str | None = None):
+    model_parameters = {
+        "temperature": DEFAULT_MODEL_PARAMETER_TEMPERATURE,
+        "top_p": DEFAULT_MODEL_PARAMETER_TOP_P,
+        "top_k": DEFAULT_MODEL_PARAMETER_TOP_K
+    }
     df = load_test_data()
     for index, row in df.iterrows():
         question = row["question"]
-        output = rag(database_path=database_path, question=question, basic_return=True)
+        output = "".join(rag(question=question, model_id=model_id, model_parameters=model_parameters,
+                             knowledge_base=knowledge_base, plaintext=True))
         output = output.replace(",", "").replace("\n", " ")
         df.loc[index, "output"] = output
 
     save_test_data(df)
 
 def judge_with_ai(prompt_template: PromptTemplate, input: str, expected: str, output: str):
-    llm = ChatOllama(model="llama3.2")
+    llm = ChatOllama(model="llama3.2", base_url=get_ollama_host())
     prompt_chain = (
         {"input": RunnablePassthrough(), "expected": RunnablePassthrough(), "output": RunnablePassthrough()} 
         | prompt_template 
@@ -126,8 +135,8 @@ def test_completeness():
     
     save_test_data(df)
 
-def test_complete_generation(database_path: str, generate_output_first: bool = False):
+def test_complete_generation(model_id: str = DEFAULT_MODEL, generate_output_first: bool = False):
     if generate_output_first:
-        rag_test_data(database_path)
+        rag_test_data(model_id)
     test_compliance()
     test_completeness()
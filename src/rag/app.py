@@ -2,14 +2,15 @@ from typing import List
 import json
 
 from .constants.config import DEFAULT_DATABASE, DEFAULT_MODEL, DEFAULT_MODEL_PARAMETER_TEMPERATURE, \
-    DEFAULT_MODEL_PARAMETER_TOP_P, DEFAULT_MODEL_PARAMETER_TOP_K, USE_SEMANTIC_ROUTING, USE_LOGICAL_ROUTING, DEFAULT_MODE
-from .models.model import get_available_models
+    DEFAULT_MODEL_PARAMETER_TOP_P, DEFAULT_MODEL_PARAMETER_TOP_K, USE_SEMANTIC_ROUTING, USE_LOGICAL_ROUTING, DEFAULT_MODE, \
+    RETRIEVAL_EMBEDDING_MODEL, RERANKING_CROSS_ENCODER_MODEL
+from .models.model import get_available_models, preload_ollama_model
+from .models.encoders import get_sentence_transformer, get_cross_encoder
+from .routing.routes import get_subjects
 from .vectorstore.vectorstore import get_vector_collections
-from .graphstore.langchain_version import ask_question_to_graphdb, mock_load_text_to_graphdb
 from .logger.logger import setup_logger
-from .rag.rag import rag
-from .__tests__.generation import test_complete_generation
-from .graphstore.graphstore import get_full_graph_information
+from .rag.rag import rag, get_llm
+from .conversation.conversation import get_conversation_store, record_conversation_turn, estimate_tokens
 
 """
 VectorDB -> ChromaDB
@@ -35,7 +36,8 @@ def chat_internal(
         plaintext: bool | None = None,
         mode: str | None = None,
         use_logical_routing: bool | None = None,
-        use_semantic_routing: bool | None = None
+        use_semantic_routing: bool | None = None,
+        conversation_id: str | None = None
 ):
     """
     Respond to the user's prompt
@@ -44,6 +46,7 @@ def chat_internal(
     prompt (str): The user's prompt
     model_id (str, optional): ID of the model to use
     message_history (List[dict], optional): History of messages in the conversation
+    conversation_id (str, optional): ID of a server-side conversation, replaces message_history. The prompt and answer are added to it
     playlist_id (str, optional): ID of the YouTube playlist
     video_id (str, optional): ID of the YouTube video
     knowledge_base (str, optional): Knowledge base to use for the response
@@ -116,40 +119,35 @@ def chat_internal(
         logger.warning("Use semantic routing is not provided. Using default value.")
         use_semantic_routing = USE_SEMANTIC_ROUTING
 
+    if conversation_id is not None:
+        message_history = get_conversation_store().get_message_history(conversation_id)
+        history_tokens = sum(estimate_tokens(message["content"]) for message in message_history)
+        logger.info(f"Using conversation {conversation_id}: {len(message_history)} messages, ~{history_tokens} tokens")
+
+    chunks = rag(
+        question=prompt,
+        message_history=message_history,
+        model_id=model_id,
+        knowledge_base=knowledge_base,
+        model_parameters=model_parameters,
+        use_logical_routing=use_logical_routing,
+        use_semantic_routing=use_semantic_routing,
+        logger=logger,
+        video_id=video_id,
+        playlist_id=playlist_id,
+        plaintext=plaintext,
+        database=database,
+        mode=mode
+    )
+
+    if conversation_id is not None:
+        chunks = record_conversation_turn(chunks, conversation_id, prompt, plaintext,
+                                          lambda: get_llm(model_id, model_parameters), logger)
+
     if stream:
-        return rag(
-            question=prompt,
-            message_history=message_history,
-            model_id=model_id,
-            knowledge_base=knowledge_base,
-            model_parameters=model_parameters,
-            use_logical_routing=use_logical_routing,
-            use_semantic_routing=use_semantic_routing,
-            logger=logger,
-            video_id=video_id,
-            playlist_id=playlist_id,
-            plaintext=plaintext,
-            database=database,
-            mode=mode
-        )
+        return chunks
     else:
-        output = []
-        for chunk in rag(
-                question=prompt,
-                message_history=message_history,
-                model_id=model_id,
-                knowledge_base=knowledge_base,
-                model_parameters=model_parameters,
-                use_logical_routing=use_logical_routing,
-                use_semantic_routing=use_semantic_routing,
-                logger=logger,
-                video_id=video_id,
-                playlist_id=playlist_id,
-                plaintext=plaintext,
-                database=database,
-                mode=mode
-        ):
-            output.append(chunk)
+        output = list(chunks)
         if plaintext:
             return ''.join(output)
         else:
@@ -181,6 +179,23 @@ def collections_internal() -> List[str]:
     return get_vector_collections()
 
 
+# POST /warmup
+def warmup_steps_internal() -> dict:
+    """
+    Steps which load everything the first chat request would otherwise load
+
+    Returns:
+        dict: Step name -> function without arguments, run in this order
+    """
+    return {
+        "embedding_model": lambda: get_sentence_transformer(RETRIEVAL_EMBEDDING_MODEL).encode("warmup"),
+        "reranker": lambda: get_cross_encoder(RERANKING_CROSS_ENCODER_MODEL).predict([("warmup", "warmup")]),
+        "vector_collections": get_subjects,
+        "model_list": get_available_models,
+        "default_model": lambda: preload_ollama_model(DEFAULT_MODEL)
+    }
+
+
 ##########################################################
 
 def main():
@@ -188,7 +203,7 @@ def main():
     #mock_load_text_to_graphdb(ALICE_PATH)
     #print(ask_question_to_graphdb("Which book is Lewis Carroll the author of?"))
     #rag(database_path=DATABASE_PATH, question="What is allices opinion on getting older?")
-    #test_complete_generation(DATABASE_PATH, generate_output_first=False)
+    #test_complete_generation(DEFAULT_MODEL, generate_output_first=False)
     print(chat_internal(
         prompt="Whats the price of the new cards?",
         model_id="gemini-1.5-flash",
@@ -0,0 +1,274 @@
+"""
+Offline retrieval benchmark against the local ChromaDB
+
+Runs the questions of a versioned gold set through the retrieval part of the RAG pipeline and reports
+recall@k, MRR and nDCG@k, latency percentiles per stage and throughput at several concurrency levels.
+The results are written as JSON, a previous result file can be passed with --compare.
+
+Usage:
+    python -m src.rag.benchmark.benchmark --mode smart --k 1 3 5 --concurrency 1 4 8
+"""
+
+import argparse
+import json
+import logging
+import math
+import os
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import numpy as np
+
+from ..rag.rag import get_vector_context
+from ..logger.logger import setup_logger
+from ..metrics.metrics import RequestMetrics
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+GOLD_SET_PATH = os.path.join(CURRENT_DIR, "gold_questions.json")
+RESULTS_DIR = os.path.join(CURRENT_DIR, "results")
+PERCENTILES = (50, 95, 99)
+
+
+def load_gold_set(path: str = GOLD_SET_PATH) -> dict:
+    with open(path, "r", encoding="utf-8") as file:
+        return json.load(file)
+
+
+def relevance_grades(documents: list[dict], relevant: list[dict], time_tolerance: float) -> list[int]:
+    """
+    Grade of every retrieved document, 0 if it is not relevant.
+    Chunk ids change with every import, so documents are matched by video_id and time instead.
+
+    Args:
+        documents: Retrieved documents with metadata
+        relevant: Relevant passages of the gold question with video_id, time and an optional grade (default 1)
+        time_tolerance: Maximum difference in seconds between the times
+
+    Returns:
+        List of grades in the order of the documents. Every relevant passage is only counted once.
+    """
+    grades = []
+    matched = set()
+    for document in documents:
+        metadata = document.get("metadata") or {}
+        grade = 0
+        for index, passage in enumerate(relevant):
+            if index in matched or metadata.get("video_id") != passage["video_id"]:
+                continue
+            try:
+                time_difference = abs(float(metadata.get("time")) - passage["time"])
+            except (TypeError, ValueError):
+                continue
+            if time_difference <= time_tolerance:
+                matched.add(index)
+                grade = passage.get("grade", 1)
+                break
+        grades.append(grade)
+    return grades
+
+
+def recall_at_k(grades: list[int], relevant_count: int, k: int) -> float:
+    if relevant_count == 0:
+        return 0.0
+    return sum(1 for grade in grades[:k] if grade > 0) / relevant_count
+
+
+def reciprocal_rank(grades: list[int]) -> float:
+    for rank, grade in enumerate(grades, start=1):
+        if grade > 0:
+            return 1 / rank
+    return 0.0
+
+
+def ndcg_at_k(grades: list[int], ideal_grades: list[int], k: int) -> float:
+    def dcg(values):
+        return sum((2 ** grade - 1) / math.log2(rank + 1) for rank, grade in enumerate(values[:k], start=1))
+
+    ideal = dcg(sorted(ideal_grades, reverse=True))
+    return dcg(grades) / ideal if ideal > 0 else 0.0
+
+
+def latency_percentiles(values: list[float]) -> dict:
+    if len(values) == 0:
+        return {}
+    milliseconds = np.asarray(values) * 1000
+    return {f"p{p}": round(float(np.percentile(milliseconds, p)), 2) for p in PERCENTILES}
+
+
+def run_question(question: dict, mode: str, top_k: int, vectorstore_top_k: int, logger: logging.Logger) -> dict:
+    metrics = RequestMetrics()
+    start = time.perf_counter()
+    with metrics.timer("total"):
+        documents = get_vector_context(
+            question=question["question"],
+            subject=question["collection"],
+            logger=logger,
+            mode=mode,
+            vectorstore_top_k=vectorstore_top_k,
+            reranker_top_k=top_k,
+            metrics=metrics
+        )
+    return {
+        "documents": documents[:top_k],
+        "timings": dict(metrics.timings),
+        "skipped": [skipped["stage"] for skipped in metrics.skipped],
+        "seconds": time.perf_counter() - start
+    }
+
+
+def evaluate_quality(gold_set: dict, mode: str, ks: list[int], vectorstore_top_k: int, logger: logging.Logger) -> dict:
+    """
+    Retrieve every gold question once and compute the quality metrics and the latency per stage
+
+    Returns:
+        dict with the mean metrics, the metrics per question and the latency percentiles per stage
+    """
+    time_tolerance = gold_set.get("time_tolerance", 0.5)
+    max_k = max(ks)
+    per_question = []
+    stage_timings = {}
+
+    for question in gold_set["questions"]:
+        result = run_question(question, mode, max_k, vectorstore_top_k, logger)
+        grades = relevance_grades(result["documents"], question["relevant"], time_tolerance)
+        ideal_grades = [passage.get("grade", 1) for passage in question["relevant"]]
+
+        metrics = {"mrr": reciprocal_rank(grades)}
+        for k in ks:
+            metrics[f"recall@{k}"] = recall_at_k(grades, len(question["relevant"]), k)
+            metrics[f"ndcg@{k}"] = ndcg_at_k(grades, ideal_grades, k)
+        per_question.append({"id": question["id"], "grades": grades, "skipped": result["skipped"], **metrics})
+
+        for stage, seconds in result["timings"].items():
+            stage_timings.setdefault(stage, []).append(seconds)
+        logger.info(f"Benchmark question {question['id']}: {metrics}")
+
+    metric_names = [name for name in per_question[0] if name not in ("id", "grades", "skipped")] if per_question else []
+    return {
+        "metrics": {name: round(float(np.mean([q[name] for q in per_question])), 4) for name in metric_names},
+        "questions": per_question,
+        "latency_ms": {stage: latency_percentiles(values) for stage, values in stage_timings.items()}
+    }
+
+
+def evaluate_throughput(gold_set: dict, mode: str, top_k: int, vectorstore_top_k: int, concurrency_levels: list[int],
+                        repeats: int, logger: logging.Logger) -> dict:
+    """
+    Run the gold questions `repeats` times with each number of concurrent workers
+
+    Returns:
+        dict per concurrency level with questions per second and the latency percentiles of whole requests
+    """
+    questions = gold_set["questions"] * repeats
+    throughput = {}
+    for concurrency in concurrency_levels:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            results = list(executor.map(
+                lambda question: run_question(question, mode, top_k, vectorstore_top_k, logger), questions
+            ))
+        elapsed = time.perf_counter() - start
+        throughput[str(concurrency)] = {
+            "questions_per_second": round(len(questions) / elapsed, 3),
+            "latency_ms": latency_percentiles([result["seconds"] for result in results])
+        }
+        logger.info(f"Benchmark concurrency {concurrency}: {throughput[str(concurrency)]}")
+    return throughput
+
+
+def get_git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare_results(previous: dict, current: dict) -> dict:
+    """Difference of the mean quality metrics and the p95 stage latencies between two result files"""
+    return {
+        "metrics": {
+            name: round(value - previous["quality"]["metrics"][name], 4)
+            for name, value in current["quality"]["metrics"].items() if name in previous["quality"]["metrics"]
+        },
+        "latency_p95_ms": {
+            stage: round(value["p95"] - previous["quality"]["latency_ms"][stage]["p95"], 2)
+            for stage, value in current["quality"]["latency_ms"].items()
+            if stage in previous["quality"]["latency_ms"] and "p95" in value
+        }
+    }
+
+
+def run_benchmark(mode: str = "smart", ks: list[int] | None = None, vectorstore_top_k: int = 25,
+                  concurrency_levels: list[int] | None = None, repeats: int = 1, gold_set_path: str = GOLD_SET_PATH,
+                  output_path: str | None = None, compare_path: str | None = None) -> dict:
+    """
+    Run the retrieval benchmark and write the results as JSON
+
+    Args:
+        mode: Mode of the RAG pipeline, "fast" skips the reranking
+        ks: Cutoffs for recall@k and nDCG@k
+        vectorstore_top_k: Number of passages retrieved before reranking
+        concurrency_levels: Numbers of concurrent workers for the throughput measurement, empty to skip it
+        repeats: How often the gold set is run per concurrency level
+        output_path: Result file, default results/<timestamp>.json next to this module
+        compare_path: Previous result file to compare with
+
+    Returns:
+        dict: The results
+    """
+    logger = setup_logger()
+    ks = sorted(ks or [1, 3, 5, 10])
+    concurrency_levels = [1, 4, 8] if concurrency_levels is None else concurrency_levels
+    gold_set = load_gold_set(gold_set_path)
+
+    # Load the embedding and reranking models before anything is measured
+    run_question(gold_set["questions"][0], mode, max(ks), vectorstore_top_k, logger)
+
+    results = {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "git_commit": get_git_commit(),
+        "gold_set_version": gold_set["version"],
+        "config": {"mode": mode, "ks": ks, "vectorstore_top_k": vectorstore_top_k, "repeats": repeats},
+        "quality": evaluate_quality(gold_set, mode, ks, vectorstore_top_k, logger),
+        "throughput": evaluate_throughput(gold_set, mode, max(ks), vectorstore_top_k, concurrency_levels, repeats, logger)
+    }
+
+    if compare_path is not None:
+        with open(compare_path, "r", encoding="utf-8") as file:
+            previous = json.load(file)
+        if previous.get("gold_set_version") != results["gold_set_version"]:
+            logger.warning(f"Comparing with gold set version {previous.get('gold_set_version')}, current version is {results['gold_set_version']}")
+        results["comparison"] = {"previous": compare_path, **compare_results(previous, results)}
+
+    if output_path is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output_path = os.path.join(RESULTS_DIR, f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{mode}.json")
+    with open(output_path, "w", encoding="utf-8") as file:
+        json.dump(results, file, indent=2)
+    logger.info(f"Benchmark results written to {output_path}")
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline retrieval benchmark against the local ChromaDB")
+    parser.add_argument("--mode", default="smart", choices=["fast", "smart"])
+    parser.add_argument("--k", type=int, nargs="+", default=[1, 3, 5, 10], help="Cutoffs for recall@k and nDCG@k")
+    parser.add_argument("--vectorstore-top-k", type=int, default=25)
+    parser.add_argument("--concurrency", type=int, nargs="*", default=[1, 4, 8], help="Concurrency levels, none to skip")
+    parser.add_argument("--repeats", type=int, default=1)
+    parser.add_argument("--gold-set", default=GOLD_SET_PATH)
+    parser.add_argument("--output")
+    parser.add_argument("--compare", help="Previous result file")
+    args = parser.parse_args()
+
+    results = run_benchmark(args.mode, args.k, args.vectorstore_top_k, args.concurrency, args.repeats, args.gold_set,
+                            args.output, args.compare)
+    print(json.dumps({key: results[key] for key in ("quality", "throughput", "comparison") if key in results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+"""
+Load test of the FastAPI app
+
+Replays a weighted mix of /chat (and optionally /analyze) requests with a fixed number of concurrent clients
+and reports throughput, latency and time to first token percentiles and error rates per scenario.
+Start the app with the simulated model to measure the capacity of the app itself, without any model provider:
+
+    SIMULATED_LLM=true SIMULATED_LLM_TTFT_MS=300 SIMULATED_LLM_TOKENS_PER_SECOND=50 uvicorn main:app
+    python -m src.rag.benchmark.loadtest --concurrency 1 8 32 --duration 60
+"""
+
+import argparse
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import requests
+
+from .benchmark import latency_percentiles
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_DIR = os.path.join(CURRENT_DIR, "results")
+
+QUESTIONS = [
+    "How do digital signatures work in Bitcoin?",
+    "How does proof-of-work secure the Bitcoin blockchain?",
+    "What is a compound AI system?",
+    "What are the components of LLM agents?",
+    "How does the ReACT approach combine reasoning and acting?",
+    "When is a programmatic system more efficient than an agentic one?",
+]
+
+# Every scenario is a /chat payload without the prompt, picked with the probability of its weight
+DEFAULT_MIX = [
+    {"name": "fast-vector-stream", "weight": 4, "endpoint": "/chat",
+     "payload": {"mode": "fast", "database": "vector", "stream": True, "plaintext": False}},
+    {"name": "fast-all-stream", "weight": 3, "endpoint": "/chat",
+     "payload": {"mode": "fast", "database": "all", "stream": True, "plaintext": False}},
+    {"name": "smart-all-stream", "weight": 2, "endpoint": "/chat",
+     "payload": {"mode": "smart", "database": "all", "stream": True, "plaintext": False}},
+    {"name": "fast-graph-plaintext", "weight": 1, "endpoint": "/chat",
+     "payload": {"mode": "fast", "database": "graph", "stream": True, "plaintext": True}},
+    {"name": "fast-vector-blocking", "weight": 1, "endpoint": "/chat",
+     "payload": {"mode": "fast", "database": "vector", "stream": False, "plaintext": False}},
+]
+
+
+def load_mix(path: str | None) -> list[dict]:
+    """
+    Load a request mix from a JSON file, a list of scenarios like DEFAULT_MIX.
+    /analyze scenarios have a "payload" with "video_input" instead of a prompt.
+    """
+    if path is None:
+        return DEFAULT_MIX
+    with open(path, "r", encoding="utf-8") as file:
+        return json.load(file)
+
+
+def send_request(session: requests.Session, base_url: str, scenario: dict, prompt: str, model_id: str | None,
+                 timeout: float) -> dict:
+    """
+    Send one request and read the response as a stream
+
+    Returns:
+        dict with the scenario, status, error, time to first byte of the body and total latency in seconds
+    """
+    payload = dict(scenario["payload"])
+    if scenario.get("endpoint", "/chat") == "/chat":
+        payload["prompt"] = prompt
+        if model_id is not None:
+            payload["model_id"] = model_id
+
+    result = {"scenario": scenario["name"], "status": None, "error": None, "ttft": None, "latency": None, "bytes": 0}
+    start = time.perf_counter()
+    try:
+        with session.post(base_url + scenario.get("endpoint", "/chat"), json=payload, stream=True, timeout=timeout) as response:
+            result["status"] = response.status_code
+            for chunk in response.iter_content(chunk_size=None):
+                if chunk and result["ttft"] is None:
+                    result["ttft"] = time.perf_counter() - start
+                result["bytes"] += len(chunk)
+            if response.status_code >= 400:
+                result["error"] = f"HTTP {response.status_code}"
+    except requests.RequestException as e:
+        result["error"] = type(e).__name__
+    result["latency"] = time.perf_counter() - start
+    return result
+
+
+def summarize(results: list[dict], elapsed: float) -> dict:
+    succeeded = [result for result in results if result["error"] is None]
+    errors = {}
+    for result in results:
+        if result["error"] is not None:
+            errors[result["error"]] = errors.get(result["error"], 0) + 1
+    return {
+        "requests": len(results),
+        "requests_per_second": round(len(results) / elapsed, 3) if elapsed > 0 else 0.0,
+        "successful_requests_per_second": round(len(succeeded) / elapsed, 3) if elapsed > 0 else 0.0,
+        "error_rate": round(1 - len(succeeded) / len(results), 4) if results else 0.0,
+        "errors": errors,
+        "latency_ms": latency_percentiles([result["latency"] for result in succeeded]),
+        "ttft_ms": latency_percentiles([result["ttft"] for result in succeeded if result["ttft"] is not None]),
+        "bytes_per_second": round(sum(result["bytes"] for result in succeeded) / elapsed, 1) if elapsed > 0 else 0.0
+    }
+
+
+def run_level(base_url: str, mix: list[dict], concurrency: int, duration: float, model_id: str | None, timeout: float,
+              seed: int) -> dict:
+    """
+    Run `concurrency` clients in a closed loop for `duration` seconds. Every client sends its next request
+    as soon as the previous response is read completely. The sequence of requests depends only on the seed.
+    """
+    deadline = time.perf_counter() + duration
+    results = []
+    results_lock = threading.Lock()
+    weights = [scenario["weight"] for scenario in mix]
+
+    def client(index: int):
+        generator = random.Random(seed * 1000 + index)
+        session = requests.Session()
+        while time.perf_counter() < deadline:
+            scenario = generator.choices(mix, weights=weights)[0]
+            result = send_request(session, base_url, scenario, generator.choice(QUESTIONS), model_id, timeout)
+            with results_lock:
+                results.append(result)
+        session.close()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(client, range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    return {
+        "total": summarize(results, elapsed),
+        "scenarios": {
+            scenario["name"]: summarize([result for result in results if result["scenario"] == scenario["name"]], elapsed)
+            for scenario in mix
+        }
+    }
+
+
+def run_load_test(base_url: str = "http://localhost:8000", concurrency_levels: list[int] | None = None,
+                  duration: float = 30, mix_path: str | None = None, model_id: str | None = "simulated",
+                  timeout: float = 120, seed: int = 0, output_path: str | None = None) -> dict:
+    """
+    Run the load test at every concurrency level and write the results as JSON
+
+    Args:
+        base_url: URL of the FastAPI app
+        concurrency_levels: Numbers of concurrent clients
+        duration: Seconds per concurrency level
+        mix_path: JSON file with the request mix, DEFAULT_MIX if None
+        model_id: Model of the /chat requests, None for the default model of the app
+        timeout: Seconds until a request counts as failed
+        output_path: Result file, default results/loadtest-<timestamp>.json next to this module
+
+    Returns:
+        dict: The results
+    """
+    mix = load_mix(mix_path)
+    results = {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "config": {"base_url": base_url, "duration": duration, "model_id": model_id, "seed": seed, "mix": mix},
+        "levels": {}
+    }
+    for concurrency in concurrency_levels or [1, 8, 32]:
+        results["levels"][str(concurrency)] = run_level(base_url, mix, concurrency, duration, model_id, timeout, seed)
+        print(f"concurrency {concurrency}: {json.dumps(results['levels'][str(concurrency)]['total'])}")
+
+    if output_path is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output_path = os.path.join(RESULTS_DIR, f"loadtest-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    with open(output_path, "w", encoding="utf-8") as file:
+        json.dump(results, file, indent=2)
+    print(f"Load test results written to {output_path}")
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test of /chat and /analyze")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--duration", type=float, default=30, help="Seconds per concurrency level")
+    parser.add_argument("--mix", help="JSON file with the request mix")
+    parser.add_argument("--model", default="simulated", help='Model of the /chat requests, "" for the default model')
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    run_load_test(args.url, args.concurrency, args.duration, args.mix, args.model or None, args.timeout, args.seed,
+                  args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Startup profile of the FastAPI app
+
+Imports a module in a fresh interpreter with `python -X importtime` and reports the import time per module and
+per top-level package, the total wall time and every module of the ingestion stack which was imported anyway.
+Exits with status 1 if the startup exceeds the budget or a forbidden package was imported, so it can run in CI:
+
+    python -m src.rag.benchmark.startup --module main --budget 5
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_DIR = os.path.join(CURRENT_DIR, "results")
+ROOT_DIR = os.path.abspath(os.path.join(CURRENT_DIR, "..", "..", ".."))
+
+# Only needed for /analyze and the rerankers outside of the chat path, a chat-only worker should not import them
+INGESTION_PACKAGES = ["torch", "clip", "cv2", "yt_dlp", "sentence_transformers", "llama_index", "langchain_experimental"]
+
+
+def parse_importtime(stderr: str) -> list[dict]:
+    """
+    Parse the output of `python -X importtime`
+
+    Returns:
+        list of dicts with module, package, depth, self_ms and cumulative_ms in import order
+    """
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        module = name.strip()
+        modules.append({
+            "module": module,
+            "package": module.split(".")[0],
+            "depth": (len(name) - len(name.lstrip()) - 1) // 2,
+            "self_ms": int(self_us) / 1000,
+            "cumulative_ms": int(cumulative_us) / 1000
+        })
+    return modules
+
+
+def profile_startup(module: str = "main", python: str = sys.executable) -> dict:
+    """
+    Import `module` in a new interpreter and measure every import
+
+    Args:
+        module: Module to import, e.g. "main" or "src.rag.app"
+        python: Interpreter to use
+
+    Returns:
+        dict with the wall time in seconds and the parsed import times
+    """
+    start = time.perf_counter()
+    process = subprocess.run([python, "-X", "importtime", "-c", f"import {module}"], cwd=ROOT_DIR,
+                             capture_output=True, text=True)
+    wall_time = time.perf_counter() - start
+    if process.returncode != 0:
+        error = process.stderr.strip().splitlines()[-1] if process.stderr.strip() else f"exit status {process.returncode}"
+        raise RuntimeError(f"Importing {module} failed: {error}")
+    return {"module": module, "wall_time": wall_time, "modules": parse_importtime(process.stderr)}
+
+
+def summarize(profile: dict, top: int = 20, forbidden: list[str] | None = None) -> dict:
+    modules = profile["modules"]
+    packages = {}
+    for module in modules:
+        packages[module["package"]] = packages.get(module["package"], 0.0) + module["self_ms"]
+    imported_packages = set(packages)
+
+    return {
+        "module": profile["module"],
+        "wall_time_s": round(profile["wall_time"], 3),
+        "import_time_ms": round(sum(module["self_ms"] for module in modules), 1),
+        "modules_imported": len(modules),
+        "top_packages_ms": {package: round(ms, 1) for package, ms in
+                            sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]},
+        "top_modules_cumulative_ms": {module["module"]: round(module["cumulative_ms"], 1) for module in
+                                      sorted(modules, key=lambda item: item["cumulative_ms"], reverse=True)[:top]},
+        "forbidden_imported": sorted(imported_packages & set(forbidden or []))
+    }
+
+
+def print_summary(summary: dict):
+    print(f"import {summary['module']}: {summary['wall_time_s']:.2f} s wall time, "
+          f"{summary['import_time_ms']:.0f} ms in {summary['modules_imported']} imports")
+    print("\nSelf time per top-level package:")
+    for package, ms in summary["top_packages_ms"].items():
+        print(f"  {ms:10.1f} ms  {package}")
+    print("\nCumulative time per module:")
+    for module, ms in summary["top_modules_cumulative_ms"].items():
+        print(f"  {ms:10.1f} ms  {module}")
+    if summary["forbidden_imported"]:
+        print(f"\nImported although not needed at startup: {', '.join(summary['forbidden_imported'])}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import time profile of the app startup")
+    parser.add_argument("--module", default="main", help="Module to import, e.g. main or src.rag.app")
+    parser.add_argument("--top", type=int, default=20, help="Number of packages and modules to report")
+    parser.add_argument("--budget", type=float, help="Maximum wall time in seconds")
+    parser.add_argument("--forbid", nargs="*", default=INGESTION_PACKAGES,
+                        help="Packages which must not be imported at startup")
+    parser.add_argument("--output", help="Result file, default results/startup-<timestamp>.json")
+    args = parser.parse_args()
+
+    profile = profile_startup(args.module)
+    summary = summarize(profile, args.top, args.forbid)
+    print_summary(summary)
+
+    output_path = args.output
+    if output_path is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output_path = os.path.join(RESULTS_DIR, f"startup-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    with open(output_path, "w", encoding="utf-8") as file:
+        json.dump({"created_at": datetime.now(timezone.utc).isoformat(), "summary": summary, "modules": profile["modules"]},
+                  file, indent=2)
+    print(f"\nStartup profile written to {output_path}")
+
+    failed = bool(summary["forbidden_imported"])
+    if args.budget is not None and summary["wall_time_s"] > args.budget:
+        print(f"Startup took {summary['wall_time_s']:.2f} s, the budget is {args.budget:.2f} s")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -16,9 +16,29 @@ USE_SEMANTIC_ROUTING = config.get("use_semantic_routing")
 USE_LOGICAL_ROUTING = config.get("use_logical_routing")
 RETRIEVAL_EMBEDDING_MODEL = config.get("retrieval_embedding_model")
 RERANKING_CROSS_ENCODER_MODEL = config.get("reranking_cross_encoder_model")
+VECTOR_BACKEND = config.get("vector_backend", "chroma")
 VECTORSTORE_TOP_K = config.get("vectorstore_top_k")
+VECTOR_PLANNER_ENABLED = config.get("vector_planner").get("enabled")
+VECTOR_PLANNER_EXACT_MAX_CANDIDATES = config.get("vector_planner").get("exact_max_candidates")
 RERANKING_TOP_K = config.get("reranking_top_k")
+USE_MMR = config.get("use_mmr")
+MMR_LAMBDA = config.get("mmr_lambda")
+MMR_TOP_K = config.get("mmr_top_k")
 DEFAULT_MODE = config.get("default_mode")
 INCLUDE_IMAGE_DESCRIPTIONS = config.get("include_image_descriptions")
 
+CONVERSATION_MAX_TURNS = config.get("conversation").get("max_turns")
+CONVERSATION_MAX_TURN_TOKENS = config.get("conversation").get("max_turn_tokens")
+CONVERSATION_MAX_SUMMARY_TOKENS = config.get("conversation").get("max_summary_tokens")
+
+EARLY_EXIT_ENABLED = config.get("early_exit").get("enabled")
+EARLY_EXIT_SKIP_RERANKING_MIN_MARGIN = config.get("early_exit").get("skip_reranking_min_margin")
+EARLY_EXIT_SKIP_GRAPH_MIN_SIMILARITY = config.get("early_exit").get("skip_graph_min_similarity")
+EARLY_EXIT_SKIP_GRAPH_MIN_RERANK_MARGIN = config.get("early_exit").get("skip_graph_min_rerank_margin")
+
+GRAPH_RETRIEVAL_MAX_LINKED_ENTITIES = config.get("graph_retrieval").get("max_linked_entities")
+GRAPH_RETRIEVAL_HOPS = config.get("graph_retrieval").get("hops")
+GRAPH_RETRIEVAL_MAX_RELATIONS = config.get("graph_retrieval").get("max_relations")
+GRAPH_RETRIEVAL_MAX_EVIDENCE = config.get("graph_retrieval").get("max_evidence")
+
 NEO4J_FALLBACK = config.get("neo4j_fallback")
@@ -15,3 +15,9 @@ proper_gemini_key = os.getenv("GOOGLE_API_KEY")
 funny_gemini_key = os.getenv("API_KEY_GOOGLE_GEMINI")
 GEMINI_API_KEY = proper_gemini_key or funny_gemini_key
 DEEPSEEK_API_KEY = os.getenv("DEEPSEEK_API_KEY")
+
+# Deterministic stand-in model "simulated" for load tests, see models/simulated.py
+SIMULATED_LLM = os.getenv("SIMULATED_LLM", "false").lower() == "true"
+SIMULATED_LLM_TTFT_MS = float(os.getenv("SIMULATED_LLM_TTFT_MS", "300"))
+SIMULATED_LLM_TOKENS_PER_SECOND = float(os.getenv("SIMULATED_LLM_TOKENS_PER_SECOND", "50"))
+SIMULATED_LLM_MAX_TOKENS = int(os.getenv("SIMULATED_LLM_MAX_TOKENS", "200"))
@@ -0,0 +1,223 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+from ..constants.config import CONVERSATION_MAX_TURNS, CONVERSATION_MAX_TURN_TOKENS, CONVERSATION_MAX_SUMMARY_TOKENS
+
+conversation_store = None
+conversation_store_lock = threading.Lock()
+
+
+def get_conversation_database_path():
+    return os.path.join(os.path.dirname(__file__), "..", "..", "..", "db", "conversations.db")
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count, about four characters per token for English text"""
+    return (len(text) + 3) // 4
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    max_characters = max_tokens * 4
+    if len(text) <= max_characters:
+        return text
+    return text[:max_characters].rsplit(" ", 1)[0] + " ..."
+
+
+class ConversationStore:
+    """
+    Server-side conversation history keyed by a conversation id
+
+    Every message is stored as a turn. The context of a conversation is the last `max_turns` turns verbatim
+    plus a rolling summary of all older turns, so the prompt size stays constant however long the conversation is.
+    The summary is updated incrementally: only turns which fell out of the verbatim window since the last update
+    are merged into it.
+
+    Example:
+        store = get_conversation_store()
+        store.append_turns("abc", [("user", "What is a neural network?"), ("assistant", "A neural network is ...")])
+        store.get_message_history("abc")
+    """
+
+    def __init__(self, database_path: str, max_turns: int = CONVERSATION_MAX_TURNS,
+                 max_turn_tokens: int = CONVERSATION_MAX_TURN_TOKENS,
+                 max_summary_tokens: int = CONVERSATION_MAX_SUMMARY_TOKENS):
+        self.database_path = database_path
+        self.max_turns = max_turns
+        self.max_turn_tokens = max_turn_tokens
+        self.max_summary_tokens = max_summary_tokens
+        self.summarizing = set()
+        self.summarizing_lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(database_path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS conversations (
+                    id TEXT PRIMARY KEY,
+                    summary TEXT NOT NULL DEFAULT '',
+                    summarized_until INTEGER NOT NULL DEFAULT 0,
+                    updated_at TEXT
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS conversation_turns (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    conversation_id TEXT NOT NULL,
+                    role TEXT NOT NULL,
+                    content TEXT NOT NULL,
+                    created_at TEXT
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS conversation_turns_by_conversation ON conversation_turns (conversation_id, id)")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.database_path, timeout=10)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            yield conn
+            conn.commit()
+        finally:
+            conn.close()
+
+    def append_turns(self, conversation_id: str, turns: list[tuple[str, str]]):
+        now = datetime.now(timezone.utc).isoformat()
+        with self._connect() as conn:
+            conn.execute("INSERT OR IGNORE INTO conversations (id, updated_at) VALUES (?, ?)", (conversation_id, now))
+            conn.executemany(
+                "INSERT INTO conversation_turns (conversation_id, role, content, created_at) VALUES (?, ?, ?, ?)",
+                [(conversation_id, role, content, now) for role, content in turns]
+            )
+            conn.execute("UPDATE conversations SET updated_at = ? WHERE id = ?", (now, conversation_id))
+
+    def get_summary(self, conversation_id: str) -> tuple[str, int]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT summary, summarized_until FROM conversations WHERE id = ?", (conversation_id,)).fetchone()
+        return (row[0], row[1]) if row else ("", 0)
+
+    def get_recent_turns(self, conversation_id: str) -> list[tuple[int, str, str]]:
+        with self._connect() as conn:
+            rows = conn.execute("""
+                SELECT id, role, content FROM conversation_turns
+                WHERE conversation_id = ?
+                ORDER BY id DESC
+                LIMIT ?
+            """, (conversation_id, self.max_turns)).fetchall()
+        return list(reversed(rows))
+
+    def get_turns_to_summarize(self, conversation_id: str) -> list[tuple[int, str, str]]:
+        """Turns older than the verbatim window which are not part of the summary yet"""
+        _, summarized_until = self.get_summary(conversation_id)
+        recent_turns = self.get_recent_turns(conversation_id)
+        if len(recent_turns) == 0:
+            return []
+        with self._connect() as conn:
+            return conn.execute("""
+                SELECT id, role, content FROM conversation_turns
+                WHERE conversation_id = ? AND id > ? AND id < ?
+                ORDER BY id ASC
+            """, (conversation_id, summarized_until, recent_turns[0][0])).fetchall()
+
+    def update_summary(self, conversation_id: str, summary: str, summarized_until: int):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE conversations SET summary = ?, summarized_until = ? WHERE id = ? AND summarized_until < ?",
+                (truncate_to_tokens(summary, self.max_summary_tokens), summarized_until, conversation_id, summarized_until)
+            )
+
+    def get_message_history(self, conversation_id: str) -> list[dict]:
+        """
+        Message history for the prompts: the rolling summary followed by the last turns, each capped in tokens.
+
+        Returns:
+            list[dict]: Messages with role and content
+        """
+        summary, _ = self.get_summary(conversation_id)
+        message_history = []
+        if summary:
+            message_history.append({"role": "system", "content": f"Summary of the earlier conversation: {summary}"})
+        for _, role, content in self.get_recent_turns(conversation_id):
+            message_history.append({"role": role, "content": truncate_to_tokens(content, self.max_turn_tokens)})
+        return message_history
+
+    def summarize(self, conversation_id: str, llm, logger: logging.Logger):
+        """Merge the turns which fell out of the verbatim window into the rolling summary"""
+        turns = self.get_turns_to_summarize(conversation_id)
+        if len(turns) == 0:
+            return
+
+        summary, _ = self.get_summary(conversation_id)
+        transcript = "\n".join(f"{role}: {truncate_to_tokens(content, self.max_turn_tokens)}" for _, role, content in turns)
+        prompt = f"""
+        Update the summary of a conversation between a user and an assistant about lecture videos.
+        Keep the topics, questions and facts which later questions might refer to. Drop greetings and filler.
+        Use at most {self.max_summary_tokens * 3 // 4} words. Return only the updated summary.
+
+        ==============================
+        Current summary: {summary or "(empty)"}
+        ==============================
+        New messages:
+        {transcript}
+        ==============================
+        """
+        updated_summary = llm.invoke(prompt).content
+        self.update_summary(conversation_id, updated_summary, turns[-1][0])
+        logger.info(f"Updated summary of conversation {conversation_id} with {len(turns)} turns")
+
+    def summarize_in_background(self, conversation_id: str, llm, logger: logging.Logger):
+        """Start a summary update unless one is already running for the conversation"""
+        with self.summarizing_lock:
+            if conversation_id in self.summarizing:
+                return
+            self.summarizing.add(conversation_id)
+
+        def run():
+            try:
+                self.summarize(conversation_id, llm, logger)
+            except Exception as e:
+                logger.error(f"Summary of conversation {conversation_id} failed: {e}")
+            finally:
+                with self.summarizing_lock:
+                    self.summarizing.discard(conversation_id)
+
+        threading.Thread(target=run, name=f"summary-{conversation_id}", daemon=True).start()
+
+
+def get_conversation_store() -> ConversationStore:
+    """Process-wide conversation store, created on the first call"""
+    global conversation_store
+
+    with conversation_store_lock:
+        if conversation_store is None:
+            conversation_store = ConversationStore(get_conversation_database_path())
+        return conversation_store
+
+
+def record_conversation_turn(chunks, conversation_id: str, question: str, plaintext: bool, get_summary_llm,
+                             logger: logging.Logger):
+    """
+    Pass the answer chunks of rag() through and store the question and the complete answer afterwards.
+    Older turns are then merged into the summary in a background thread.
+
+    Args:
+        chunks: Generator of answer chunks, plain text or JSON with a "content" key
+        conversation_id: ID of the conversation
+        question: Question of the user
+        plaintext: Whether the chunks are plain text
+        get_summary_llm: Callable returning the LLM for the summary, only called if a summary update is due
+        logger: Logger of the request
+    """
+    answer = []
+    for chunk in chunks:
+        answer.append(chunk if plaintext else json.loads(chunk)["content"])
+        yield chunk
+
+    store = get_conversation_store()
+    store.append_turns(conversation_id, [("user", question), ("assistant", "".join(answer))])
+
+    if len(store.get_turns_to_summarize(conversation_id)) > 0:
+        store.summarize_in_background(conversation_id, get_summary_llm(), logger)
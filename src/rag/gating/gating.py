@@ -0,0 +1,82 @@
+import logging
+from statistics import median
+
+from ..constants.config import EARLY_EXIT_ENABLED, EARLY_EXIT_SKIP_RERANKING_MIN_MARGIN, \
+    EARLY_EXIT_SKIP_GRAPH_MIN_SIMILARITY, EARLY_EXIT_SKIP_GRAPH_MIN_RERANK_MARGIN
+from ..metrics.metrics import RequestMetrics
+
+
+def should_skip_reranking(vector_context: list[dict], reranker_top_k: int, logger: logging.Logger,
+                          metrics: RequestMetrics) -> bool:
+    """
+    Decide whether the cross-encoder can be skipped because the dense scores are already well separated.
+
+    The reranker can only change which passages end up in the context if passages around the top_k cutoff
+    are close to each other. If the similarity gap at the cutoff is larger than the configured margin,
+    the dense order is kept.
+
+    Args:
+        vector_context: Retrieved documents sorted by similarity, each with a "similarity" key
+        reranker_top_k: Number of passages the reranker would keep
+        logger: Logger of the request
+        metrics: Metrics of the request, the decision is recorded here
+
+    Returns:
+        bool: True if reranking should be skipped
+    """
+    if not EARLY_EXIT_ENABLED:
+        return False
+
+    similarities = [doc.get("similarity") for doc in vector_context]
+    if None in similarities or len(similarities) <= reranker_top_k:
+        return False
+
+    cutoff_margin = similarities[reranker_top_k - 1] - similarities[reranker_top_k]
+    metrics.record("dense_cutoff_margin", round(cutoff_margin, 4))
+
+    if cutoff_margin >= EARLY_EXIT_SKIP_RERANKING_MIN_MARGIN:
+        logger.info(f"Skipping reranking, dense cutoff margin {cutoff_margin:.4f} >= {EARLY_EXIT_SKIP_RERANKING_MIN_MARGIN}")
+        metrics.skip("reranking", f"dense cutoff margin {cutoff_margin:.4f}")
+        return True
+
+    return False
+
+
+def should_skip_graph(vector_context: list[dict], logger: logging.Logger, metrics: RequestMetrics) -> bool:
+    """
+    Decide whether the graph retrieval can be skipped because the vector evidence is strong.
+
+    The vector evidence is strong if the best dense hit is above the configured similarity and,
+    if the passages were reranked, the best rerank score clearly stands out from the others.
+
+    Args:
+        vector_context: Final vector context, each document with a "similarity" and optionally a "rerank_score" key
+        logger: Logger of the request
+        metrics: Metrics of the request, the decision is recorded here
+
+    Returns:
+        bool: True if the graph retrieval should be skipped
+    """
+    if not EARLY_EXIT_ENABLED or len(vector_context) == 0:
+        return False
+
+    similarities = [doc["similarity"] for doc in vector_context if doc.get("similarity") is not None]
+    if len(similarities) == 0:
+        return False
+
+    top_similarity = max(similarities)
+    metrics.record("dense_top_similarity", round(top_similarity, 4))
+
+    if top_similarity < EARLY_EXIT_SKIP_GRAPH_MIN_SIMILARITY:
+        return False
+
+    rerank_scores = [doc["rerank_score"] for doc in vector_context if doc.get("rerank_score") is not None]
+    if len(rerank_scores) > 1:
+        rerank_margin = max(rerank_scores) - median(rerank_scores)
+        metrics.record("rerank_margin", round(rerank_margin, 4))
+        if rerank_margin < EARLY_EXIT_SKIP_GRAPH_MIN_RERANK_MARGIN:
+            return False
+
+    logger.info(f"Skipping graph retrieval, strong vector evidence (top similarity {top_similarity:.4f})")
+    metrics.skip("graph", f"top dense similarity {top_similarity:.4f}")
+    return True
@@ -1,151 +1,261 @@
 import logging
-from neo4j import GraphDatabase
+import re
 from langchain_ollama import ChatOllama
 from langchain_openai import ChatOpenAI
 from langchain_google_genai import ChatGoogleGenerativeAI
 
 from ..constants.env import NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD
+from ..constants.config import GRAPH_RETRIEVAL_MAX_LINKED_ENTITIES, GRAPH_RETRIEVAL_HOPS, GRAPH_RETRIEVAL_MAX_RELATIONS, \
+    GRAPH_RETRIEVAL_MAX_EVIDENCE
 
-graphstore = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
+from src.db.graph_db.graph_store import get_graph_store
+from src.providers.providers import get_ollama_host
+
+entity_name_index_created = False
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "between", "by", "can", "chatbot", "describe", "difference", "do",
+    "does", "explain", "for", "from", "how", "i", "in", "is", "it", "me", "of", "on", "or", "tell", "that", "the",
+    "this", "to", "video", "was", "what", "when", "where", "which", "who", "why", "with", "work", "works", "you"
+}
+
+def get_graphstore():
+    """Shared graph store of the configured backend, the Neo4j driver is only opened on the first query"""
+    return get_graph_store(NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD)
 
 def get_full_graph_information():
-    with graphstore.session() as session:
-        # Get all nodes and relationships
-        result = session.run("""
-            MATCH (n)
-            OPTIONAL MATCH (n)-[r]->(m)
-            RETURN collect(distinct {
-                node: n,
-                type: labels(n)[0],
-                properties: properties(n)
-            }) as nodes,
-            collect(distinct {
-                start: startNode(r),
-                type: type(r),
-                end: endNode(r),
-                properties: properties(r)
-            }) as relationships
-        """)
-        result_data = result.single()
-        print("Nodes:", result_data["nodes"])
-        print("Relationships:", result_data["relationships"])
-        return result_data
+    # Get all nodes and relationships of the configured backend
+    result_data = get_graphstore().get_full_graph()
+    print("Nodes:", result_data["nodes"])
+    print("Relationships:", result_data["relationships"])
+    return result_data
+
+def question_to_ngrams(question: str, max_n: int = 3) -> list[str]:
+    """
+    Split the question into word n-grams which are candidates for entity names.
+    N-grams starting or ending with a stopword are dropped, longer n-grams come first.
+    """
+    words = [word for word in re.findall(r"[a-z0-9]+(?:[-'][a-z0-9]+)*", question.lower())]
+    ngrams = []
+    for n in range(min(max_n, len(words)), 0, -1):
+        for i in range(len(words) - n + 1):
+            ngram = words[i:i + n]
+            if ngram[0] in STOPWORDS or ngram[-1] in STOPWORDS:
+                continue
+            ngrams.append(" ".join(ngram))
+    return list(dict.fromkeys(ngrams))
+
+def ensure_entity_name_index():
+    """Create the entity name index once per process"""
+    global entity_name_index_created
+
+    if entity_name_index_created:
+        return
+
+    get_graphstore().ensure_indexes()
+    entity_name_index_created = True
+
+def format_graph_evidence(relations: list[dict], entities: list[dict], max_evidence: int) -> tuple[str, list[dict]]:
+    """
+    Format expanded relations and the transcript evidence attached to the linked entities as context.
+
+    The Entity properties text, time and url_id are parallel lists, one entry per chunk the entity was found in.
+    """
+    lines = []
+    for relation in relations:
+        lines.append(f"{relation['source']} {relation['relation'].replace('_', ' ').lower()} {relation['target']}")
+
+    metadata = []
+    seen = set()
+    for entity in entities:
+        texts = entity.get("text") or []
+        times = entity.get("time") or []
+        video_ids = entity.get("url_id") or []
+        for text, time, video_id in zip(texts, times, video_ids):
+            if len(metadata) >= max_evidence:
+                break
+            if (video_id, time) in seen:
+                continue
+            seen.add((video_id, time))
+            lines.append(f"[{entity['name']}] {text}")
+            metadata.append({"video_id": video_id, "time": int(float(time))})
+
+    return ("\n".join(lines), metadata)
+
+def question_to_graphdb_with_entity_linking(question: str, logger: logging.Logger,
+                                            max_linked_entities: int = GRAPH_RETRIEVAL_MAX_LINKED_ENTITIES,
+                                            hops: int = GRAPH_RETRIEVAL_HOPS,
+                                            max_relations: int = GRAPH_RETRIEVAL_MAX_RELATIONS,
+                                            max_evidence: int = GRAPH_RETRIEVAL_MAX_EVIDENCE) -> tuple[str, list[dict]]:
+    """
+    Retrieve graph context without an LLM.
+
+    The question n-grams are linked to the entity names through the name index of the graph store, the linked entities are
+    expanded along the typed relations and the transcript evidence attached to the entities is returned
+    together with timestamped sources.
+
+    Args:
+        question: Question of the user
+        logger: Logger of the request
+        max_linked_entities: Number of entities linked to the question
+        hops: Depth of the neighborhood expansion (1 or 2)
+        max_relations: Maximum number of relations returned as context
+        max_evidence: Maximum number of transcript passages returned as context
+
+    Returns:
+        tuple: Context text and list of source metadata with video_id and time
+    """
+    ngrams = question_to_ngrams(question)
+    if len(ngrams) == 0:
+        logger.warning("No entity candidates found in the question")
+        return ("", [])
+
+    try:
+        graphstore = get_graphstore()
+        ensure_entity_name_index()
+
+        linked = graphstore.link_entities(ngrams, max_linked_entities)
+
+        names = [entity["name"] for entity in linked]
+        logger.info(f"Linked entities: {linked}")
+
+        if len(names) == 0:
+            return ("", [])
+
+        relations = graphstore.expand_neighborhood(names, hops, max_relations)
+        entities = graphstore.get_entities(names)
+
+        # keep the order of the linking scores
+        entities.sort(key=lambda entity: names.index(entity["name"]))
+
+        context, metadata = format_graph_evidence(relations, entities, max_evidence)
+        logger.info(f"Graph context from {len(names)} linked entities, {len(relations)} relations and {len(metadata)} passages")
+
+        return (context, metadata)
+    except Exception as e:
+        logger.error(f"Error: {e}")
+        return ("", [])
 
 def question_to_graphdb(question: str, llm: ChatOpenAI | ChatOllama | ChatGoogleGenerativeAI, logger: logging.Logger, mode: str) -> str:
+    if mode == "fast":
+        logger.info("Using entity linking for graph retrieval due to fast mode")
+        return question_to_graphdb_with_entity_linking(question, logger)
+
+    graphstore = get_graphstore()
+    if not graphstore.supports_cypher:
+        logger.info("Using entity linking for graph retrieval, the graph backend does not support Cypher")
+        return question_to_graphdb_with_entity_linking(question, logger)
+
     try:
-        with graphstore.session() as session:
-            schema = session.run("""
+        connection = graphstore.connection
+
+        # the schema and sample queries are independent, so they share one round trip to the pool
+        schema, samples, sample_names, sample_relationships, properties, excerpt = connection.read_many([
+            """
                 CALL db.schema.visualization()
                 YIELD nodes, relationships
                 RETURN nodes, relationships
-            """).single()
-
-            samples = session.run("""
+            """,
+            """
                 MATCH (entity)
                 WITH labels(entity) as labels, count(entity) as count
                 RETURN labels, count
                 LIMIT 150
-            """).data()
-
-            sample_names = session.run("""
+            """,
+            """
                 MATCH (entity)
                 RETURN entity.name
                 LIMIT 500
-            """).data()
-
-            sample_relationships = session.run("""
+            """,
+            """
                 MATCH (entity)-[r]->(other)
                 RETURN type(r), count(r)
                 LIMIT 150
-            """).data()
-
-            properties = session.run("""
+            """,
+            """
                 MATCH (entity)
                 RETURN properties(entity)
                 LIMIT 10
-            """).data()
-
-            excerpt = session.run("""
+            """,
+            """
                 MATCH (entity)
                 RETURN entity
                 LIMIT 3000
-            """).data()
-
-            prompt = f"""
-            MOST IMPORTANT: MAKE THE CYPHER QUERY WORK WITH THE GRAPH. NO MATTER WHAT, RETURN A WORKING QUERY.
-            ONLY USE THE name AND text ATTRIBUTES TO ACTIVELY QUERY ENTITIES. ONLY USE KOWN LINKS BETWEEN NODES.
-            You can also use the contains method on the text attribute of nodes.
-
-            Given the following Neo4j graph structure:
-
-            =================================
-            Node types and counts: {samples}
-            Schema: {schema}
-            Sample entity names: {sample_names}
-            Sample relationships: {sample_relationships}
-            These are the properties of the nodes: {properties}
-            Excerpt of the graph: {excerpt}
-            =================================
-
-            Convert this question to a Cypher query that will answer it:
-            {question}
-            The query might need to be converted completely, use the information you know about the graph to try and answer the question.
-            Do not try to convert the question 1:1 to a Cypher query, try to obtain insights from the graph.
-
-            Return only the Cypher query, no explanation. No Markdown. No code blocks.
-            The result of the query will be used to answer the question.
-            The cypher query should try to obtain insights from the graph.
-            Keep it simple, priority is that the query is correct and works.
-
-            The query should return relevant entities.
             """
+        ])
+        schema = schema[0] if schema else {}
 
-            cypher_query = llm.invoke(prompt)
+        prompt = f"""
+        MOST IMPORTANT: MAKE THE CYPHER QUERY WORK WITH THE GRAPH. NO MATTER WHAT, RETURN A WORKING QUERY.
+        ONLY USE THE name AND text ATTRIBUTES TO ACTIVELY QUERY ENTITIES. ONLY USE KOWN LINKS BETWEEN NODES.
+        You can also use the contains method on the text attribute of nodes.
 
-            cypher_query_content = cypher_query.content
+        Given the following Neo4j graph structure:
 
-            logger.info(f"Cypher query: {cypher_query_content}")
+        =================================
+        Node types and counts: {samples}
+        Schema: {schema}
+        Sample entity names: {sample_names}
+        Sample relationships: {sample_relationships}
+        These are the properties of the nodes: {properties}
+        Excerpt of the graph: {excerpt}
+        =================================
 
-            result = session.run(cypher_query_content)
-            data = result.data()
+        Convert this question to a Cypher query that will answer it:
+        {question}
+        The query might need to be converted completely, use the information you know about the graph to try and answer the question.
+        Do not try to convert the question 1:1 to a Cypher query, try to obtain insights from the graph.
 
-            metadata = []
+        Return only the Cypher query, no explanation. No Markdown. No code blocks.
+        The result of the query will be used to answer the question.
+        The cypher query should try to obtain insights from the graph.
+        Keep it simple, priority is that the query is correct and works.
 
-            logger.info(f"Result: {data}")
+        The query should return relevant entities.
+        """
 
-            if mode == "fast":
-                return (str(data), metadata)
+        cypher_query = llm.invoke(prompt)
 
-            answer_prompt = f"""
-            The following is the result of a Cypher query: {data}
-            Answer the question: {question}
+        cypher_query_content = cypher_query.content
 
-            This was the Cypher query used to generate the result: {cypher_query_content}
+        logger.info(f"Cypher query: {cypher_query_content}")
 
-            Use only the provided information to answer the question. Do not use quotations.
-            The answer is the result of a query generated by the same question, so assume the result is relevant.
-            If you do not know the answer, mention the missing context.
-            Make the sentence feel human. Add pronouns and other natural language elements if needed.
+        data = connection.read(cypher_query_content)
 
-            DO NOT MENTION ANYTHING ABOUT THE QUERY OR THE GRAPH. JUST TRY TO ANSWER THE QUESTION.
-            DO NOT MENTION NODES OR DATA. DO NOT MAKE GUESSES. DO NOT MAKE ASSUMPTIONS.
-            IF YOU DO NOT KNOW THE ANSWER, JUST ADMIT IT.
-            BE CONCISE.
-            """
+        metadata = []
+
+        logger.info(f"Result: {data}")
+
+        answer_prompt = f"""
+        The following is the result of a Cypher query: {data}
+        Answer the question: {question}
+
+        This was the Cypher query used to generate the result: {cypher_query_content}
+
+        Use only the provided information to answer the question. Do not use quotations.
+        The answer is the result of a query generated by the same question, so assume the result is relevant.
+        If you do not know the answer, mention the missing context.
+        Make the sentence feel human. Add pronouns and other natural language elements if needed.
+
+        DO NOT MENTION ANYTHING ABOUT THE QUERY OR THE GRAPH. JUST TRY TO ANSWER THE QUESTION.
+        DO NOT MENTION NODES OR DATA. DO NOT MAKE GUESSES. DO NOT MAKE ASSUMPTIONS.
+        IF YOU DO NOT KNOW THE ANSWER, JUST ADMIT IT.
+        BE CONCISE.
+        """
 
-            answer = llm.invoke(answer_prompt)
-            answer_text = answer.content
+        answer = llm.invoke(answer_prompt)
+        answer_text = answer.content
 
-            logger.info(f"Answer to the neo4j question: {answer_text}")
+        logger.info(f"Answer to the neo4j question: {answer_text}")
 
-            return (answer_text, metadata)
+        return (answer_text, metadata)
     except Exception as e:
         logger.error(f"Error: {e}")
         return ("", [])
 
 if __name__ == "__main__":
     #print(get_full_graph_information())
-    llm = ChatOllama(model="llama3.2")
+    llm = ChatOllama(model="llama3.2", base_url=get_ollama_host())
     #llm = ChatOpenAI(model="gpt-4o")
 
     logger = logging.getLogger(__name__)
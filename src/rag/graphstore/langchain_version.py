@@ -8,6 +8,7 @@ from dotenv import load_dotenv
 import os
 
 from ..constants.env import NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD
+from src.providers.providers import get_ollama_host
 
 def mock_load_text_to_graphdb(file_path: str) -> None:
     # load and preprocess text data
@@ -39,7 +40,7 @@ def ask_question_to_graphdb(question: str) -> str:
         password=NEO4J_PASSWORD,
     )
 
-    llm = ChatOllama(model="llama3.2")
+    llm = ChatOllama(model="llama3.2", base_url=get_ollama_host())
     #llm = ChatOpenAI(model="gpt-4o")
     qa_chain = GraphCypherQAChain.from_llm(
         llm=llm,
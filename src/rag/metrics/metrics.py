@@ -0,0 +1,44 @@
+import time
+from contextlib import contextmanager
+
+
+class RequestMetrics:
+    """
+    Collects stage timings, decisions and skipped stages of a single RAG request
+
+    Example:
+        metrics = RequestMetrics()
+        with metrics.timer("retrieval"):
+            ...
+        metrics.skip("graph", "strong vector evidence")
+        logger.info(f"Request metrics: {metrics.as_dict()}")
+    """
+
+    def __init__(self):
+        self.timings = {}
+        self.decisions = {}
+        self.skipped = []
+
+    @contextmanager
+    def timer(self, stage: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[stage] = self.timings.get(stage, 0.0) + (time.perf_counter() - start)
+
+    def record(self, key: str, value):
+        self.decisions[key] = value
+
+    def skip(self, stage: str, reason: str):
+        self.skipped.append({"stage": stage, "reason": reason})
+
+    def was_skipped(self, stage: str) -> bool:
+        return any(skipped["stage"] == stage for skipped in self.skipped)
+
+    def as_dict(self) -> dict:
+        return {
+            "timings_ms": {stage: round(seconds * 1000, 2) for stage, seconds in self.timings.items()},
+            "decisions": self.decisions,
+            "skipped": self.skipped
+        }
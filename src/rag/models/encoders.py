@@ -0,0 +1,28 @@
+"""
+Process-wide sentence-transformers models
+
+sentence_transformers imports torch, so it is only imported when the first model is needed. Every model is loaded
+once per process and shared by all requests, /warmup loads them before the first request.
+"""
+
+from functools import lru_cache
+
+
+@lru_cache(maxsize=None)
+def get_sentence_transformer(model_name: str):
+    """
+    Embedding model, loaded on the first call
+
+    Example:
+        get_sentence_transformer("sentence-transformers/all-MiniLM-L6-v2").encode("What is a transformer?")
+    """
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(model_name)
+
+
+@lru_cache(maxsize=None)
+def get_cross_encoder(model_name: str):
+    """Cross-encoder used for reranking, loaded on the first call"""
+    from sentence_transformers import CrossEncoder
+    return CrossEncoder(model_name)
+
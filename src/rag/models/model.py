@@ -1,9 +1,11 @@
 from typing import List
 import requests
 from openai import OpenAI
-import google.generativeai as gemini
+import google.generativeai as genai
 
-from ..constants.env import GEMINI_API_KEY, OPENAI_API_KEY, DEEPSEEK_API_KEY
+from ..constants.env import GEMINI_API_KEY, OPENAI_API_KEY, DEEPSEEK_API_KEY, SIMULATED_LLM
+from .simulated import SIMULATED_MODEL_ID
+from src.providers.providers import get_ollama_host, configure_gemini
 
 ollama_cache = []
 openai_cache = []
@@ -11,7 +13,10 @@ gemini_cache = []
 deepseek_cache = []
 
 def get_available_models():
-    return get_local_ollama_models() + get_openai_models() + get_gemini_models() + get_deepseek_models()
+    return get_simulated_models() + get_local_ollama_models() + get_openai_models() + get_gemini_models() + get_deepseek_models()
+
+def get_simulated_models() -> List[str]:
+    return [SIMULATED_MODEL_ID] if SIMULATED_LLM else []
 
 def get_local_ollama_models() -> List[str]:
     """
@@ -29,7 +34,7 @@ def get_local_ollama_models() -> List[str]:
         return ollama_cache
     
     try:
-        response = requests.get("http://localhost:11434/api/tags")
+        response = requests.get(f"{get_ollama_host()}/api/tags")
         if response.status_code == 200:
             ollama_cache = [model["name"].replace(":latest", "") for model in response.json()["models"]]
             return ollama_cache
@@ -38,6 +43,19 @@ def get_local_ollama_models() -> List[str]:
         print(f"Error getting local ollama models: {e}")
         return []
     
+def preload_ollama_model(model_id: str) -> bool:
+    """
+    Load a local Ollama model into memory, so the first answer does not wait for it
+
+    Returns:
+        bool: False if the model is not served by Ollama
+    """
+    if model_id not in get_local_ollama_models():
+        return False
+    # A request without prompt only loads the model
+    requests.post(f"{get_ollama_host()}/api/generate", json={"model": model_id}, timeout=300).raise_for_status()
+    return True
+
 def get_openai_models() -> List[str]:
     global openai_cache
 
@@ -59,8 +77,8 @@ def get_gemini_models() -> List[str]:
         return gemini_cache
 
     try:
-        gemini.configure(api_key=GEMINI_API_KEY)
-        gemini_cache = [model.name.replace("models/", "") for model in gemini.list_models()]
+        configure_gemini(GEMINI_API_KEY)
+        gemini_cache = [model.name.replace("models/", "") for model in genai.list_models()]
         return gemini_cache
     except Exception as e:
         print(f"Error getting Gemini models: {e}")
@@ -0,0 +1,63 @@
+import hashlib
+import random
+import time
+from typing import Any, Iterator, List, Optional
+
+from langchain_core.callbacks import CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+SIMULATED_MODEL_ID = "simulated"
+
+VOCABULARY = (
+    "the model learns patterns from data and uses them to make predictions about new inputs while the video "
+    "explains how training works why more data helps and where the limits of the approach are in practice"
+).split()
+
+
+class SimulatedChatModel(BaseChatModel):
+    """
+    Deterministic stand-in for a chat model, used for load tests without any model provider
+
+    The answer only depends on the prompt. It starts after `time_to_first_token` seconds and is streamed with
+    `tokens_per_second` tokens (words) per second, so the timing of a real provider can be reproduced.
+
+    Example:
+        llm = SimulatedChatModel(time_to_first_token=0.3, tokens_per_second=40)
+        llm.invoke("What is machine learning?").content
+    """
+
+    time_to_first_token: float = 0.3
+    tokens_per_second: float = 50.0
+    max_tokens: int = 200
+
+    @property
+    def _llm_type(self) -> str:
+        return "simulated"
+
+    def _tokens(self, messages: List[BaseMessage]) -> List[str]:
+        prompt = "\n".join(str(message.content) for message in messages)
+        generator = random.Random(hashlib.sha256(prompt.encode("utf-8")).digest())
+        length = generator.randint(max(1, self.max_tokens // 2), self.max_tokens)
+        return [generator.choice(VOCABULARY) for _ in range(length)]
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        tokens = self._tokens(messages)
+        time.sleep(self.time_to_first_token + len(tokens) / self.tokens_per_second)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=" ".join(tokens)))])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        tokens = self._tokens(messages)
+        # Tokens are emitted on a fixed schedule, slow consumers don't shift the later tokens
+        start = time.perf_counter() + self.time_to_first_token
+        for index, token in enumerate(tokens):
+            delay = start + index / self.tokens_per_second - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token if index == 0 else " " + token))
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
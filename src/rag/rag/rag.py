@@ -1,24 +1,30 @@
 import json
 import logging
 from langchain_core.prompts import PromptTemplate
-from langchain_chroma import Chroma
-from langchain_ollama import ChatOllama, OllamaEmbeddings
+from langchain_ollama import ChatOllama
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.runnables import RunnablePassthrough
-from langchain_openai import OpenAI, ChatOpenAI
+from langchain_openai import ChatOpenAI
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_openai.chat_models.base import BaseChatOpenAI
 
 from ..routing.semantic_routing import get_base_template, semantic_routing
-from ..rerankers.rerankers import rerank_passages_with_cross_encoder
+from ..rerankers.rerankers import score_passages_with_cross_encoder, diversify_passages_with_mmr
 from ..vectorstore.vectorstore import format_docs, retrieve_top_n_documents_chromadb, transform_string_list_to_string, \
-    generate_vector_filter
+    generate_vector_filter, UnknownPlaylistError
 from ..routing.logical_routing import route_query
 from ..logger.logger import setup_logger
-from ..constants.config import VECTORSTORE_TOP_K, RERANKING_TOP_K, DEFAULT_KNOWLEDGE_BASE, INCLUDE_IMAGE_DESCRIPTIONS
-from ..constants.env import GEMINI_API_KEY, OPENAI_API_KEY, DEEPSEEK_API_KEY
-from ..models.model import get_local_ollama_models, get_openai_models, get_gemini_models, get_available_models, get_deepseek_models
+from ..constants.config import VECTORSTORE_TOP_K, RERANKING_TOP_K, DEFAULT_KNOWLEDGE_BASE, INCLUDE_IMAGE_DESCRIPTIONS, \
+    USE_MMR, MMR_LAMBDA, MMR_TOP_K
+from ..constants.env import GEMINI_API_KEY, OPENAI_API_KEY, DEEPSEEK_API_KEY, SIMULATED_LLM_TTFT_MS, \
+    SIMULATED_LLM_TOKENS_PER_SECOND, SIMULATED_LLM_MAX_TOKENS
+from ..models.model import get_local_ollama_models, get_openai_models, get_gemini_models, get_available_models, get_deepseek_models, \
+    get_simulated_models
+from ..models.simulated import SimulatedChatModel
 from ..graphstore.graphstore import question_to_graphdb
+from ..gating.gating import should_skip_reranking, should_skip_graph
+from ..metrics.metrics import RequestMetrics
+from src.providers.providers import get_ollama_host, get_gemini_chat_options
 
 
 def contextualize_and_improve_query(question: str, llm: ChatOllama | ChatOpenAI | ChatGoogleGenerativeAI,
@@ -72,81 +78,99 @@ def contextualize_and_improve_query(question: str, llm: ChatOllama | ChatOpenAI
 
 
 def get_vector_context(question: str, subject: str, logger: logging.Logger, mode: str, vectorstore_top_k: int = 25,
-                       reranker_top_k: int = 5, filter: dict | None = None):
-    vector_context = retrieve_top_n_documents_chromadb(
-        question=question,
-        subject=subject,
-        logger=logger,
-        top_k=vectorstore_top_k,
-        filter=filter
-    )
+                       reranker_top_k: int = 5, filter: dict | None = None, metrics: RequestMetrics | None = None):
+    if metrics is None:
+        metrics = RequestMetrics()
+
+    use_mmr = USE_MMR and mode != "fast"
+
+    with metrics.timer("retrieval"):
+        vector_context = retrieve_top_n_documents_chromadb(
+            question=question,
+            subject=subject,
+            logger=logger,
+            top_k=vectorstore_top_k,
+            filter=filter,
+            metrics=metrics,
+            include_embeddings=use_mmr
+        )
 
     if mode == "fast":
         logger.info("Returning vector context without reranking due to fast mode")
+        metrics.skip("reranking", "fast mode")
         return vector_context
 
-    passages = [doc["document"] for doc in vector_context]
-
-    if len(passages) == 0:
+    if len(vector_context) == 0:
         logger.warning("No passages found in vector context")
         return []
 
-    reranked_passages = rerank_passages_with_cross_encoder(
-        question=question,
-        passages=passages,
-        logger=logger,
-        top_k=reranker_top_k
-    )
+    if should_skip_reranking(vector_context, reranker_top_k, logger, metrics):
+        return vector_context[:reranker_top_k]
+
+    # drop near-duplicate passages (chunk overlap, repeated explanations) before the cross-encoder
+    if use_mmr and len(vector_context) > MMR_TOP_K:
+        with metrics.timer("mmr"):
+            selected = diversify_passages_with_mmr(
+                relevance=[doc["similarity"] for doc in vector_context],
+                embeddings=[doc["embedding"] for doc in vector_context],
+                logger=logger,
+                top_k=MMR_TOP_K,
+                lambda_mult=MMR_LAMBDA
+            )
+        metrics.record("mmr_passages", len(selected))
+        vector_context = [vector_context[i] for i in selected]
 
-    # add metadata for reranked passage from original vector_context
-    reranked_context = [next(orig_doc for orig_doc in vector_context if orig_doc["document"] == reranked_passage) for
-                        reranked_passage in reranked_passages]
+    passages = [doc["document"] for doc in vector_context]
 
-    return reranked_context
+    with metrics.timer("reranking"):
+        rerank_scores = score_passages_with_cross_encoder(
+            question=question,
+            passages=passages,
+            logger=logger
+        )
 
+    # keep the metadata of the original vector_context next to the rerank score
+    reranked_context = [
+        {**doc, "rerank_score": score}
+        for score, doc in sorted(zip(rerank_scores, vector_context), key=lambda pair: pair[0], reverse=True)
+    ]
+
+    return reranked_context[:reranker_top_k]
 
-def rag(
-        question: str,
-        model_id: str,
-        model_parameters: dict,
-        logger: logging.Logger | None = None,
-        message_history: list[dict] = None,
-        use_logical_routing: bool = False,
-        knowledge_base: str | None = None,
-        video_id: str | None = None,
-        playlist_id: str | None = None,
-        use_semantic_routing: bool = False,
-        plaintext: bool = False,
-        database: str = "all",
-        mode: str = "fast"
-):
-    if logger is None:
-        logger = setup_logger()
 
-    if model_id in get_local_ollama_models():
-        llm = ChatOllama(
+def get_llm(model_id: str, model_parameters: dict) -> ChatOllama | ChatOpenAI | ChatGoogleGenerativeAI | BaseChatOpenAI | SimulatedChatModel:
+    if model_id in get_simulated_models():
+        return SimulatedChatModel(
+            time_to_first_token=SIMULATED_LLM_TTFT_MS / 1000,
+            tokens_per_second=SIMULATED_LLM_TOKENS_PER_SECOND,
+            max_tokens=SIMULATED_LLM_MAX_TOKENS
+        )
+    elif model_id in get_local_ollama_models():
+        return ChatOllama(
             model=model_id,
+            base_url=get_ollama_host(),
             temperature=model_parameters["temperature"],
             top_p=model_parameters["top_p"],
             top_k=model_parameters["top_k"]
         )
     elif model_id in get_openai_models():
-        llm = ChatOpenAI(
+        return ChatOpenAI(
             model=model_id,
             temperature=model_parameters["temperature"],
             top_p=model_parameters["top_p"],
             api_key=OPENAI_API_KEY
         )
     elif model_id in get_gemini_models():
-        llm = ChatGoogleGenerativeAI(
+        return ChatGoogleGenerativeAI(
             model=model_id,
             temperature=model_parameters["temperature"],
             top_p=model_parameters["top_p"],
             top_k=model_parameters["top_k"],
-            api_key=GEMINI_API_KEY
+            api_key=GEMINI_API_KEY,
+            **get_gemini_chat_options()
         )
     elif model_id in get_deepseek_models():
-        llm = BaseChatOpenAI(
+        return BaseChatOpenAI(
             model=model_id,
             openai_api_key=DEEPSEEK_API_KEY,
             openai_api_base='https://api.deepseek.com',
@@ -156,6 +180,31 @@ def rag(
     else:
         raise ValueError(f"Invalid model ID: {model_id}. Available models: {get_available_models()}")
 
+
+def rag(
+        question: str,
+        model_id: str,
+        model_parameters: dict,
+        logger: logging.Logger | None = None,
+        message_history: list[dict] = None,
+        use_logical_routing: bool = False,
+        knowledge_base: str | None = None,
+        video_id: str | None = None,
+        playlist_id: str | None = None,
+        use_semantic_routing: bool = False,
+        plaintext: bool = False,
+        database: str = "all",
+        mode: str = "fast",
+        metrics: RequestMetrics | None = None
+):
+    if logger is None:
+        logger = setup_logger()
+
+    if metrics is None:
+        metrics = RequestMetrics()
+
+    llm = get_llm(model_id, model_parameters)
+
     if mode != "fast":
         logger.info("Improving question, since mode is not fast")
         improved_question = contextualize_and_improve_query(question, llm, logger, message_history)
@@ -178,9 +227,15 @@ def rag(
     if database == "vector" or database == "all":
         subject = route_query(question, llm, logger) if (use_logical_routing and knowledge_base is None) else knowledge_base
         logger.info(f"Using subject: {subject}, use_logical_routing={use_logical_routing}")
-        vector_filter = generate_vector_filter(logger, video_id, playlist_id, INCLUDE_IMAGE_DESCRIPTIONS)
+        try:
+            vector_filter = generate_vector_filter(logger, video_id, playlist_id, INCLUDE_IMAGE_DESCRIPTIONS)
+        except UnknownPlaylistError as e:
+            # Keep the scope of the question instead of answering from all videos
+            answer = f"No videos are known for the playlist {e.playlist_id}, so the question can not be answered from it."
+            yield answer if plaintext else json.dumps({"content": answer, "sources": []})
+            return
         vector_context = get_vector_context(question, subject, logger, mode, VECTORSTORE_TOP_K, RERANKING_TOP_K,
-                                            vector_filter)
+                                            vector_filter, metrics)
 
         vector_context_text = "\n".join([doc["document"] for doc in vector_context])
         vector_context_metadata = [doc["metadata"] for doc in vector_context]
@@ -188,8 +243,9 @@ def rag(
     graph_context = ""
     graph_context_metadata = []
 
-    if database == "graph" or database == "all":
-        graph_context, graph_context_metadata = question_to_graphdb(question, llm, logger, mode)
+    if database == "graph" or (database == "all" and not should_skip_graph(vector_context, logger, metrics)):
+        with metrics.timer("graph"):
+            graph_context, graph_context_metadata = question_to_graphdb(question, llm, logger, mode)
 
     context = f"""
         {vector_context_text}
@@ -212,9 +268,13 @@ def rag(
     vector_sources = [f"https://youtu.be/{metadata['video_id']}?t={metadata['time']}s" for metadata in vector_context_metadata]
     graph_sources = [f"https://youtu.be/{metadata['video_id']}?t={metadata['time']}s" for metadata in graph_context_metadata]
 
-    if plaintext:
-        for chunk in rag_chain.stream({"context": context, "question": question}):
-            yield chunk
-    else:
-        for chunk in rag_chain.stream({"context": context, "question": question}):
-            yield json.dumps({"content": chunk, "sources": vector_sources + graph_sources})
+    with metrics.timer("generation"):
+        if plaintext:
+            for chunk in rag_chain.stream({"context": context, "question": question}):
+                yield chunk
+        else:
+            for chunk in rag_chain.stream({"context": context, "question": question}):
+                yield json.dumps({"content": chunk, "sources": vector_sources + graph_sources})
+
+    logger.info(f"Request metrics: {metrics.as_dict()}")
+
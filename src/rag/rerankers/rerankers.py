@@ -1,13 +1,68 @@
 import logging
 from typing import List
-from sentence_transformers import CrossEncoder, SentenceTransformer
-from llama_index.retrievers.bm25 import BM25Retriever
-from llama_index.core import Document
-import Stemmer
-from torch import cosine_similarity
+import numpy as np
 
-from ..vectorstore.legacy.vectorstore import query_vectordb
 from ..constants.config import RERANKING_CROSS_ENCODER_MODEL
+from ..models.encoders import get_cross_encoder, get_sentence_transformer
+
+def score_passages_with_cross_encoder(question: str, passages: List[str], logger: logging.Logger) -> List[float]:
+    """
+    Score passages using cross-encoder model for semantic similarity scoring
+   
+    Args:
+        question: Question to search for
+        passages: List of passages to score
+   
+    Returns:
+        List of relevance scores in the order of the passages
+    """
+    logger.info(f"Scoring passages with cross encoding, model: {RERANKING_CROSS_ENCODER_MODEL}")
+    cross_encoder_model = get_cross_encoder(RERANKING_CROSS_ENCODER_MODEL)
+    sentence_pairs = [(question, passage) for passage in passages]
+    return [float(score) for score in cross_encoder_model.predict(sentence_pairs)]
+
+def diversify_passages_with_mmr(relevance: List[float], embeddings: List[List[float]], logger: logging.Logger,
+                                top_k: int = 20, lambda_mult: float = 0.7) -> List[int]:
+    """
+    Select diverse passages with Maximal Marginal Relevance (MMR)
+
+    Each step picks the passage maximizing lambda * relevance - (1 - lambda) * max similarity to the already
+    selected passages. The pairwise similarities are computed once as a matrix product over the normalized embeddings.
+
+    Args:
+        relevance: Similarity of each passage to the question
+        embeddings: Embedding of each passage
+        top_k: Number of passages to select
+        lambda_mult: Trade-off between relevance (1.0) and diversity (0.0)
+
+    Returns:
+        List of indices of the selected passages in selection order
+    """
+    relevance = np.asarray(relevance, dtype=np.float32)
+    top_k = min(top_k, len(relevance))
+    if top_k == 0:
+        return []
+
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    embeddings = embeddings / np.where(norms == 0, 1, norms)
+    pairwise_similarity = embeddings @ embeddings.T
+
+    selected = [int(np.argmax(relevance))]
+    max_similarity_to_selected = pairwise_similarity[selected[0]].copy()
+    available = np.ones(len(relevance), dtype=bool)
+    available[selected[0]] = False
+
+    while len(selected) < top_k:
+        scores = lambda_mult * relevance - (1 - lambda_mult) * max_similarity_to_selected
+        scores[~available] = -np.inf
+        index = int(np.argmax(scores))
+        selected.append(index)
+        available[index] = False
+        np.maximum(max_similarity_to_selected, pairwise_similarity[index], out=max_similarity_to_selected)
+
+    logger.info(f"Selected {len(selected)} of {len(relevance)} passages with MMR, lambda: {lambda_mult}")
+    return selected
 
 def rerank_passages_with_cross_encoder(question: str, passages: List[str], logger: logging.Logger, top_k: int = 3) -> List[str]:
     """
@@ -21,11 +76,8 @@ def rerank_passages_with_cross_encoder(question: str, passages: List[str], logge
     Returns:
         List of reranked passages sorted by semantic similarity to question
     """
-    logger.info(f"Reranking passages with cross encoding, model: {RERANKING_CROSS_ENCODER_MODEL}")
     logger.info(f"Using top_k: {top_k} for reranking with {len(passages)} passages")
-    cross_encoder_model = CrossEncoder(RERANKING_CROSS_ENCODER_MODEL)
-    sentence_pairs = [(question, passage) for passage in passages]
-    similarity_scores = cross_encoder_model.predict(sentence_pairs)
+    similarity_scores = score_passages_with_cross_encoder(question, passages, logger)
     ranked_passages = [p for _, p in sorted(zip(similarity_scores, passages), reverse=True)]
     logger.info(f"Reranked passages.")
     return ranked_passages[:top_k]
@@ -43,6 +95,11 @@ def rerank_passages_with_bm25(question: str, passages: List[str], top_k: int = 3
     Returns:
         List of reranked passages sorted by BM25 relevance score
     """
+    # LlamaIndex is only needed by this reranker, it is not imported with the chat path
+    from llama_index.retrievers.bm25 import BM25Retriever
+    from llama_index.core import Document
+    import Stemmer
+
     documents = [Document(text=passage) for passage in passages]
     bm25_retriever = BM25Retriever.from_defaults(
         nodes=documents,
@@ -64,7 +121,9 @@ def rerank_passages_with_cosine(question: str, passages: List[str], top_k: int =
     Returns:
         List of reranked passages sorted by cosine similarity score
     """
-    model = SentenceTransformer('sentence-transformers/all-MiniLM-L6-v2')
+    from torch import cosine_similarity
+
+    model = get_sentence_transformer('sentence-transformers/all-MiniLM-L6-v2')
    
     question_embedding = model.encode([question])
     passage_embeddings = model.encode(passages)
@@ -74,6 +133,8 @@ def rerank_passages_with_cosine(question: str, passages: List[str], top_k: int =
     return ranked_passages[:top_k]
 
 def __test__reranking():
+    from ..vectorstore.legacy.vectorstore import query_vectordb
+
     passages = query_vectordb("Why did allice fall down the rabbit hole?")
     print("\nRelevant passages about Alice:")
     for r in passages:
@@ -4,18 +4,19 @@ from langchain_openai import ChatOpenAI
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.prompts import ChatPromptTemplate
 
-from .routes import SUBJECTS, RouteQuery
+from .routes import get_subjects, get_route_query_model
 from ..constants.config import DEFAULT_KNOWLEDGE_BASE
 
 def route_query(query: str, llm: ChatOllama | ChatOpenAI | ChatGoogleGenerativeAI, logger: logging.Logger, message_history: list[dict] = None) -> str:
+    subjects = get_subjects()
     system = f"""
     You are an expert at determining the subject of a user question.
-    Possible subjects are: {", ".join(SUBJECTS)}
+    Possible subjects are: {", ".join(subjects)}
     If you are not sure, return "other".
     Based on the conversation history and last user question, determine which subject is most relevant, return only the name of the subject.
     """
 
-    logger.info(f"Logical routing with possible subjects: {SUBJECTS}")
+    logger.info(f"Logical routing with possible subjects: {list(subjects)}")
 
     messages = [("system", system)]
     
@@ -28,7 +29,7 @@ def route_query(query: str, llm: ChatOllama | ChatOpenAI | ChatGoogleGenerativeA
 
     prompt = ChatPromptTemplate.from_messages(messages)
 
-    structured_llm = llm.with_structured_output(RouteQuery)
+    structured_llm = llm.with_structured_output(get_route_query_model())
 
     router = prompt | structured_llm
     try:
@@ -1,26 +1,37 @@
+from functools import lru_cache
 from typing import Literal
 from pydantic import BaseModel, Field, field_validator
 
 from ..vectorstore.vectorstore import get_vector_collections
 from ..constants.config import DEFAULT_KNOWLEDGE_BASE
 
-collections = get_vector_collections()
 
-if len(collections) == 0:
-    SUBJECTS = [DEFAULT_KNOWLEDGE_BASE]
-else:
-    SUBJECTS = collections
+@lru_cache(maxsize=1)
+def get_subjects() -> tuple[str, ...]:
+    """Subjects for the logical routing, the vector collections are listed on the first call instead of at import"""
+    collections = get_vector_collections()
 
-class RouteQuery(BaseModel):
-    """Detect the subject of the query"""
+    if len(collections) == 0:
+        return (DEFAULT_KNOWLEDGE_BASE,)
+    return tuple(collections)
 
-    subject: Literal[*SUBJECTS] = Field( # type: ignore
-        ...,
-        description="Given a user question, determine the subject of the question"
-    )
 
-    @field_validator('subject')
-    def validate_subject(cls, v):
-        if v not in SUBJECTS:
-            raise ValueError(f"Subject must be one of {SUBJECTS}")
-        return v
\ No newline at end of file
+@lru_cache(maxsize=1)
+def get_route_query_model() -> type[BaseModel]:
+    subjects = get_subjects()
+
+    class RouteQuery(BaseModel):
+        """Detect the subject of the query"""
+
+        subject: Literal[*subjects] = Field( # type: ignore
+            ...,
+            description="Given a user question, determine the subject of the question"
+        )
+
+        @field_validator('subject')
+        def validate_subject(cls, v):
+            if v not in subjects:
+                raise ValueError(f"Subject must be one of {list(subjects)}")
+            return v
+
+    return RouteQuery
@@ -1,6 +1,7 @@
 from langchain_ollama import OllamaEmbeddings
 from langchain.utils.math import cosine_similarity
 from langchain_core.prompts import PromptTemplate
+from src.providers.providers import get_ollama_host
 
 basic_template = """
     You are an AI assistant tasked with answering questions using retrieved context. 
@@ -64,7 +65,7 @@ fallback_template = """
 """
 
 def semantic_routing(question: str) -> str:
-    embeddings = OllamaEmbeddings(model="nomic-embed-text")
+    embeddings = OllamaEmbeddings(model="nomic-embed-text", base_url=get_ollama_host())
 
     prompt_templates = [physics_template, math_template, fallback_template]
     prompt_embeddings = embeddings.embed_documents(prompt_templates)
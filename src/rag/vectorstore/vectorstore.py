@@ -1,18 +1,27 @@
 import logging
 import os
+from collections import Counter
 from typing import List
-from langchain_chroma import Chroma
-from langchain_ollama import OllamaEmbeddings
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from llama_index.core import Document
+import numpy as np
+from langchain_core.documents import Document
 import chromadb
-from sentence_transformers import SentenceTransformer
 
 from ..rerankers.rerankers import rerank_passages_with_cross_encoder
-from ..constants.config import RETRIEVAL_EMBEDDING_MODEL, DEFAULT_KNOWLEDGE_BASE
+from ..models.encoders import get_sentence_transformer
+from ..constants.config import RETRIEVAL_EMBEDDING_MODEL, DEFAULT_KNOWLEDGE_BASE, VECTOR_BACKEND, \
+    VECTOR_PLANNER_ENABLED, VECTOR_PLANNER_EXACT_MAX_CANDIDATES
+from ..metrics.metrics import RequestMetrics
+
+from src.vectordb.flat_store import get_flat_store
+from src.vectordb.playlists import get_playlist_video_ids
+from src.providers.providers import get_ollama_host
 
 open_default_collection = None
 
+# Metadata columns with value counts for the selectivity estimate of the query planner
+STATISTICS_COLUMNS = ("video_id", "is_image_description")
+collection_statistics = {}
+
 def mock_load_text_to_vectordb_with_ollama_embeddings(database_path: str, file_path: str, collection_name: str) -> None:
     """
     Load text file into ChromaDB, splitting by paragraphs
@@ -22,7 +31,11 @@ def mock_load_text_to_vectordb_with_ollama_embeddings(database_path: str, file_p
         file_path: Path to text file
         collection_name: Name for ChromaDB collection
     """
-    embeddings = OllamaEmbeddings(model="nomic-embed-text")
+    from langchain_chroma import Chroma
+    from langchain_ollama import OllamaEmbeddings
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    embeddings = OllamaEmbeddings(model="nomic-embed-text", base_url=get_ollama_host())
     vectorstore = Chroma(
         persist_directory=database_path,
         embedding_function=embeddings,
@@ -66,11 +79,14 @@ def transform_string_list_to_string(docs: List[str]) -> str:
     return "\n\n".join(docs)
 
 def retrieve_top_n_documents_chromadb_mock(logger: logging.Logger, question: str, subject: str):
+    from langchain_chroma import Chroma
+    from langchain_ollama import OllamaEmbeddings
+
     EMBEDDING_MODEL_ID = "nomic-embed-text"
     VECTORSTORE_TOP_K = 25
     RERANKER_TOP_K = 5
 
-    embeddings = OllamaEmbeddings(model=EMBEDDING_MODEL_ID)
+    embeddings = OllamaEmbeddings(model=EMBEDDING_MODEL_ID, base_url=get_ollama_host())
     logger.info(f"Using embeddings model: {EMBEDDING_MODEL_ID}")
     vectorstore = Chroma(
         persist_directory=get_persistent_mock_chroma_db_directory(),
@@ -87,7 +103,16 @@ def retrieve_top_n_documents_chromadb_mock(logger: logging.Logger, question: str
         | transform_string_list_to_string
     )
 
-def tidy_vectorstore_results(results):
+def distance_to_similarity(distance: float, space: str = "l2") -> float:
+    """
+    Convert a Chroma distance into a similarity in [-1, 1].
+    The retrieval embeddings are normalized, so the squared l2 distance equals 2 - 2 * cosine similarity.
+    """
+    if space == "l2":
+        return 1 - distance / 2
+    return 1 - distance
+
+def tidy_vectorstore_results(results, space: str = "l2"):
     """
     Original:
     {
@@ -99,18 +124,37 @@ def tidy_vectorstore_results(results):
 
     Tidied:
     [
-        {document, metadata}
+        {document, metadata, similarity}
     ]
+
+    If the embeddings were included in the results, each document also has an "embedding" key.
     """
-    results = [
+    tidied = [
         {
             "document": doc,
-            "metadata": meta
-        } for doc, meta in zip(results["documents"][0], results["metadatas"][0])
+            "metadata": meta,
+            "similarity": distance_to_similarity(distance, space)
+        } for doc, meta, distance in zip(results["documents"][0], results["metadatas"][0], results["distances"][0])
     ]
-    return results
+    if results.get("embeddings") is not None:
+        for doc, embedding in zip(tidied, results["embeddings"][0]):
+            doc["embedding"] = embedding
+    return tidied
+
+class UnknownPlaylistError(Exception):
+    """Raised by generate_vector_filter for a playlist without any known videos."""
+
+    def __init__(self, playlist_id: str):
+        super().__init__(f"No videos known for playlist {playlist_id}.")
+        self.playlist_id = playlist_id
 
 def generate_vector_filter(logger: logging.Logger, video_id: str | None = None, playlist_id: str | None = None, include_image_descriptions: bool | None = None):
+    """
+    Chroma where filter for the scope of a question, None if it is not scoped.
+
+    Raises:
+        UnknownPlaylistError: No videos are known for the playlist_id.
+    """
     filters = []
 
     # If video_id is provided, use it for the filter, otherwise if playlist_id is provided, use it for the filter
@@ -118,8 +162,14 @@ def generate_vector_filter(logger: logging.Logger, video_id: str | None = None,
         logger.info(f"Using video_id: {video_id} for vector filter")
         filters.append({"video_id": video_id})
     elif playlist_id is not None:
-        logger.info(f"Using playlist_id: {playlist_id} for vector filter")
-        filters.append({"playlist_id": playlist_id})
+        # Playlists are many-to-many, so the membership is resolved to the video ids of the playlist
+        playlist_video_ids = get_playlist_video_ids(playlist_id)
+        if len(playlist_video_ids) == 0:
+            # Searching all videos instead would answer a question scoped to the playlist from other videos
+            logger.warning(f"No videos known for playlist_id: {playlist_id}.")
+            raise UnknownPlaylistError(playlist_id)
+        logger.info(f"Using playlist_id: {playlist_id} with {len(playlist_video_ids)} videos for vector filter")
+        filters.append({"video_id": {"$in": playlist_video_ids}})
 
     # Do not include image descriptions if explicitly set to False
     if include_image_descriptions is not None and include_image_descriptions == False:
@@ -136,10 +186,153 @@ def generate_vector_filter(logger: logging.Logger, video_id: str | None = None,
 
     return filter
 
-def retrieve_top_n_documents_chromadb(question: str, subject: str, logger: logging.Logger, top_k: int = 25, filter: dict | None = None):
+def get_collection_statistics(collection) -> dict:
+    """
+    Value counts of the STATISTICS_COLUMNS of a collection.
+    The statistics are cached per collection and recomputed when the number of documents changes.
+
+    Returns:
+        dict: {"total": number of documents, "values": {column: Counter of the values}}
+    """
+    total = collection.count()
+    cached = collection_statistics.get(collection.name)
+    if cached is not None and cached["total"] == total:
+        return cached
+
+    values = {column: Counter() for column in STATISTICS_COLUMNS}
+    offset = 0
+    while offset < total:
+        batch = collection.get(include=["metadatas"], limit=5000, offset=offset)
+        if len(batch["ids"]) == 0:
+            break
+        for meta in batch["metadatas"]:
+            for column in STATISTICS_COLUMNS:
+                values[column][(meta or {}).get(column)] += 1
+        offset += len(batch["ids"])
+
+    statistics = {"total": total, "values": values}
+    collection_statistics[collection.name] = statistics
+    return statistics
+
+def estimate_filter_selectivity(filter: dict | None, statistics: dict) -> float:
+    """
+    Estimate the share of documents matching a Chroma filter from the value counts.
+    Conditions combined with $and are assumed to be independent, conditions on columns without statistics match everything.
+    """
+    if not filter:
+        return 1.0
+    total = statistics["total"]
+    if total == 0:
+        return 0.0
+
+    selectivity = 1.0
+    for key, condition in filter.items():
+        if key == "$and":
+            for sub_filter in condition:
+                selectivity *= estimate_filter_selectivity(sub_filter, statistics)
+            continue
+        if key == "$or":
+            selectivity *= min(1.0, sum(estimate_filter_selectivity(sub_filter, statistics) for sub_filter in condition))
+            continue
+
+        counts = statistics["values"].get(key)
+        if counts is None:
+            continue
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        for operator, value in condition.items():
+            if operator == "$eq":
+                selectivity *= counts.get(value, 0) / total
+            elif operator == "$ne":
+                selectivity *= 1 - counts.get(value, 0) / total
+            elif operator == "$in":
+                selectivity *= sum(counts.get(item, 0) for item in value) / total
+            elif operator == "$nin":
+                selectivity *= 1 - sum(counts.get(item, 0) for item in value) / total
+
+    return selectivity
+
+def plan_vector_query(collection, filter: dict | None, logger: logging.Logger, metrics: RequestMetrics) -> str:
+    """
+    Choose between an exact scan over the filtered documents and the HNSW index.
+
+    A filter pinned to a video leaves a few hundred candidates, for which an exact scan is faster than walking the
+    global HNSW graph and never returns fewer than top_k results. Broad queries use HNSW.
+
+    Returns:
+        str: "exact" or "hnsw"
+    """
+    if not VECTOR_PLANNER_ENABLED or not filter:
+        metrics.record("vector_plan", {"plan": "hnsw"})
+        return "hnsw"
+
+    statistics = get_collection_statistics(collection)
+    estimated_candidates = round(estimate_filter_selectivity(filter, statistics) * statistics["total"])
+    plan = "exact" if estimated_candidates <= VECTOR_PLANNER_EXACT_MAX_CANDIDATES else "hnsw"
+
+    logger.info(f"Vector query plan: {plan} (estimated {estimated_candidates} of {statistics['total']} documents match the filter)")
+    metrics.record("vector_plan", {
+        "plan": plan,
+        "estimated_candidates": estimated_candidates,
+        "collection_size": statistics["total"]
+    })
+    return plan
+
+def exact_search_chromadb(collection, question_embedding: list[float], top_k: int, filter: dict | None, space: str = "l2",
+                          include_embeddings: bool = False):
+    """
+    Exact top_k search over the documents matching the filter.
+    Returns the result in the format of collection.query with distances of the collection's space.
+    """
+    rows = collection.get(where=filter, include=["embeddings", "documents", "metadatas"])
+    if len(rows["ids"]) == 0:
+        return {"ids": [[]], "documents": [[]], "metadatas": [[]], "distances": [[]], "embeddings": [[]]}
+
+    embeddings = np.asarray(rows["embeddings"], dtype=np.float32)
+    query = np.asarray(question_embedding, dtype=np.float32)
+
+    if space == "l2":
+        distances = ((embeddings - query) ** 2).sum(axis=1)
+    elif space == "cosine":
+        norms = np.linalg.norm(embeddings, axis=1) * np.linalg.norm(query)
+        distances = 1 - (embeddings @ query) / np.where(norms == 0, 1, norms)
+    else:
+        distances = 1 - embeddings @ query
+
+    top_k = min(top_k, len(distances))
+    top = np.argpartition(distances, top_k - 1)[:top_k]
+    top = top[np.argsort(distances[top])]
+
+    return {
+        "ids": [[rows["ids"][i] for i in top]],
+        "documents": [[rows["documents"][i] for i in top]],
+        "metadatas": [[rows["metadatas"][i] for i in top]],
+        "distances": [[float(distances[i]) for i in top]],
+        "embeddings": [embeddings[top]] if include_embeddings else None
+    }
+
+def retrieve_top_n_documents_chromadb(question: str, subject: str, logger: logging.Logger, top_k: int = 25, filter: dict | None = None,
+                                      metrics: RequestMetrics | None = None, include_embeddings: bool = False):
     global open_default_collection
 
+    if metrics is None:
+        metrics = RequestMetrics()
+
     logger.info(f"Using embeddings model: {RETRIEVAL_EMBEDDING_MODEL}")
+    with metrics.timer("embedding"):
+        model = get_sentence_transformer(RETRIEVAL_EMBEDDING_MODEL)
+        question_embedding = model.encode(question).tolist()
+
+    if VECTOR_BACKEND == "flat":
+        flat_store = get_flat_store(subject)
+        if flat_store is not None:
+            logger.info(f"Using flat vector store for collection {subject}")
+            metrics.record("vector_plan", {"plan": "flat"})
+            with metrics.timer("vector_search"):
+                result = flat_store.query(question_embedding, top_k, where=filter, include_embeddings=include_embeddings)
+            return tidy_vectorstore_results(result, "cosine")
+        logger.warning(f"No flat vector store exported for collection {subject}, using ChromaDB")
+
     client = chromadb.PersistentClient(path=get_persistent_chroma_db_directory())
 
     collections = client.list_collections()
@@ -155,17 +348,20 @@ def retrieve_top_n_documents_chromadb(question: str, subject: str, logger: loggi
     else:
         collection = client.get_collection(subject)
 
-    model = SentenceTransformer(RETRIEVAL_EMBEDDING_MODEL)
-    question_embedding = model.encode(question).tolist()
+    space = (collection.metadata or {}).get("hnsw:space", "l2")
 
-    result = collection.query(
-        query_embeddings=[question_embedding],
-        n_results=top_k,
-        include=["documents", "distances", "metadatas"],
-        where=filter
-    )
+    with metrics.timer("vector_search"):
+        if plan_vector_query(collection, filter, logger, metrics) == "exact":
+            result = exact_search_chromadb(collection, question_embedding, top_k, filter, space, include_embeddings)
+        else:
+            result = collection.query(
+                query_embeddings=[question_embedding],
+                n_results=top_k,
+                include=["documents", "distances", "metadatas"] + (["embeddings"] if include_embeddings else []),
+                where=filter
+            )
 
-    clean_result = tidy_vectorstore_results(result)
+    clean_result = tidy_vectorstore_results(result, space)
 
     return clean_result
 
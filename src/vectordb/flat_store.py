@@ -0,0 +1,416 @@
+import json
+import os
+import threading
+import time
+import numpy as np
+
+# Flache Vektorspeicher liegen neben der ChromaDB, ein Verzeichnis pro Collection
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')) # AcademicChatBot
+FLAT_DB_DIR = os.path.join(BASE_DIR, 'db', 'flatstore') # AcademicChatBot/db/flatstore
+
+MANIFEST_FILE = "manifest.json"
+
+# Spalten mit vorberechneten Bitmaps, die Filter darauf schränken die Kandidaten vor der Ähnlichkeitsberechnung ein
+INDEXED_COLUMNS = ("video_id", "is_image_description")
+MAX_CACHED_UNIONS = 256
+
+open_flat_stores = {}
+open_flat_stores_lock = threading.Lock()
+# Schreibt ein Prozess mehrere Videos gleichzeitig, werden die Manifeste einer Collection nacheinander ersetzt
+write_locks = {}
+
+
+def normalize_rows(embeddings):
+    # Normalisiert die Embeddings, damit das Skalarprodukt der Kosinus-Ähnlichkeit entspricht
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(embeddings, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return embeddings / norms
+
+
+def read_manifest(path):
+    manifest_path = os.path.join(path, MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        return None
+    with open(manifest_path, "r", encoding="utf-8") as file:
+        return json.load(file)
+
+
+def write_segment(path, file_prefix, key, ids, embeddings, documents, metadatas):
+    """
+    Schreibt die Einträge eines Videos (key = video_id) als Segment und gibt dessen Eintrag im Manifest zurück.
+    """
+    embeddings = normalize_rows(np.asarray(embeddings, dtype=np.float32).reshape(len(ids), -1))
+    embeddings_file = f"embeddings-{file_prefix}.f32"
+    metadata_file = f"metadata-{file_prefix}.json"
+
+    embeddings.tofile(os.path.join(path, embeddings_file))
+
+    # Spaltenweise Ablage der Metadaten, fehlende Felder werden mit None aufgefüllt
+    keys = sorted({meta_key for meta in metadatas for meta_key in (meta or {})})
+    columns = {meta_key: [(meta or {}).get(meta_key) for meta in metadatas] for meta_key in keys}
+    with open(os.path.join(path, metadata_file), "w", encoding="utf-8") as file:
+        json.dump({"ids": list(ids), "documents": list(documents), "columns": columns}, file)
+
+    return {
+        "key": key,
+        "count": len(ids),
+        "dim": int(embeddings.shape[1]),
+        "embeddings_file": embeddings_file,
+        "metadata_file": metadata_file
+    }
+
+
+def write_manifest(path, version, segments):
+    """
+    Ersetzt das Manifest und löscht danach die Dateien, die keine Version mehr verwendet.
+    """
+    manifest = {
+        "version": version,
+        "count": sum(segment["count"] for segment in segments),
+        "dim": next((segment["dim"] for segment in segments if segment["count"] > 0), 0),
+        "segments": segments
+    }
+    with open(os.path.join(path, MANIFEST_FILE + ".tmp"), "w", encoding="utf-8") as file:
+        json.dump(manifest, file)
+    os.replace(os.path.join(path, MANIFEST_FILE + ".tmp"), os.path.join(path, MANIFEST_FILE))
+
+    # Alte Dateien löschen, bereits geöffnete memmaps lesen weiter aus dem gelöschten Inode
+    used = {segment[name] for segment in segments for name in ("embeddings_file", "metadata_file")}
+    for file_name in os.listdir(path):
+        if file_name.startswith(("embeddings-", "metadata-")) and file_name not in used:
+            os.remove(os.path.join(path, file_name))
+
+
+def get_write_lock(path):
+    with open_flat_stores_lock:
+        return write_locks.setdefault(os.path.abspath(path), threading.Lock())
+
+
+def write_flat_store(path, ids, embeddings, documents, metadatas):
+    """
+    Schreibt eine Collection als flachen Vektorspeicher, mit einem Segment pro Video:
+        embeddings-<version>-<n>.f32   normalisierte float32 Embeddings (count x dim), werden per memmap gelesen
+        metadata-<version>-<n>.json    spaltenweise Metadaten (ids, documents und eine Spalte pro Metadatenfeld)
+        manifest.json                  Version, Anzahl, Dimension und die Segmente, wird als letztes ersetzt
+
+    Jede Version bekommt eigene Dateien, offene memmaps anderer Prozesse bleiben so gültig,
+    bis diese beim nächsten Zugriff die neue Version öffnen.
+    """
+    os.makedirs(path, exist_ok=True)
+    rows_by_key = {}
+    for i, meta in enumerate(metadatas):
+        rows_by_key.setdefault((meta or {}).get("video_id"), []).append(i)
+
+    with get_write_lock(path):
+        version = f"{time.time_ns()}"
+        segments = []
+        for n, (key, rows) in enumerate(rows_by_key.items()):
+            segments.append(write_segment(
+                path, f"{version}-{n}", key, [ids[i] for i in rows], [embeddings[i] for i in rows],
+                [documents[i] for i in rows], [metadatas[i] for i in rows]
+            ))
+        write_manifest(path, version, segments)
+
+
+def replace_flat_store_video(path, video_id, ids, embeddings, documents, metadatas):
+    """
+    Ersetzt nur das Segment eines Videos, ohne Einträge wird es entfernt. Die anderen Segmente bleiben unverändert,
+    das Einlesen eines Videos kostet damit nur die Einträge dieses Videos statt der ganzen Collection.
+
+    Returns:
+        bool: False, wenn noch kein Vektorspeicher mit Segmenten existiert und die Collection exportiert werden muss.
+    """
+    with get_write_lock(path):
+        manifest = read_manifest(path)
+        if manifest is None or "segments" not in manifest:
+            return False
+        version = f"{time.time_ns()}"
+        segments = [segment for segment in manifest["segments"] if segment["key"] != video_id]
+        if len(ids) > 0:
+            segments.append(write_segment(path, f"{version}-0", video_id, ids, embeddings, documents, metadatas))
+        write_manifest(path, version, segments)
+        return True
+
+
+def get_collection_rows(collection, where=None, batch_size=5000):
+    ids, embeddings, documents, metadatas = [], [], [], []
+    offset = 0
+    while True:
+        batch = collection.get(where=where, include=["embeddings", "documents", "metadatas"], limit=batch_size, offset=offset)
+        if len(batch["ids"]) == 0:
+            break
+        ids.extend(batch["ids"])
+        embeddings.extend(batch["embeddings"])
+        documents.extend(batch["documents"])
+        metadatas.extend(batch["metadatas"])
+        offset += len(batch["ids"])
+    return ids, embeddings, documents, metadatas
+
+
+def export_chroma_collection(collection, path=None, batch_size=5000):
+    """
+    Exportiert eine ChromaDB-Collection mit Embeddings, Dokumenten und Metadaten in einen flachen Vektorspeicher.
+    """
+    path = path or os.path.join(FLAT_DB_DIR, collection.name)
+    write_flat_store(path, *get_collection_rows(collection, batch_size=batch_size))
+    return path
+
+
+def export_chroma_video(collection, video_id, path=None):
+    """
+    Aktualisiert im flachen Vektorspeicher nur die Einträge eines Videos aus der ChromaDB-Collection.
+    Existiert noch kein Vektorspeicher (oder einer ohne Segmente), wird die ganze Collection exportiert.
+    """
+    path = path or os.path.join(FLAT_DB_DIR, collection.name)
+    if not replace_flat_store_video(path, video_id, *get_collection_rows(collection, where={"video_id": video_id})):
+        export_chroma_collection(collection, path)
+    return path
+
+
+def build_bitmaps(column):
+    """
+    Erstellt eine Bitmap (boolesche Maske) pro Wert der Spalte, z.B. eine pro Video.
+    """
+    positions = {}
+    for i, value in enumerate(column.tolist()):
+        positions.setdefault(value, []).append(i)
+
+    bitmaps = {}
+    for value, rows in positions.items():
+        bitmap = np.zeros(len(column), dtype=bool)
+        bitmap[rows] = True
+        bitmaps[value] = bitmap
+    return bitmaps
+
+
+class BitmapIndex:
+    """
+    Vorberechnete Bitmaps der Spalten aus INDEXED_COLUMNS.
+    Vereinigungen mehrerer Werte (z.B. alle Videos einer Playlist) werden zwischengespeichert,
+    dadurch ist jede Playlist nach der ersten Abfrage ebenfalls eine fertige Bitmap.
+    """
+
+    def __init__(self, columns, count):
+        self.count = count
+        self.bitmaps = {key: build_bitmaps(columns[key]) for key in INDEXED_COLUMNS if key in columns}
+        self.unions = {}
+        self._lock = threading.Lock()
+
+    def covers(self, key):
+        return key in self.bitmaps
+
+    def equal(self, key, value):
+        bitmap = self.bitmaps[key].get(value)
+        return bitmap if bitmap is not None else np.zeros(self.count, dtype=bool)
+
+    def any_of(self, key, values):
+        values = frozenset(values)
+        with self._lock:
+            union = self.unions.get((key, values))
+            if union is not None:
+                return union
+
+        union = np.zeros(self.count, dtype=bool)
+        for value in values:
+            bitmap = self.bitmaps[key].get(value)
+            if bitmap is not None:
+                union |= bitmap
+
+        with self._lock:
+            if len(self.unions) >= MAX_CACHED_UNIONS:
+                self.unions.pop(next(iter(self.unions)))
+            self.unions[(key, values)] = union
+        return union
+
+
+def evaluate_where(where, columns, count, index=None):
+    """
+    Wertet einen Chroma-Filter (where) spaltenweise aus und gibt eine boolesche Maske über alle Einträge zurück.
+    Unterstützt werden {"feld": wert}, $eq, $ne, $in, $nin sowie $and und $or.
+    Für Spalten im BitmapIndex werden die vorberechneten Bitmaps verwendet.
+    """
+    if not where:
+        return np.ones(count, dtype=bool)
+
+    masks = []
+    for key, condition in where.items():
+        if key == "$and":
+            masks.append(np.logical_and.reduce([evaluate_where(sub, columns, count, index) for sub in condition]))
+            continue
+        if key == "$or":
+            masks.append(np.logical_or.reduce([evaluate_where(sub, columns, count, index) for sub in condition]))
+            continue
+
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+
+        if index is not None and index.covers(key):
+            for operator, value in condition.items():
+                if operator == "$eq":
+                    masks.append(index.equal(key, value))
+                elif operator == "$ne":
+                    masks.append(~index.equal(key, value))
+                elif operator == "$in":
+                    masks.append(index.any_of(key, value))
+                elif operator == "$nin":
+                    masks.append(~index.any_of(key, value))
+                else:
+                    raise ValueError(f"Filter-Operator {operator} wird vom flachen Vektorspeicher nicht unterstützt.")
+            continue
+
+        column = columns.get(key)
+        if column is None:
+            column = np.full(count, None, dtype=object)
+
+        for operator, value in condition.items():
+            if operator == "$eq":
+                masks.append(column == value)
+            elif operator == "$ne":
+                masks.append(column != value)
+            elif operator in ("$in", "$nin"):
+                values = set(value)
+                contained = np.fromiter((item in values for item in column), dtype=bool, count=count)
+                masks.append(contained if operator == "$in" else ~contained)
+            else:
+                raise ValueError(f"Filter-Operator {operator} wird vom flachen Vektorspeicher nicht unterstützt.")
+
+    return np.logical_and.reduce(masks) if len(masks) > 1 else np.asarray(masks[0], dtype=bool)
+
+
+class FlatSnapshot:
+    """
+    Eine geöffnete Version des flachen Vektorspeichers. Abfragen arbeiten immer auf genau einer Version,
+    auch wenn parallel eine neue Version geöffnet wird.
+    """
+
+    def __init__(self, path):
+        manifest = read_manifest(path)
+        # Vektorspeicher ohne Segmente bestehen aus einer einzigen Datei
+        segments = manifest.get("segments") or [{"count": manifest["count"], "dim": manifest["dim"], **{
+            name: manifest[name] for name in ("embeddings_file", "metadata_file")}}]
+
+        self.version = manifest["version"]
+        self.count = manifest["count"]
+        self.dim = manifest["dim"]
+        self.segment_embeddings = []
+        self.ids = []
+        self.documents = []
+        segment_columns = []
+        for segment in segments:
+            with open(os.path.join(path, segment["metadata_file"]), "r", encoding="utf-8") as file:
+                metadata = json.load(file)
+            if segment["count"] > 0:
+                self.segment_embeddings.append(np.memmap(os.path.join(path, segment["embeddings_file"]), dtype=np.float32,
+                                                         mode="r", shape=(segment["count"], self.dim)))
+            else:
+                self.segment_embeddings.append(np.zeros((0, self.dim), dtype=np.float32))
+            self.ids.extend(metadata["ids"])
+            self.documents.extend(metadata["documents"])
+            segment_columns.append((segment["count"], metadata["columns"]))
+        self.offsets = np.cumsum([0] + [len(embeddings) for embeddings in self.segment_embeddings])
+
+        self.metadata_keys = sorted({key for _, columns in segment_columns for key in columns})
+        # Object-Arrays erlauben vektorisierte Vergleiche für die Filter
+        self.columns = {}
+        for key in self.metadata_keys:
+            values = []
+            for count, columns in segment_columns:
+                values.extend(columns.get(key, [None] * count))
+            column = np.empty(len(values), dtype=object)
+            column[:] = values
+            self.columns[key] = column
+        self.index = BitmapIndex(self.columns, self.count)
+
+    def get_metadata(self, index):
+        metadata = {}
+        for key in self.metadata_keys:
+            value = self.columns[key][index]
+            if value is not None:
+                metadata[key] = value
+        return metadata
+
+    def get_embeddings(self, indices):
+        """Embeddings der Einträge an den globalen Positionen, über die Segmente hinweg."""
+        indices = np.asarray(indices, dtype=np.int64)
+        result = np.empty((len(indices), self.dim), dtype=np.float32)
+        segment_ids = np.searchsorted(self.offsets, indices, side="right") - 1
+        for segment_id in np.unique(segment_ids):
+            rows = segment_ids == segment_id
+            result[rows] = self.segment_embeddings[segment_id][indices[rows] - self.offsets[segment_id]]
+        return result
+
+    def query(self, query_embedding, top_k, where=None, include_embeddings=False):
+        query_embedding = normalize_rows(query_embedding).reshape(-1)
+        mask = evaluate_where(where, self.columns, self.count, self.index)
+
+        if mask.all():
+            candidates = None
+            scores = np.concatenate([embeddings @ query_embedding for embeddings in self.segment_embeddings]) \
+                if self.count > 0 else np.zeros(0, dtype=np.float32)
+        else:
+            candidates = np.flatnonzero(mask)
+            scores = self.get_embeddings(candidates) @ query_embedding
+
+        top_k = min(top_k, len(scores))
+        if top_k == 0:
+            return {"ids": [[]], "documents": [[]], "metadatas": [[]], "distances": [[]], "embeddings": [[]]}
+
+        top = np.argpartition(-scores, top_k - 1)[:top_k]
+        top = top[np.argsort(-scores[top])]
+        indices = top if candidates is None else candidates[top]
+
+        return {
+            "ids": [[self.ids[i] for i in indices]],
+            "documents": [[self.documents[i] for i in indices]],
+            "metadatas": [[self.get_metadata(i) for i in indices]],
+            "distances": [[float(1 - score) for score in scores[top]]],
+            "embeddings": [self.get_embeddings(indices)] if include_embeddings else None
+        }
+
+
+class FlatVectorStore:
+    """
+    Exakte Vektorsuche über einen memory-mapped Embedding-Array.
+
+    Die Embeddings werden nur gemappt, nicht kopiert, daher teilen sich alle Worker-Prozesse den Page Cache.
+    Eine Top-k-Abfrage ist ein Matrix-Vektor-Produkt über alle (gefilterten) Einträge plus argpartition.
+    Wird der Speicher neu geschrieben (z.B. nach dem Einlesen eines Videos), wird beim nächsten Zugriff die
+    neue Version geöffnet.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.manifest_path = os.path.join(path, MANIFEST_FILE)
+        self._lock = threading.Lock()
+        self._manifest_mtime = os.path.getmtime(self.manifest_path)
+        self.snapshot = FlatSnapshot(path)
+
+    def current(self):
+        # Prüft über den Zeitstempel des Manifests, ob eine neue Version geschrieben wurde
+        with self._lock:
+            manifest_mtime = os.path.getmtime(self.manifest_path)
+            if manifest_mtime != self._manifest_mtime:
+                self.snapshot = FlatSnapshot(self.path)
+                self._manifest_mtime = manifest_mtime
+            return self.snapshot
+
+    def query(self, query_embedding, top_k, where=None, include_embeddings=False):
+        """
+        Gibt die top_k ähnlichsten Einträge im Format von collection.query zurück.
+        Die Distanz ist die Kosinus-Distanz (1 - Ähnlichkeit), passend zu hnsw:space "cosine".
+        """
+        return self.current().query(query_embedding, top_k, where, include_embeddings)
+
+
+def get_flat_store(collection_name, base_dir=FLAT_DB_DIR):
+    """
+    Gibt den geöffneten flachen Vektorspeicher der Collection zurück, None falls er noch nicht exportiert wurde.
+    """
+    path = os.path.join(base_dir, collection_name)
+    with open_flat_stores_lock:
+        if path not in open_flat_stores:
+            if not os.path.exists(os.path.join(path, MANIFEST_FILE)):
+                return None
+            open_flat_stores[path] = FlatVectorStore(path)
+        return open_flat_stores[path]
@@ -1,21 +1,26 @@
 import csv
 import os
 import chromadb
-import time
 import re
+from functools import lru_cache
 # from config import INPUT_DIR, DB_DIR
-from sentence_transformers import SentenceTransformer
+from src.vectordb.flat_store import export_chroma_video
 
 # Pfade für verschieden Directories
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')) # AcademicChatBot
 INPUT_DIR = os.path.join(BASE_DIR, 'media') # AcademicChatBot/media
 DB_DIR = os.path.join(BASE_DIR, 'db', 'chromadb') # AcademicChatBot/db/chromadb
-model = SentenceTransformer("all-MiniLM-L6-v2") # Model für Sentence Embeddings
+
+
+@lru_cache(maxsize=1)
+def get_embedding_model(): # Model für Sentence Embeddings, wird erst beim ersten Embedding geladen
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer("all-MiniLM-L6-v2")
 
 
 def create_embedding(text): # Erstellt die Vektor Embeddings
     try:
-        return model.encode(text).tolist()
+        return get_embedding_model().encode(text).tolist()
     except Exception as e:
         # Fallback, falls ein Fehler auftritt; es werden Nullvektoren zurückgegeben
         print("Fehler beim Generieren des Embeddings:", e)
@@ -29,6 +34,17 @@ def remove_trailing_non_alphabetic_characters(name):
     # Entfernt Zeichen am Ende, bis ein Buchstabe (a-z oder A-Z) gefunden wird
     return re.sub(r'[^a-zA-Z]+$', '', name)
 
+def remove_video_from_collections(client, video_id): # Löscht alle Einträge des Videos und gibt die betroffenen Collections zurück
+    affected = []
+    for listed in client.list_collections():
+        existing = client.get_collection(name=listed.name)
+        if len(existing.get(where={"video_id": video_id}, include=[])["ids"]) == 0:
+            continue
+        existing.delete(where={"video_id": video_id})
+        print(f"Frühere Einträge des Videos {video_id} aus der Collection '{existing.name}' entfernt.")
+        affected.append(existing)
+    return affected
+
 def generate_vector_db(video_id): # Liest die passende Csv Datei aus und erzeugt eine ChromaDB-Collection
     
     csv_path = os.path.join(INPUT_DIR, video_id, "transcripts_chunks", f"{video_id}.csv") # Pfad zur CSV-Datei für Transkript-Chunks
@@ -38,9 +54,9 @@ def generate_vector_db(video_id): # Liest die passende Csv Datei aus und erzeugt
         first_row = next(reader, None)
 
         # Prüfen, ob video topic in der CSV vorhanden ist
+        # Ohne Thema wird nichts gespeichert, der Fehler verhindert, dass die Stage als abgeschlossen gilt
         if not first_row or not first_row.get("video_topic"):
-            print("Fehlende 'video_topic' in CSV.")
-            return
+            raise ValueError(f"Fehlende 'video_topic' in CSV {csv_path}.")
         
         # Ersetzen der Sonderzeichen im Namen der Collection (auch Leerzeichen) und Generierung des Namens für die Collection
         collection_name = first_row["video_topic"].strip()
@@ -68,6 +84,11 @@ def generate_vector_db(video_id): # Liest die passende Csv Datei aus und erzeugt
         else:
             fallback_collection = client.create_collection(name=fallback_name)
 
+        # Entfernt die Einträge eines früheren Durchlaufs für dieses Video (abgebrochen oder mit anderen Parametern),
+        # damit ein erneuter Durchlauf keine doppelten oder veralteten Chunks hinterlässt. Auch aus den Collections
+        # anderer Themen, falls sich das Thema des Videos geändert hat.
+        removed_from = remove_video_from_collections(client, video_id)
+
         valid_entries = 0
         for i, row in enumerate(reader):
             
@@ -75,7 +96,7 @@ def generate_vector_db(video_id): # Liest die passende Csv Datei aus und erzeugt
                 continue
 
             embedding = create_embedding(row["chunks"]) # Erzeugt Embeddings für die Chunks
-            unique_id = f"row_{i}_{int(time.time())}" # Erzeugung einer Eindeutigen ID für jeden Chunk
+            unique_id = f"{video_id}_row_{i}" # Eindeutige ID für jeden Chunk, auch wenn mehrere Videos gleichzeitig gespeichert werden
             
             # Definition der Metadatenpunkte
             meta = {
@@ -122,7 +143,7 @@ def generate_vector_db(video_id): # Liest die passende Csv Datei aus und erzeugt
                 if not row.get("description"):
                     continue
                 description_embedding = create_embedding(row["description"])
-                frame_unique_id = f"frame_{frame_entries}_{int(time.time())}"
+                frame_unique_id = f"{video_id}_frame_{frame_entries}"
                 frame_meta = {
                     "video_id": row.get("video_id"),
                     "time": row.get("time_in_s"),
@@ -145,4 +166,10 @@ def generate_vector_db(video_id): # Liest die passende Csv Datei aus und erzeugt
     else:
         print("Keine 'frame_descriptions.csv' Datei gefunden; Überspringe Frames.")
 
+    # Export der Einträge dieses Videos in den flachen Vektorspeicher (vector_backend: flat im RAG), die übrigen
+    # Videos der Collections bleiben unverändert. In Collections eines früheren Themas wird das Video entfernt.
+    for exported_collection in [collection, fallback_collection] + [c for c in removed_from if c.name not in (collection.name, fallback_name)]:
+        flat_path = export_chroma_video(exported_collection, video_id)
+        print(f"Flacher Vektorspeicher für '{exported_collection.name}' unter {flat_path} geschrieben.")
+
     print(f"Fertig! Insgesamt {valid_entries} Chunks in der Vector Datenbank in der Collection '{collection_name}' und 'fallback' gespeichert.")
\ No newline at end of file
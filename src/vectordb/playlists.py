@@ -0,0 +1,42 @@
+import json
+import os
+import threading
+
+# Playlist-Zugehörigkeit der Videos, ein Video kann in mehreren Playlists sein (n:m)
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')) # AcademicChatBot
+PLAYLISTS_PATH = os.path.join(BASE_DIR, 'db', 'playlists.json') # AcademicChatBot/db/playlists.json
+
+playlists_lock = threading.Lock()
+
+
+def load_playlist_memberships(path=PLAYLISTS_PATH):
+    """
+    Gibt die Zugehörigkeit als {playlist_id: [video_id, ...]} zurück, leer falls noch keine Playlist eingelesen wurde.
+    """
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as file:
+        return json.load(file)
+
+
+def add_playlist_membership(playlist_id, video_ids, path=PLAYLISTS_PATH):
+    """
+    Speichert, dass die Videos Teil der Playlist sind. Bereits gespeicherte Zugehörigkeiten bleiben erhalten.
+    """
+    with playlists_lock:
+        memberships = load_playlist_memberships(path)
+        memberships[playlist_id] = list(dict.fromkeys(memberships.get(playlist_id, []) + list(video_ids)))
+
+        # Atomares Ersetzen, damit lesende Prozesse nie eine halb geschriebene Datei sehen
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + ".tmp", "w", encoding="utf-8") as file:
+            json.dump(memberships, file)
+        os.replace(path + ".tmp", path)
+
+
+def get_playlist_video_ids(playlist_id, path=PLAYLISTS_PATH):
+    return load_playlist_memberships(path).get(playlist_id, [])
+
+
+def get_video_playlist_ids(video_id, path=PLAYLISTS_PATH):
+    return [playlist_id for playlist_id, video_ids in load_playlist_memberships(path).items() if video_id in video_ids]
@@ -0,0 +1,116 @@
+import os
+import numpy as np
+import pytest
+
+from src.vectordb.flat_store import write_flat_store, replace_flat_store_video, evaluate_where, FlatVectorStore, get_flat_store
+from src.vectordb.playlists import add_playlist_membership, get_playlist_video_ids, get_video_playlist_ids
+
+
+@pytest.fixture(scope="function")
+def store_path(tmp_path):
+    rng = np.random.default_rng(0)
+    embeddings = rng.normal(size=(200, 16)).astype(np.float32)
+    metadatas = [
+        {"video_id": f"video{i % 4}", "time": str(i), "is_image_description": i % 10 == 0}
+        for i in range(200)
+    ]
+    path = str(tmp_path / "collection")
+    write_flat_store(path, [f"row_{i}" for i in range(200)], embeddings, [f"chunk {i}" for i in range(200)], metadatas)
+    return path, embeddings
+
+
+def exact_top_k(embeddings, query, k, rows=None):
+    normalized = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+    scores = normalized @ (query / np.linalg.norm(query))
+    rows = np.arange(len(embeddings)) if rows is None else np.asarray(rows)
+    return [f"row_{i}" for i in rows[np.argsort(-scores[rows])][:k]]
+
+
+def test_query_matches_exact_search(store_path):
+    path, embeddings = store_path
+    store = FlatVectorStore(path)
+    query = embeddings[7] + 0.1
+
+    result = store.query(query, top_k=10)
+
+    assert result["ids"][0] == exact_top_k(embeddings, query, 10)
+    assert result["documents"][0][0] == "chunk 7"
+    assert result["distances"][0] == sorted(result["distances"][0])
+
+
+def test_query_with_filter(store_path):
+    path, embeddings = store_path
+    store = FlatVectorStore(path)
+    where = {"$and": [{"video_id": {"$in": ["video1", "video2"]}}, {"is_image_description": False}]}
+
+    result = store.query(embeddings[5], top_k=5, where=where)
+
+    rows = [i for i in range(200) if i % 4 in (1, 2) and i % 10 != 0]
+    assert result["ids"][0] == exact_top_k(embeddings, embeddings[5], 5, rows)
+    assert all(meta["video_id"] in ("video1", "video2") for meta in result["metadatas"][0])
+
+
+def test_reopens_new_version(store_path):
+    path, embeddings = store_path
+    store = FlatVectorStore(path)
+    assert store.query(embeddings[0], top_k=1)["ids"][0] == ["row_0"]
+
+    write_flat_store(path, ["new"], embeddings[:1], ["new chunk"], [{"video_id": "video9"}])
+    os.utime(os.path.join(path, "manifest.json"), (0, 1))
+
+    assert store.query(embeddings[0], top_k=5)["ids"][0] == ["new"]
+    assert len([name for name in os.listdir(path) if name.startswith("embeddings-")]) == 1
+
+
+def test_get_flat_store_without_export(tmp_path):
+    assert get_flat_store("missing", base_dir=str(tmp_path)) is None
+
+
+def test_bitmap_filter_matches_column_filter(store_path):
+    path, embeddings = store_path
+    snapshot = FlatVectorStore(path).current()
+    where = {"$and": [{"video_id": {"$in": ["video0", "video3"]}}, {"is_image_description": {"$ne": True}}]}
+
+    with_index = evaluate_where(where, snapshot.columns, snapshot.count, snapshot.index)
+    without_index = evaluate_where(where, snapshot.columns, snapshot.count)
+
+    assert np.array_equal(with_index, without_index)
+    assert snapshot.index.any_of("video_id", ["video3", "video0"]) is snapshot.index.any_of("video_id", ["video0", "video3"])
+    assert not snapshot.index.equal("video_id", "unknown").any()
+
+
+def test_playlist_memberships(tmp_path):
+    path = str(tmp_path / "playlists.json")
+    assert get_playlist_video_ids("PL1", path) == []
+
+    add_playlist_membership("PL1", ["video0", "video1"], path)
+    add_playlist_membership("PL2", ["video1"], path)
+    add_playlist_membership("PL1", ["video1", "video2"], path)
+
+    assert get_playlist_video_ids("PL1", path) == ["video0", "video1", "video2"]
+    assert sorted(get_video_playlist_ids("video1", path)) == ["PL1", "PL2"]
+
+
+def test_replace_video_only_rewrites_its_segment(store_path):
+    path, embeddings = store_path
+    store = FlatVectorStore(path)
+    untouched = {name for name in os.listdir(path) if name.startswith("embeddings-")}
+
+    assert replace_flat_store_video(path, "video1", ["video1_new"], embeddings[:1], ["new chunk"], [{"video_id": "video1"}])
+    os.utime(os.path.join(path, "manifest.json"), (0, 1))
+
+    snapshot = store.current()
+    assert snapshot.count == 151
+    assert "video1_new" in snapshot.ids and "row_1" not in snapshot.ids
+    assert store.query(embeddings[0], top_k=2, where={"video_id": "video1"})["ids"][0] == ["video1_new"]
+    # Only the segment of video1 was replaced
+    assert len(untouched - set(os.listdir(path))) == 1
+
+    assert replace_flat_store_video(path, "video1", [], [], [], [])
+    os.utime(os.path.join(path, "manifest.json"), (0, 2))
+    assert store.current().count == 150
+    assert store.query(embeddings[0], top_k=2, where={"video_id": "video1"})["ids"][0] == []
+
+
+def test_replace_video_without_store(tmp_path):
+    assert not replace_flat_store_video(str(tmp_path / "missing"), "video1", [], [], [], [])